@@ -2,13 +2,23 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
-from flasgger import Swagger
-import yaml
-import os
+from app.utils.cache import Cache
+from app.utils.lookup_index import LookupIndex
+from app.utils.reference_data import ReferenceData
+from app.utils.password_hasher import PasswordHasher
+from app.utils.login_throttle import LoginThrottle
+from app.utils.token_denylist import TokenDenylist
+from app.utils.api_docs import ApiDocs
 
 db = SQLAlchemy()
 jwt = JWTManager()
-swagger = Swagger()
+api_docs = ApiDocs()
+cache = Cache()
+lookup_index = LookupIndex()
+reference_data = ReferenceData()
+password_hasher = PasswordHasher()
+login_throttle = LoginThrottle()
+token_denylist = TokenDenylist()
 
 def create_app():
     app = Flask(__name__)
@@ -30,32 +40,19 @@ def create_app():
     
     db.init_app(app)
     jwt.init_app(app)
+    cache.init_app(app)
+    lookup_index.init_app(app)
+    reference_data.init_app(app)
+    password_hasher.init_app(app)
+    login_throttle.init_app(app)
+    token_denylist.init_app(app)
     
-    # Inicialización de Flasgger cargando el template manualmente
-    openapi_path = os.path.join(app.root_path, '../openapi.yaml')
-    with open(openapi_path, 'r', encoding='utf-8') as f:
-        template = yaml.safe_load(f)
-    
-    swagger.template = template
-    
-    # Configuración explícita para OpenAPI 3.0
-    app.config['SWAGGER'] = {
-        "headers": [],
-        "specs": [
-            {
-                "endpoint": 'apispec',
-                "route": '/apispec.json',
-                "rule_filter": lambda rule: True,  # all in
-                "model_filter": lambda tag: True,  # all in
-            }
-        ],
-        "static_url_path": "/flasgger_static",
-        "swagger_ui": True,
-        "specs_route": "/apidocs/",
-        "openapi": "3.0.0" # Forzamos versión 3 para evitar conflicto
-    }
-    
-    swagger.init_app(app)
+    # Documentación OpenAPI (Flasgger): diferida hasta la primera petición a /apidocs/ (ver API_DOCS_MODE)
+    api_docs.init_app(app)
+
+    # Revocación de tokens: logout (denylist) y cambios del usuario (ver AuthService.is_token_revoked)
+    from app.services.auth_service import AuthService
+    jwt.token_in_blocklist_loader(AuthService.is_token_revoked)
 
     from app.routes.health import health_bp
     app.register_blueprint(health_bp)
@@ -84,4 +81,7 @@ def create_app():
     from app.routes.inventory import inventory_bp
     app.register_blueprint(inventory_bp, url_prefix='/inventory')
 
+    from app.routes.jobs import jobs_bp
+    app.register_blueprint(jobs_bp)
+
     return app
@@ -1,5 +1,6 @@
 # 
 import os
+from datetime import timedelta
 from dotenv import load_dotenv
 # 
 load_dotenv()
@@ -7,5 +8,58 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-key")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-super-secret")
+    # Vida de los tokens: access corto (se renueva con POST /auth/refresh sin password) y refresh largo
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=int(os.getenv("JWT_ACCESS_TOKEN_MINUTES", "15")))
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=int(os.getenv("JWT_REFRESH_TOKEN_DAYS", "7")))
+    # Tokens revocados (logout): cada worker relee la denylist de la BD cada N segundos
+    TOKEN_DENYLIST_REFRESH = int(os.getenv("TOKEN_DENYLIST_REFRESH", "10"))
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI") or os.getenv("DATABASE_URL") or "sqlite:///local.db"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Reserva de stock: en PostgreSQL, rechazar de inmediato si otra transacción tiene bloqueado el repuesto
+    STOCK_SKIP_LOCKED = os.getenv("STOCK_SKIP_LOCKED", "false").lower() == "true"
+    # Caché de lecturas (KPIs): 'memory' (LRU por proceso) o 'redis' (compartida entre workers)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # Timeout (segundos) de conexión y operación con Redis: si se agota, la caché se omite y se lee la BD
+    CACHE_REDIS_TIMEOUT = float(os.getenv("CACHE_REDIS_TIMEOUT", "0.5"))
+    CACHE_DEFAULT_TTL = int(os.getenv("CACHE_DEFAULT_TTL", "60"))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))
+    CACHE_KEY_PREFIX = os.getenv("CACHE_KEY_PREFIX", "taller")
+    DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+    PARTS_CACHE_TTL = int(os.getenv("PARTS_CACHE_TTL", "120"))
+    # Perfiles de usuario cacheados por proceso (revocación de tokens entre workers en <= N segundos)
+    USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "30"))
+    # Caché en disco de facturas PDF (default: instance/invoice_cache) y tamaño máximo en bytes
+    INVOICE_CACHE_DIR = os.getenv("INVOICE_CACHE_DIR")
+    INVOICE_CACHE_MAX_BYTES = int(os.getenv("INVOICE_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+    # Exportación masiva de facturas: procesos de render (0 = núcleos disponibles) y máximo de órdenes
+    INVOICE_EXPORT_WORKERS = int(os.getenv("INVOICE_EXPORT_WORKERS", "0"))
+    INVOICE_EXPORT_MAX_ORDERS = int(os.getenv("INVOICE_EXPORT_MAX_ORDERS", "500"))
+    # Exportación en segundo plano (?async=1 / trabajo 'invoice_export'): máximo de órdenes
+    INVOICE_EXPORT_MAX_ORDERS_ASYNC = int(os.getenv("INVOICE_EXPORT_MAX_ORDERS_ASYNC", "5000"))
+    # Cola de trabajos (worker.py): archivos generados, sondeo, heartbeat, timeout sin heartbeat,
+    # reintentos y retención (segundos)
+    JOB_RESULTS_DIR = os.getenv("JOB_RESULTS_DIR")
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    JOB_HEARTBEAT_INTERVAL = int(os.getenv("JOB_HEARTBEAT_INTERVAL", "30"))
+    JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "120"))
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "86400"))
+    # Índice en memoria de placas/CIs (GET /clients/lookup): recarga desde la BD cada N segundos (0 = nunca)
+    LOOKUP_INDEX_REFRESH = int(os.getenv("LOOKUP_INDEX_REFRESH", "300"))
+    # Roles y estados de orden en memoria: recarga de respaldo para cambios hechos fuera del proceso (segundos)
+    REFERENCE_DATA_REFRESH = int(os.getenv("REFERENCE_DATA_REFRESH", "300"))
+    # Hashing de contraseñas: método/costo de werkzeug (los hashes con otro método se actualizan en el
+    # siguiente login), hilos del pool (0 = la mitad de los núcleos), cola máxima y espera (segundos)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "32"))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv("PASSWORD_HASH_TIMEOUT", "30"))
+    # Intentos fallidos de login: ventana (segundos) y máximo por cuenta y por IP
+    LOGIN_FAILURE_WINDOW = int(os.getenv("LOGIN_FAILURE_WINDOW", "900"))
+    LOGIN_MAX_FAILURES_ACCOUNT = int(os.getenv("LOGIN_MAX_FAILURES_ACCOUNT", "5"))
+    LOGIN_MAX_FAILURES_IP = int(os.getenv("LOGIN_MAX_FAILURES_IP", "20"))
+    # Documentación OpenAPI: 'lazy' (Flasgger se carga en la primera petición a /apidocs/), 'eager' u 'off'.
+    # La spec parseada se guarda como JSON (default: instance/openapi.json) y se regenera si cambia el YAML
+    API_DOCS_MODE = os.getenv("API_DOCS_MODE", "lazy")
+    OPENAPI_CACHE_PATH = os.getenv("OPENAPI_CACHE_PATH")
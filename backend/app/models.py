@@ -1,5 +1,7 @@
-from app import db
+from app import db, reference_data
 from datetime import datetime
+from sqlalchemy import event, inspect
+from app.utils.search_index import install as install_search_index, uninstall as uninstall_search_index, set_search_text
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Visión Macro)
@@ -121,7 +123,7 @@ class Usuario(db.Model):
             'correo': self.correo,
             'celular': self.celular,
             'rol_id': self.rol_id,
-            'rol_nombre': self.rol.nombre_rol if self.rol else None,
+            'rol_nombre': reference_data.role_name(self.rol_id),
             'activo': self.activo,
             'creado_at': self.creado_at.isoformat() if self.creado_at else None,
         }
@@ -134,6 +136,10 @@ class Cliente(db.Model):
     Identificador único de negocio: CI (Cédula de Identidad).
     """
     __tablename__ = 'clientes'
+    # Orden estable del listado (paginación por cursor sobre creado_at, id)
+    __table_args__ = (
+        db.Index('ix_clientes_creado_at_id', 'creado_at', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     ci = db.Column(db.String(20), unique=True, nullable=False)
@@ -145,18 +151,25 @@ class Cliente(db.Model):
     direccion = db.Column(db.Text)
     activo = db.Column(db.Boolean, default=True)
     creado_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Texto normalizado para búsqueda (lo mantienen los eventos del ORM, ver search_index)
+    search_text = db.Column(db.Text)
+
+    SEARCH_COLUMNS = ('nombre', 'apellido_p', 'apellido_m', 'ci', 'correo')
 
     # Relación: Un cliente puede tener múltiples autos.
     autos = db.relationship('Auto', backref='cliente', lazy=True)
 
-    def to_dict(self):
+    def to_dict(self, include_autos=True):
         """
         Serializa el cliente incluyendo sus vehículos asociados.
         
+        Args:
+            include_autos (bool): Si es False omite la lista de autos (no dispara su carga).
+        
         Returns:
             dict: Datos del cliente y lista de autos.
         """
-        return {
+        data = {
             'id': self.id,
             'ci': self.ci,
             'nombre': self.nombre,
@@ -166,9 +179,11 @@ class Cliente(db.Model):
             'celular': self.celular,
             'direccion': self.direccion,
             'activo': self.activo,
-            'creado_at': self.creado_at.isoformat() if self.creado_at else None,
-            'autos': [auto.to_dict() for auto in self.autos] if self.autos else []
+            'creado_at': self.creado_at.isoformat() if self.creado_at else None
         }
+        if include_autos:
+            data['autos'] = [auto.to_dict() for auto in self.autos] if self.autos else []
+        return data
 
 
 # ==============================================================================
@@ -185,13 +200,17 @@ class Auto(db.Model):
     __tablename__ = 'autos'
 
     id = db.Column(db.Integer, primary_key=True)
-    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'))
+    cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), index=True)
     placa = db.Column(db.String(20), unique=True, nullable=False)
     marca = db.Column(db.String(50))
     modelo = db.Column(db.String(50))
     anio = db.Column(db.Integer)
     color = db.Column(db.String(30))
     activo = db.Column(db.Boolean, default=True)
+    # Texto normalizado para búsqueda (lo mantienen los eventos del ORM, ver search_index)
+    search_text = db.Column(db.Text)
+
+    SEARCH_COLUMNS = ('placa', 'marca', 'modelo')
 
     # Relación: Un auto tiene un historial de muchas órdenes.
     ordenes = db.relationship('Orden', backref='auto', lazy=True)
@@ -248,6 +267,10 @@ class Repuesto(db.Model):
     Lógica: Mantiene el control de stock físico.
     """
     __tablename__ = 'repuestos'
+    # Orden del catálogo (paginación por cursor sobre nombre, id)
+    __table_args__ = (
+        db.Index('ix_repuestos_nombre_id', 'nombre', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     nombre = db.Column(db.String(100), nullable=False)
@@ -284,6 +307,11 @@ class Orden(db.Model):
     Propósito: Agrupa el vehículo, el técnico, los servicios realizados y los repuestos usados.
     """
     __tablename__ = 'ordenes'
+    # Índices compuestos para reportes por período (ReportService)
+    __table_args__ = (
+        db.Index('ix_ordenes_activo_fecha_ingreso', 'activo', 'fecha_ingreso'),
+        db.Index('ix_ordenes_estado_fecha_ingreso', 'estado_id', 'fecha_ingreso'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     auto_id = db.Column(db.Integer, db.ForeignKey('autos.id'))
@@ -294,6 +322,9 @@ class Orden(db.Model):
     problema_reportado = db.Column(db.Text)
     diagnostico = db.Column(db.Text)
     total_estimado = db.Column(db.Float, default=0.00)
+    # Totales financieros desnormalizados (mantenidos por PaymentService y `_sincronizar_saldo`)
+    total_pagado = db.Column(db.Float, default=0.00, nullable=False, server_default='0')
+    saldo = db.Column(db.Float, default=0.00, nullable=False, server_default='0')
     activo = db.Column(db.Boolean, default=True)
 
     # Relaciones de Detalle (Composition)
@@ -303,11 +334,12 @@ class Orden(db.Model):
 
     def calcular_total_pagado(self):
         """
-        Suma los pagos activos registrados para esta orden.
+        Total de pagos activos registrados para esta orden.
+        Lectura O(1) de la columna desnormalizada (no carga la colección de pagos).
         Returns:
             float: Suma total de pagos.
         """
-        return sum(pago.monto for pago in self.pagos if pago.activo)
+        return self.total_pagado or 0.0
     
     def calcular_saldo_pendiente(self):
         """
@@ -316,7 +348,7 @@ class Orden(db.Model):
         Returns:
             float: Saldo pendiente.
         """
-        return self.total_estimado - self.calcular_total_pagado()
+        return (self.total_estimado or 0.0) - self.calcular_total_pagado()
     
     def esta_pagado_completamente(self):
         """
@@ -348,7 +380,7 @@ class Orden(db.Model):
             'tecnico_id': self.tecnico_id,
             'tecnico_nombre': f"{self.tecnico.nombre} {self.tecnico.apellido_p}" if self.tecnico else None,
             'estado_id': self.estado_id,
-            'estado_nombre': self.estado.nombre_estado if self.estado else None,
+            'estado_nombre': reference_data.estado_name(self.estado_id),
             'fecha_ingreso': self.fecha_ingreso.isoformat() if self.fecha_ingreso else None,
             'fecha_entrega': self.fecha_entrega.isoformat() if self.fecha_entrega else None,
             'fecha_estimada_salida': self.fecha_entrega.isoformat() if self.fecha_entrega else None, # Alias
@@ -365,6 +397,24 @@ class Orden(db.Model):
             'pagado_completamente': self.esta_pagado_completamente()
         }
 
+@event.listens_for(Orden, 'before_insert')
+def _saldo_inicial(mapper, connection, target):
+    """
+    Inicializa `saldo` al insertar la orden (aún no tiene pagos).
+    """
+    target.saldo = (target.total_estimado or 0.0) - (target.total_pagado or 0.0)
+
+@event.listens_for(Orden, 'before_update')
+def _sincronizar_saldo(mapper, connection, target):
+    """
+    Mantiene `saldo` coherente cuando el ORM cambia `total_estimado`.
+    
+    `total_pagado` solo se modifica con UPDATE atómicos (PaymentService), por lo que
+    se toma de la columna en BD y no del valor en memoria, que podría estar desfasado.
+    """
+    if inspect(target).attrs.total_estimado.history.has_changes():
+        target.saldo = (target.total_estimado or 0.0) - Orden.total_pagado
+
 class Pago(db.Model):
     """
     Registro de transacciones monetarias asociadas a una orden.
@@ -372,6 +422,10 @@ class Pago(db.Model):
     Tablas: 'pagos'
     """
     __tablename__ = 'pagos'
+    # Orden del historial de pagos (paginación por cursor sobre fecha_pago, id)
+    __table_args__ = (
+        db.Index('ix_pagos_fecha_pago_id', 'fecha_pago', 'id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     orden_id = db.Column(db.Integer, db.ForeignKey('ordenes.id'))
@@ -464,3 +518,164 @@ class OrdenDetalleRepuesto(db.Model):
 
 
 
+
+
+# ==============================================================================
+# 6. TABLAS DE REPORTES (Rollups pre-agregados)
+# ==============================================================================
+
+class MetricaDiaria(db.Model):
+    """
+    Rollup diario pre-agregado para el Dashboard y los reportes de ingresos.
+    
+    Tablas: 'daily_metrics'
+    Dimensiones:
+        - 'estado': clave = estado_id. cantidad = órdenes ingresadas ese día que están
+          en ese estado; monto = suma de su total_estimado.
+        - 'metodo_pago': clave = método. cantidad = pagos activos; monto = suma cobrada.
+    Lógica: Mantenido de forma incremental por `RollupService` desde las escrituras
+    de órdenes y pagos. Se reconstruye con `backfill_metrics.py`.
+    """
+    __tablename__ = 'daily_metrics'
+    __table_args__ = (
+        db.UniqueConstraint('fecha', 'dimension', 'clave', name='uq_daily_metrics_fecha_dimension_clave'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)
+    clave = db.Column(db.String(50), nullable=False, default='')
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    monto = db.Column(db.Float, nullable=False, default=0.0)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: Fila del rollup.
+        """
+        return {
+            'fecha': self.fecha.isoformat() if self.fecha else None,
+            'dimension': self.dimension,
+            'clave': self.clave,
+            'cantidad': self.cantidad,
+            'monto': self.monto
+        }
+
+# ==============================================================================
+# 7. COLA DE TRABAJOS EN SEGUNDO PLANO
+# ==============================================================================
+
+class Trabajo(db.Model):
+    """
+    Trabajo encolado para el worker (`worker.py`): facturas, exportaciones, recálculos.
+    
+    Tablas: 'jobs'
+    Ciclo de vida: 'pendiente' -> 'en_proceso' -> 'completado' | 'error'.
+    Lógica: La propia tabla hace de cola (sin broker externo). Los workers toman
+    trabajos con un UPDATE condicional sobre `estado`, así dos workers nunca
+    ejecutan el mismo trabajo. Mientras corre, el worker renueva `latido_at`; un
+    trabajo sin latido reciente se considera abandonado.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_estado_id', 'estado', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(50), nullable=False)
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    resultado = db.Column(db.JSON) # Resultado JSON del handler
+    archivo = db.Column(db.String(255)) # Ruta del archivo generado (PDF/ZIP), si aplica
+    error = db.Column(db.Text)
+    intentos = db.Column(db.Integer, nullable=False, default=0)
+    worker = db.Column(db.String(100))
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
+    creado_at = db.Column(db.DateTime, default=datetime.utcnow)
+    iniciado_at = db.Column(db.DateTime)
+    latido_at = db.Column(db.DateTime) # Último heartbeat del worker que lo ejecuta
+    finalizado_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: Estado del trabajo (sin la ruta interna del archivo).
+        """
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'estado': self.estado,
+            'payload': self.payload,
+            'resultado': self.resultado,
+            'tiene_archivo': bool(self.archivo),
+            'error': self.error,
+            'intentos': self.intentos,
+            'creado_at': self.creado_at.isoformat() if self.creado_at else None,
+            'iniciado_at': self.iniciado_at.isoformat() if self.iniciado_at else None,
+            'finalizado_at': self.finalizado_at.isoformat() if self.finalizado_at else None
+        }
+
+# ==============================================================================
+# 8. TOKENS REVOCADOS (Denylist de JWT)
+# ==============================================================================
+
+class TokenRevocado(db.Model):
+    """
+    JWT revocado antes de su expiración (logout), identificado por su `jti`.
+    
+    Tablas: 'tokens_revocados'
+    Lógica: Fuente persistente de `utils/token_denylist.py`; cada worker mantiene en
+    memoria los `jti` vigentes y relee solo las filas recientes (`creado_at`). Las
+    filas se purgan cuando el token ya habría expirado.
+    """
+    __tablename__ = 'tokens_revocados'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    tipo = db.Column(db.String(10), nullable=False) # 'access' | 'refresh'
+    usuario_id = db.Column(db.Integer) # Sin FK: el registro sobrevive al usuario
+    expira_at = db.Column(db.DateTime, nullable=False, index=True)
+    creado_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+# ==============================================================================
+# 9. ÍNDICES DE BÚSQUEDA (Clientes y Vehículos)
+# ==============================================================================
+# `search_text` se recalcula en cada INSERT/UPDATE hecho por el ORM; el índice del
+# motor (GIN trigram en PostgreSQL, FTS5 en SQLite) se crea y elimina junto con la tabla.
+
+def _actualizar_search_text(mapper, connection, target):
+    """
+    Recalcula `search_text` desde `SEARCH_COLUMNS` antes de escribir la fila.
+    """
+    set_search_text(target)
+
+for _model in (Cliente, Auto):
+    event.listen(_model, 'before_insert', _actualizar_search_text)
+    event.listen(_model, 'before_update', _actualizar_search_text)
+    event.listen(_model.__table__, 'after_create', install_search_index)
+    event.listen(_model.__table__, 'before_drop', uninstall_search_index)
+
+# ==============================================================================
+# 10. DATOS DE REFERENCIA EN MEMORIA (Roles y Estados)
+# ==============================================================================
+# `reference_data` (ver `utils/reference_data.py`) se recarga solo cuando se confirma
+# una escritura sobre estas tablas; un rollback descarta la marca.
+
+_TABLAS_REFERENCIA = (Role, EstadoOrden)
+
+@event.listens_for(db.session, 'after_flush')
+def _marcar_cambio_referencia(session, flush_context):
+    """
+    Registra en la sesión si el flush tocó roles o estados.
+    """
+    if any(isinstance(obj, _TABLAS_REFERENCIA) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['reference_data_changed'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def _recargar_referencia(session):
+    if session.info.pop('reference_data_changed', False):
+        reference_data.mark_stale()
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_cambio_referencia(session):
+    session.info.pop('reference_data_changed', None)
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from app.services.auth_service import AuthService
+from app.utils.password_hasher import HashingBusyError
+from app.utils.login_throttle import LoginThrottledError
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 # ==============================================================================
@@ -85,6 +87,9 @@ def register():
         # Lógica Interna: Captura de errores de negocio
         # Ejemplo: El servicio lanza ValueError si el correo ya existe. Convertimos a 400.
         return jsonify({"msg": str(e)}), 400
+    except HashingBusyError as e:
+        # Contexto Backend: 503 + Retry-After, el pool de hashing está saturado (ráfaga de logins)
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
     except Exception as e:
         # Lógica Interna: Red de seguridad
         # Cualquier otro error inesperado se reporta como 500.
@@ -107,10 +112,13 @@ def login():
         password (str): Contraseña en texto plano.
 
     Returns:
-        JSON: Token de acceso ('access_token') y datos del perfil de usuario.
+        JSON: Token de acceso ('access_token', vida corta), token de renovación
+        ('refresh_token', ver POST /auth/refresh) y datos del perfil de usuario.
         HTTP 200: Login exitoso.
         HTTP 400: Faltan credenciales.
         HTTP 401: Credenciales inválidas (usuario no existe o password incorrecto).
+        HTTP 429: Demasiados intentos fallidos para la cuenta o la IP (con Retry-After).
+        HTTP 503: Pool de hashing saturado (con Retry-After).
     """
     data = request.get_json()
 
@@ -120,7 +128,12 @@ def login():
 
     # Interacción: AuthService.login_user
     # Retorna un diccionario con token y usuario si tiene éxito, o None si falla.
-    result = AuthService.login_user(data['email'], data['password'])
+    try:
+        result = AuthService.login_user(data['email'], data['password'], request.remote_addr)
+    except LoginThrottledError as e:
+        return jsonify({"msg": str(e)}), 429, {"Retry-After": str(e.retry_after)}
+    except HashingBusyError as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
 
     if not result:
         # Contexto Backend: 401 Unauthorized es el estándar para fallos de autenticación.
@@ -129,9 +142,64 @@ def login():
     return jsonify({
         "msg": "Inicio de sesión exitoso",
         "access_token": result['access_token'],
+        "refresh_token": result['refresh_token'],
         "user": result['user'].to_dict()
     }), 200
 
+# ==============================================================================
+# Endpoint: Renovar Access Token
+# ==============================================================================
+@auth_bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    """
+    Emite un access token nuevo a partir del refresh token.
+
+    Descripción:
+        El cliente envía el refresh token en la cabecera 'Authorization' cuando su
+        access token (de vida corta) expira. No se verifica la contraseña: la renovación
+        no pasa por el pool de hashing.
+
+    Decoradores:
+        @jwt_required(refresh=True): Solo acepta refresh tokens vigentes y no revocados.
+
+    Returns:
+        JSON: Nuevo 'access_token'.
+        HTTP 200: Éxito.
+        HTTP 401: Refresh token expirado, revocado o inválido.
+    """
+    try:
+        return jsonify({"access_token": AuthService.refresh_access_token()}), 200
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 401
+
+# ==============================================================================
+# Endpoint: Logout (Revocación de Tokens)
+# ==============================================================================
+@auth_bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False)
+def logout():
+    """
+    Revoca el token enviado en la cabecera y, opcionalmente, el refresh token.
+
+    Args (Request Body, opcional):
+        refresh_token (str): Refresh token de la sesión, para revocarlo junto al access token.
+
+    Returns:
+        JSON: Confirmación.
+        HTTP 200: Tokens revocados.
+        HTTP 400: Refresh token inválido o de otro usuario.
+    """
+    data = request.get_json(silent=True) or {}
+
+    try:
+        AuthService.logout(data.get('refresh_token'))
+        return jsonify({"msg": "Sesión cerrada"}), 200
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    except Exception as e:
+        return jsonify({"msg": f"Error al cerrar sesión: {str(e)}"}), 500
+
 # ==============================================================================
 # Endpoint: Obtener Usuario Actual (Perfil)
 # ==============================================================================
@@ -143,7 +211,8 @@ def get_current_user():
 
     Descripción:
         Utiliza el token JWT enviado en la cabecera 'Authorization' para identificar
-        al usuario y recuperar sus datos actualizados de la BD.
+        al usuario y recuperar sus datos desde la caché de usuarios (sin consultar la BD
+        mientras la entrada esté vigente).
 
     Decoradores:
         @jwt_required(): Verifica que la petición incluya un token válido.
@@ -157,15 +226,15 @@ def get_current_user():
     # get_jwt_identity() recupera el 'sub' (subject) codificado en el token (el ID del usuario).
     current_user_id = get_jwt_identity()
     
-    # Contexto Backend: Consulta DB
-    # Es importante volver a consultar la BD y no confiar solo en los datos del token,
-    # ya que el usuario podría haber sido actualizado o deshabilitado recientemente.
-    user = AuthService.get_user_by_id(current_user_id)
+    # Contexto Backend: Perfil cacheado
+    # No se confía solo en los claims del token: el perfil sale de la caché de usuarios,
+    # que se invalida en cada edición y vence a los `USER_CACHE_TTL` segundos.
+    entry = AuthService.get_cached_user(current_user_id)
     
-    if not user:
+    if not entry:
         return jsonify({"msg": "Usuario no encontrado"}), 404
 
-    return jsonify(user.to_dict()), 200
+    return jsonify(entry['user']), 200
 
 # ==============================================================================
 # Endpoint: Listar Usuarios
@@ -254,6 +323,8 @@ def update_user(user_id):
         }), 200
     except ValueError as e:
         return jsonify({"msg": str(e)}), 404
+    except HashingBusyError as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": str(e.retry_after)}
     except Exception as e:
         return jsonify({"msg": f"Error al actualizar usuario: {str(e)}"}), 500
 
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
+from app import lookup_index
 from app.services.client_service import ClientService
+from app.utils.pagination import pagination_args, pagination_meta
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Controlador de Clientes)
@@ -107,24 +109,65 @@ def get_clients():
     """
     Obtiene la lista paginada de clientes.
      Soporta búsqueda por nombre o CI.
+     Modo cursor (`pagination=cursor` / `cursor=`) y `count=exact|estimate|none`
+     igual que en GET /orders.
+     Por defecto cada cliente trae `autos_count`; con `include=autos` trae además la
+     lista de vehículos (precargada para toda la página en una consulta).
     """
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         search = request.args.get('search', type=str)
+        include = {part.strip() for part in request.args.get('include', '', type=str).split(',') if part.strip()}
+        include_autos = 'autos' in include
 
-        pagination = ClientService.get_all_clients(page, per_page, search)
+        try:
+            pagination = ClientService.get_all_clients(
+                page, per_page, search, include_autos=include_autos, **pagination_args(request.args)
+            )
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        if include_autos:
+            items = [c.to_dict() for c in pagination.items]
+            for item in items:
+                item['autos_count'] = len(item['autos'])
+        else:
+            counts = ClientService.count_vehicles([c.id for c in pagination.items])
+            items = [{**c.to_dict(include_autos=False), 'autos_count': counts.get(c.id, 0)} for c in pagination.items]
         
-        return jsonify({
-            'items': [c.to_dict() for c in pagination.items],
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': pagination.page,
-            'per_page': pagination.per_page
-        }), 200
+        return jsonify({'items': items, **pagination_meta(pagination)}), 200
     except Exception as e:
         return jsonify({"msg": f"Error al obtener clientes: {str(e)}"}), 500
 
+# ==============================================================================
+# Endpoint: Autocompletado de Placas y CIs
+# ==============================================================================
+@clients_bp.route('/lookup', methods=['GET'])
+def lookup():
+    """
+    Autocompletado de Recepción por prefijo de placa o CI (índice en memoria, sin BD).
+
+    Query Params:
+        prefix (str): Texto tecleado (mayúsculas, tildes y guiones indistintos).
+        tipo (str, opcional): 'placa' o 'ci'. Default: ambos.
+        limit (int): Máximo de resultados por tipo (default 10, máximo 50).
+
+    Returns:
+        200 OK: {items: [{tipo: 'auto', id, placa, marca, modelo, cliente_id} | {tipo: 'cliente', id, ci, nombre}]}
+        400 Bad Request: Tipo desconocido.
+    """
+    try:
+        prefix = request.args.get('prefix', '', type=str)
+        tipo = request.args.get('tipo', type=str)
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        if tipo not in (None, 'placa', 'ci'):
+            return jsonify({"msg": "Tipo no soportado. Opciones: placa, ci"}), 400
+
+        return jsonify({'items': lookup_index.lookup(prefix, limit, tipo)}), 200
+    except Exception as e:
+        return jsonify({"msg": f"Error en la búsqueda: {str(e)}"}), 500
+
 # ==============================================================================
 # Endpoint: Agregar Vehículo a Cliente
 # ==============================================================================
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models import Repuesto
+from app.services.inventory_service import InventoryService
+from app.utils.pagination import pagination_args
 from flask_jwt_extended import jwt_required
 
 # ==============================================================================
@@ -12,7 +14,8 @@ from flask_jwt_extended import jwt_required
 #
 # Flujo Lógico:
 #   1. CRUD directo sobre el modelo `Repuesto`.
-#   2. Búsqueda simple por nombre/marca para autocompletado en órdenes.
+#   2. Listado filtrable y paginado para autocompletado en órdenes, cacheado con ETag
+#      (`InventoryService`); cada escritura invalida la caché tras su commit.
 #   3. Borrado Lógico (`activo=False`) para mantener integridad histórica.
 #
 # Interacciones:
@@ -29,28 +32,40 @@ inventory_bp = Blueprint('inventory', __name__)
 @jwt_required()
 def get_parts():
     """
-    Obtiene el inventario de repuestos con opción de búsqueda.
+    Obtiene el inventario de repuestos con filtros y paginación opcional.
     
     Query Params:
         search (str): Término para filtrar por nombre o marca (insensible a mayúsculas).
+        marca (str): Marca exacta.
+        low_stock (int): 1 para listar solo repuestos con stock <= stock_minimo.
+        page, per_page (int): Paginación. Sin ellos (ni cursor) se devuelve la lista completa.
+        pagination (str): 'cursor' para recorrer por (nombre, id) sin OFFSET.
+        cursor (str): `next_cursor` de la respuesta anterior.
+        count (str): 'exact', 'estimate' o 'none'.
         
     Returns:
-        200 OK: Lista JSON de repuestos activos.
+        200 OK: Lista JSON de repuestos activos, o {items, ...metadatos} si se pagina.
+        304 Not Modified: El cliente ya tiene esta versión (If-None-Match).
+        400 Bad Request: Cursor o modo de conteo inválido.
     """
     try:
-        search = request.args.get('search', type=str)
-        # Filtramos siempre por activos para no mostrar históricos borrados
-        query = Repuesto.query.filter_by(activo=True)
-        
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Repuesto.nombre.ilike(search_term)) | 
-                (Repuesto.marca.ilike(search_term))
+        try:
+            result = InventoryService.list_parts(
+                search=request.args.get('search', type=str),
+                marca=request.args.get('marca', type=str),
+                low_stock=request.args.get('low_stock', 0, type=int) == 1,
+                page=request.args.get('page', type=int),
+                per_page=request.args.get('per_page', type=int),
+                **pagination_args(request.args)
             )
-        
-        parts = query.all()
-        return jsonify([p.to_dict() for p in parts]), 200
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        # ETag del contenido cacheado: el navegador revalida y recibe 304 sin cuerpo
+        response = current_app.response_class(result['json'], mimetype='application/json')
+        response.set_etag(result['etag'])
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         return jsonify({"msg": f"Error al obtener repuestos: {str(e)}"}), 500
 
@@ -90,6 +105,7 @@ def create_part():
         )
         db.session.add(new_part)
         db.session.commit()
+        InventoryService.invalidate()
         
         return jsonify({
             "msg": "Repuesto creado exitosamente", 
@@ -135,6 +151,7 @@ def update_part(id):
             part.stock_minimo = int(data['stock_minimo'])
 
         db.session.commit()
+        InventoryService.invalidate()
         return jsonify({"msg": "Repuesto actualizado", "part": part.to_dict()}), 200
         
     except Exception as e:
@@ -158,6 +175,7 @@ def delete_part(id):
         
         part.activo = False # Borrado lógico
         db.session.commit()
+        InventoryService.invalidate()
         
         return jsonify({"msg": "Repuesto eliminado"}), 200
     except Exception as e:
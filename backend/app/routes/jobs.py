@@ -0,0 +1,101 @@
+from flask import Blueprint, request, jsonify, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services.job_service import JobService, COMPLETADO
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Controlador de Trabajos en Segundo Plano)
+# ==============================================================================
+# Propósito:
+#   Permite encolar operaciones costosas y consultar su avance sin bloquear
+#   un worker web (el trabajo lo ejecuta `worker.py`).
+#
+# Flujo Lógico Central:
+#   1. POST /jobs -> 202 Accepted + `Location: /jobs/<id>`.
+#   2. GET /jobs/<id> -> estado (pendiente, en_proceso, completado, error).
+#   3. GET /jobs/<id>/result -> archivo (PDF/ZIP) o JSON, cuando está completado.
+#
+# Interacciones:
+#   - Servicio: `JobService`.
+#   - Cliente HTTP: Frontend (polling).
+# ==============================================================================
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+def accepted(job):
+    """Respuesta 202 estándar para un trabajo recién encolado."""
+    response = jsonify({'msg': 'Trabajo encolado', 'job': job.to_dict(), 'status_url': f'/jobs/{job.id}'})
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job.id}'
+    return response
+
+# ==============================================================================
+# Endpoint: Encolar Trabajo
+# ==============================================================================
+@jobs_bp.route('', methods=['POST'])
+@jwt_required()
+def create_job():
+    """
+    Encola un trabajo en segundo plano.
+
+    Request Body:
+        tipo (str): 'invoice', 'invoice_export' o 'recalculate_totals'.
+        payload (dict): Parámetros del tipo (ej: {"order_id": 5}).
+
+    Returns:
+        202 Accepted: Trabajo encolado.
+        400 Bad Request: Tipo desconocido.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        job = JobService.enqueue(data.get('tipo'), data.get('payload') or {}, int(get_jwt_identity()))
+        return accepted(job)
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 400
+    except Exception as e:
+        return jsonify({'msg': f"Error al encolar trabajo: {str(e)}"}), 500
+
+# ==============================================================================
+# Endpoint: Estado de Trabajo
+# ==============================================================================
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """
+    Devuelve el estado actual de un trabajo del usuario.
+    """
+    job = JobService.get_job(job_id, int(get_jwt_identity()))
+    if not job:
+        return jsonify({'msg': 'Trabajo no encontrado'}), 404
+    return jsonify(job.to_dict()), 200
+
+# ==============================================================================
+# Endpoint: Resultado de Trabajo
+# ==============================================================================
+@jobs_bp.route('/<int:job_id>/result', methods=['GET'])
+@jwt_required()
+def get_job_result(job_id):
+    """
+    Descarga el resultado de un trabajo completado.
+
+    Returns:
+        200 OK: Archivo generado (PDF/ZIP) o JSON con el resultado.
+        409 Conflict: El trabajo aún no terminó o terminó con error.
+        410 Gone: El archivo ya fue purgado.
+    """
+    job = JobService.get_job(job_id, int(get_jwt_identity()))
+    if not job:
+        return jsonify({'msg': 'Trabajo no encontrado'}), 404
+    if job.estado != COMPLETADO:
+        return jsonify({'msg': 'El trabajo no tiene resultado disponible', 'estado': job.estado, 'error': job.error}), 409
+
+    if not job.archivo:
+        return jsonify({'job_id': job.id, 'resultado': job.resultado}), 200
+
+    try:
+        return send_file(
+            job.archivo,
+            as_attachment=True,
+            download_name=(job.resultado or {}).get('filename') or f"job_{job.id}"
+        )
+    except FileNotFoundError:
+        return jsonify({'msg': 'El archivo del trabajo ya no está disponible'}), 410
@@ -1,8 +1,15 @@
-from flask import Blueprint, request, jsonify, send_file
-from app.utils.pdf_generator import InvoiceGenerator
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context, current_app
+from app.utils.invoice_cache import InvoiceCache
+from app.utils.pagination import pagination_args, pagination_meta
 from app.services.order_service import OrderService
+from app.services.invoice_export_service import InvoiceExportService
+from app.services.job_service import JobService
+from app.routes.jobs import accepted
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import Usuario
+from app import reference_data
+from datetime import date, datetime
+import json
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Controlador/Ruta)
@@ -21,6 +28,9 @@ from app.models import Usuario
 #   - POST /orders: Creación con detalles (Full Graph Creation).
 #   - PUT /orders/{id}: Actualización con sincronización (Full Graph Update).
 #   - GET /orders: Listado con filtros y paginación.
+#   - GET /orders/{id}/invoice: PDF servido desde la caché en disco (ETag / 304).
+#   - POST /orders/invoices/export: ZIP de facturas en streaming (render multiproceso).
+#   - Con `?async=1` la factura, la exportación y el recálculo se encolan (ver `routes/jobs.py`).
 #
 # Interacciones:
 #   - Cliente: Frontend Web/Móvil.
@@ -102,9 +112,15 @@ def get_orders():
         estado_id (int): Filtrar por ID de estado.
         search (str): Búsqueda por texto (placa, marca, modelo).
         client_id (int): Filtrar por ID de cliente dueño.
+        view (str): 'summary' para la proyección liviana de columnas (sin detalles ni pagos).
+        fields (str): Lista separada por comas de campos de la proyección (implica view=summary).
+        pagination (str): 'cursor' para paginar por (fecha_ingreso, id) sin OFFSET.
+        cursor (str): `next_cursor` de la respuesta anterior (implica pagination=cursor).
+        count (str): 'exact' (default en modo página), 'estimate' o 'none' (default en modo cursor).
         
     Returns:
-        200 OK: Lista paginada y metadatos.
+        200 OK: Lista paginada y metadatos (modo cursor: next_cursor, has_more, per_page, total).
+        400 Bad Request: Campo de proyección desconocido, cursor o modo de conteo inválido.
     """
     try:
         # Extracción segura de parámetros
@@ -113,8 +129,29 @@ def get_orders():
         estado_id = request.args.get('estado_id', type=int)
         search = request.args.get('search', type=str)
         client_id = request.args.get('client_id', type=int)
+        view = request.args.get('view', type=str)
+        fields = request.args.get('fields', type=str)
+        try:
+            paging = pagination_args(request.args)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
 
-        pagination = OrderService.get_all_orders(page, per_page, estado_id, search, client_id)
+        # Modo proyección: se arma la respuesta desde tuplas de columnas, sin ORM
+        if view == 'summary' or fields:
+            field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+            try:
+                items, pagination = OrderService.get_orders_summary(
+                    page, per_page, estado_id, search, client_id, fields=field_list, **paging
+                )
+            except ValueError as e:
+                return jsonify({"msg": str(e)}), 400
+
+            return jsonify({'items': items, **pagination_meta(pagination)}), 200
+
+        try:
+            pagination = OrderService.get_all_orders(page, per_page, estado_id, search, client_id, **paging)
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
         
         # Serialización de resultados
         response_items = []
@@ -122,13 +159,7 @@ def get_orders():
              # to_dict serializa todo el árbol necesario para la grilla
              response_items.append(order.to_dict())
 
-        return jsonify({
-            'items': response_items,
-            'total': pagination.total,
-            'pages': pagination.pages,
-            'current_page': pagination.page,
-            'per_page': pagination.per_page
-        }), 200
+        return jsonify({'items': response_items, **pagination_meta(pagination)}), 200
         
     except Exception as e:
         return jsonify({"msg": f"Error al obtener órdenes: {str(e)}"}), 500
@@ -156,28 +187,131 @@ def get_order(order_id):
 @jwt_required()
 def get_order_invoice(order_id):
     """
-    Genera on-the-fly un documento PDF (Factura/Recibo) para la orden.
+    Devuelve el documento PDF (Factura/Recibo) de la orden.
+    
+    Lógica:
+        El PDF se busca en la caché en disco por el hash del contenido de la orden;
+        solo se renderiza si la orden cambió desde la última descarga.
+        El hash viaja como ETag: con `If-None-Match` coincidente se responde 304 sin cuerpo.
+    
+    Query Params:
+        async (int): 1 para encolar el render y responder 202 con el trabajo a consultar.
     
     Returns:
-        application/pdf: Stream de bytes del archivo generado.
+        application/pdf: Archivo generado (o 304 Not Modified).
     """
     try:
+        if request.args.get('async', 0, type=int) == 1:
+            if not OrderService.get_order_by_id(order_id):
+                return jsonify({"msg": "Orden no encontrada"}), 404
+            return accepted(JobService.enqueue('invoice', {'order_id': order_id}, int(get_jwt_identity())))
+
         order = OrderService.get_order_by_id(order_id)
         if not order:
              return jsonify({"msg": "Orden no encontrada"}), 404
         
-        # Generación del Buffer PDF en memoria
-        pdf_buffer = InvoiceGenerator.generate(order.to_dict())
+        order_data = order.to_dict()
+        invoice_cache = InvoiceCache.for_app(current_app)
+        etag = invoice_cache.key_for(order_data)
+        # Revalidación: el ETag sale del hash de la orden, no hace falta abrir ni renderizar el PDF
+        if etag in request.if_none_match:
+            response = current_app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
         
-        return send_file(
-            pdf_buffer,
+        pdf_file, etag = invoice_cache.get_or_render(order_data, etag)
+        
+        response = send_file(
+            pdf_file,
             mimetype='application/pdf',
             as_attachment=True,
-            download_name=f'Orden_{order_id}.pdf'
+            download_name=f'Orden_{order_id}.pdf',
+            etag=etag,
+            conditional=True
         )
+        # El navegador puede guardarla, pero debe revalidar (la orden puede cambiar)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         return jsonify({"msg": f"Error al generar factura: {str(e)}"}), 500
 
+# ==============================================================================
+# Endpoint: Exportación Masiva de Facturas (ZIP)
+# ==============================================================================
+@orders_bp.route('/orders/invoices/export', methods=['POST'])
+@jwt_required()
+def export_invoices():
+    """
+    Descarga las facturas de varias órdenes en un único ZIP.
+    
+    Request Body (uno de los dos criterios):
+        - ids (list[int]): Órdenes a exportar.
+        - fecha_inicio, fecha_fin (str): Rango 'YYYY-MM-DD' de fecha de ingreso (inclusivo).
+    
+    Query Params:
+        async (int): 1 para generar el ZIP en segundo plano (202 + trabajo a consultar).
+    
+    Returns:
+        application/zip: Stream con un PDF por orden (`Orden_<id>.pdf`).
+        400 Bad Request: Criterio ausente/inválido o demasiadas órdenes.
+        404 Not Found: Ninguna orden coincide.
+    """
+    data = request.get_json(silent=True) or {}
+    ids = data.get('ids')
+    
+    try:
+        fecha_inicio = date.fromisoformat(data['fecha_inicio']) if data.get('fecha_inicio') else None
+        fecha_fin = date.fromisoformat(data['fecha_fin']) if data.get('fecha_fin') else None
+        if ids is not None:
+            ids = [int(i) for i in ids]
+    except (TypeError, ValueError):
+        return jsonify({"msg": "Parámetros inválidos: 'ids' debe ser una lista de enteros y las fechas 'YYYY-MM-DD'"}), 400
+    
+    if not ids and not (fecha_inicio or fecha_fin):
+        return jsonify({"msg": "Debe indicar 'ids' o un rango 'fecha_inicio'/'fecha_fin'"}), 400
+    
+    # Se cuenta antes de cargar nada: el tope debe rechazar sin serializar las órdenes.
+    # El camino asíncrono tiene tope propio (el worker lo vuelve a validar al ejecutar)
+    is_async = request.args.get('async', 0, type=int) == 1
+    if is_async:
+        max_orders = current_app.config.get('INVOICE_EXPORT_MAX_ORDERS_ASYNC', 5000)
+    else:
+        max_orders = current_app.config.get('INVOICE_EXPORT_MAX_ORDERS', 500)
+    try:
+        total = InvoiceExportService.count_orders(ids, fecha_inicio, fecha_fin)
+    except Exception as e:
+        return jsonify({"msg": f"Error al contar órdenes: {str(e)}"}), 500
+    if not total:
+        return jsonify({"msg": "No se encontraron órdenes para exportar"}), 404
+    if total > max_orders:
+        return jsonify({"msg": f"La exportación supera el máximo de {max_orders} órdenes. Reduzca el rango"}), 400
+
+    if is_async:
+        payload = {'ids': ids, 'fecha_inicio': data.get('fecha_inicio'), 'fecha_fin': data.get('fecha_fin')}
+        return accepted(JobService.enqueue('invoice_export', payload, int(get_jwt_identity())))
+    
+    try:
+        orders_data = InvoiceExportService.load_orders(ids, fecha_inicio, fecha_fin)
+    except Exception as e:
+        return jsonify({"msg": f"Error al cargar órdenes: {str(e)}"}), 500
+    
+    # Pudieron borrarse entre el conteo y la carga
+    if not orders_data:
+        return jsonify({"msg": "No se encontraron órdenes para exportar"}), 404
+    
+    stream = InvoiceExportService.stream_zip(
+        orders_data,
+        InvoiceCache.for_app(current_app),
+        current_app.config.get('INVOICE_EXPORT_WORKERS')
+    )
+    filename = f"facturas_{datetime.now():%Y%m%d_%H%M%S}.zip"
+    return Response(
+        stream,
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
 # ==============================================================================
 # Endpoint: Actualizar Orden Completa (Sincronización)
 # ==============================================================================
@@ -237,7 +371,7 @@ def update_order_status(order_id):
 
     try:
         order = OrderService.update_order_status(order_id, estado_id)
-        return jsonify({"msg": "Estado actualizado", "estado": order.estado.to_dict() if order.estado else None}), 200
+        return jsonify({"msg": "Estado actualizado", "estado": reference_data.estado(order.estado_id)}), 200
     except ValueError as e:
         return jsonify({"msg": str(e)}), 400
     except Exception as e:
@@ -306,11 +440,9 @@ def add_part_to_order(order_id):
 @orders_bp.route('/orders/estados', methods=['GET'])
 @jwt_required()
 def get_order_estados():
-    """Retorna la lista maestra de estados posibles para una orden."""
-    from app.models import EstadoOrden
+    """Retorna la lista maestra de estados posibles para una orden (desde `reference_data`)."""
     try:
-        estados = EstadoOrden.query.all()
-        return jsonify([e.to_dict() for e in estados]), 200
+        return jsonify(reference_data.estados()), 200
     except Exception as e:
         return jsonify({"msg": f"Error al obtener estados: {str(e)}"}), 500
 
@@ -318,11 +450,30 @@ def get_order_estados():
 # Endpoint: Utilidad de Mantenimiento
 # ==============================================================================
 @orders_bp.route('/orders/debug-recalculate', methods=['GET'])
+@jwt_required(optional=True)
 def debug_recalculate():
     """
     [ADMIN] Fuerza el recálculo de los totales monetarios de todas las órdenes.
     Útil para corregir inconsistencias de datos históricos.
+    
+    Query Params:
+        stream (int): 1 para recibir el progreso por bloques como NDJSON.
+        async (int): 1 para encolar el recálculo (202 + trabajo a consultar). Requiere
+            JWT: el trabajo queda a nombre del usuario (401 sin token).
     """
+    if request.args.get('async', 0, type=int) == 1:
+        identity = get_jwt_identity()
+        if identity is None:
+            return jsonify({"msg": "Se requiere autenticación para encolar el recálculo"}), 401
+        return accepted(JobService.enqueue('recalculate_totals', None, int(identity)))
+
+    if request.args.get('stream', 0, type=int) == 1:
+        def generate():
+            for progress in OrderService.iter_recalculate_all_totals():
+                yield json.dumps(progress) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
     try:
         stats = OrderService.recalculate_all_totals()
         return jsonify({"msg": "Totales recalculados", "stats": stats}), 200
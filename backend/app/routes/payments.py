@@ -1,9 +1,18 @@
 # -*- coding: utf-8 -*-
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import db, Pago, Orden, Auto, Cliente
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required
+from app.models import db, Pago, Orden
+from app import reference_data
+from app.services.payment_service import PaymentService
+from app.services.auth_service import AuthService
+from app.services.rollup_service import RollupService
+from app.services.report_service import ReportService
+from app.utils.pagination import keyset_paginate, count_rows, pagination_args, pagination_meta
 from datetime import datetime
 from sqlalchemy import text
+import csv
+import io
+import json
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Controlador de Pagos)
@@ -17,10 +26,13 @@ from sqlalchemy import text
 #   2. Validación de Estado (Orden Finalizada/Entregada).
 #   3. Verificación de Saldo (No sobrepagar).
 #   4. Registro Transaccional del Pago.
-#   5. Actualización de Balance de la Orden.
+#   5. Actualización de Balance de la Orden (incremental, ver PaymentService).
 #
 # Interacciones:
 #   - Modelos: Pago, Orden, Cliente, Auto.
+#   - Servicio: `PaymentService` (registro/anulación y totales desnormalizados).
+#   - Servicio: `ReportService` (KPIs de ingresos desde el rollup diario, cacheados).
+#     Toda escritura de pagos invalida esa caché tras el commit.
 #   - Cliente HTTP: Módulo de Caja/Pagos del Frontend.
 # ==============================================================================
 
@@ -74,7 +86,7 @@ def create_payment():
             return jsonify({'msg': 'Orden no encontrada'}), 404
         
         # Regla: Solo se cobra por trabajos termiandos
-        estado_orden = work_order.estado.nombre_estado if work_order.estado else None
+        estado_orden = reference_data.estado_name(work_order.estado_id)
         if estado_orden not in ['Finalizado', 'Entregado']:
             return jsonify({
                 "msg": "No se puede registrar un pago para una orden que no ha sido finalizada",
@@ -83,6 +95,7 @@ def create_payment():
             }), 400
         
         # Regla: No se puede pagar más de lo adeudado
+        # Lectura O(1) del saldo almacenado (no carga los pagos previos)
         saldo_pendiente = work_order.calcular_saldo_pendiente()
         if float(monto) > saldo_pendiente + 0.01:  # Tolerancia Floating Point
             return jsonify({
@@ -93,21 +106,24 @@ def create_payment():
             }), 400
         
         # Ejecución Transaccional
-        usuario_id = get_jwt_identity()
+        # El servicio vuelve a validar el saldo de forma atómica en el UPDATE de la orden.
+        # Atribución desde los claims del token (sin consultar `usuarios`)
+        identidad = AuthService.current_identity()
+        usuario_id = identidad['id']
         fecha_pago = datetime.now()
         
-        nuevo_pago = Pago(
-            orden_id=orden_id,
-            monto=monto,
-            metodo_pago=metodo_pago,
-            referencia=referencia,
-            fecha_pago=fecha_pago,
-            usuario_id=usuario_id,
-            activo=True
-        )
-        
-        db.session.add(nuevo_pago)
-        db.session.commit()
+        try:
+            nuevo_pago = PaymentService.register_payment(
+                orden_id=orden_id,
+                monto=monto,
+                metodo_pago=metodo_pago,
+                referencia=referencia,
+                usuario_id=usuario_id,
+                fecha_pago=fecha_pago
+            )
+        except ValueError as e:
+            return jsonify({'msg': str(e)}), 400
+        ReportService.invalidate_metrics()
         
         # Respuesta Enriquecida con nuevo estado financiero
         balance = {
@@ -125,7 +141,8 @@ def create_payment():
                 'monto': monto,
                 'metodo_pago': metodo_pago,
                 'referencia': referencia,
-                'fecha_pago': fecha_pago.isoformat()
+                'fecha_pago': fecha_pago.isoformat(),
+                'registrado_por': identidad['nombre']
             },
             'balance': balance
         }), 201
@@ -136,6 +153,53 @@ def create_payment():
         return jsonify({'msg': 'Error al crear el pago', 'error': str(e)}), 500
 
 
+# ==============================================================================
+# Endpoint: Anular Pago
+# ==============================================================================
+@payments_bp.route('/<int:payment_id>', methods=['DELETE'])
+@jwt_required()
+def deactivate_payment(payment_id):
+    """
+    Anula un pago (Soft Delete) y devuelve su monto al saldo de la orden.
+    
+    Returns:
+        200 OK: Pago anulado.
+        404 Not Found: Pago inexistente o ya anulado.
+    """
+    try:
+        pago = PaymentService.deactivate_payment(payment_id)
+        ReportService.invalidate_metrics()
+        return jsonify({'msg': 'Pago anulado exitosamente', 'orden_id': pago.orden_id}), 200
+    except ValueError as e:
+        return jsonify({'msg': str(e)}), 404
+    except Exception as e:
+        print(f"Error al anular pago: {str(e)}")
+        return jsonify({'msg': 'Error al anular el pago', 'error': str(e)}), 500
+
+
+# ==============================================================================
+# Endpoint: Verificador de Totales (Mantenimiento)
+# ==============================================================================
+@payments_bp.route('/debug-check-totals', methods=['GET'])
+@jwt_required()
+def check_payment_totals():
+    """
+    [ADMIN] Compara `total_pagado`/`saldo` de las órdenes con la tabla de pagos.
+    
+    Query Params:
+        repair (int): 1 para reconstruir las órdenes desfasadas.
+    """
+    try:
+        repair = request.args.get('repair', 0, type=int) == 1
+        stats = PaymentService.check_payment_totals(repair=repair)
+        if stats['repaired']:
+            ReportService.invalidate_metrics()
+        return jsonify({'msg': 'Verificación completada', 'stats': stats}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'msg': f"Error: {str(e)}"}), 500
+
+
 # ==============================================================================
 # Endpoint: Historial de Pagos
 # ==============================================================================
@@ -145,56 +209,50 @@ def get_payment_history():
     """
     Consulta transacciones pasadas con filtros opcionales.
     Realiza JOINs complejos para devolver contexto del Cliente y Auto.
+    
+    Query Params:
+        fecha_inicio, fecha_fin (str): Filtros de fecha de pago.
+        per_page (int): Máximo de filas en el modo JSON (default 1000).
+        pagination (str): 'cursor' para paginar el modo JSON por (fecha_pago, id); la
+            respuesta pasa a ser {items, next_cursor, has_more, per_page, total}.
+        cursor (str): `next_cursor` de la respuesta anterior (implica pagination=cursor).
+        count (str): 'exact', 'estimate' o 'none' (default) en modo cursor.
+        format (str, opcional): 'ndjson' o 'csv' para exportar el historial completo
+            en streaming (sin límite de filas, memoria constante en el servidor).
     """
     try:
         # Filtros
         fecha_inicio = request.args.get('fecha_inicio')
         fecha_fin = request.args.get('fecha_fin')
-        per_page = int(request.args.get('per_page', 1000))
+        export_format = request.args.get('format')
         
-        # Query Builder con JOINs
-        query = db.session.query(
-            Pago.id,
-            Pago.orden_id,
-            Pago.monto,
-            Pago.metodo_pago,
-            Pago.referencia,
-            Pago.fecha_pago,
-            Cliente.nombre.label('cliente_nombre'),
-            Cliente.apellido_p.label('cliente_apellido'),
-            Auto.placa
-        ).join(
-            Orden, Pago.orden_id == Orden.id
-        ).join(
-            Auto, Orden.auto_id == Auto.id
-        ).join(
-            Cliente, Auto.cliente_id == Cliente.id
-        ).filter(
-            Pago.activo == True
-        )
+        if export_format in ('ndjson', 'csv'):
+            return _stream_payment_history(export_format, fecha_inicio, fecha_fin)
+        if export_format:
+            return jsonify({'msg': "Formato no soportado. Opciones: ndjson, csv"}), 400
         
-        if fecha_inicio:
-            query = query.filter(Pago.fecha_pago >= fecha_inicio)
-        if fecha_fin:
-            query = query.filter(Pago.fecha_pago <= fecha_fin)
-        
-        query = query.order_by(Pago.fecha_pago.desc())
-        
-        payments = query.limit(per_page).all()
+        per_page = int(request.args.get('per_page', 1000))
+        try:
+            paging = pagination_args(request.args)
+        except ValueError as e:
+            return jsonify({'msg': str(e)}), 400
+
+        if paging['keyset']:
+            query = PaymentService.history_query(fecha_inicio, fecha_fin)
+            try:
+                pagination = keyset_paginate(query, Pago.fecha_pago, Pago.id, 'payments', paging['cursor'], per_page)
+            except ValueError as e:
+                return jsonify({'msg': str(e)}), 400
+            pagination.total = count_rows(query.with_entities(Pago.id), paging['count'])
+            return jsonify({
+                'items': [PaymentService.serialize_history_row(p) for p in pagination.items],
+                **pagination_meta(pagination)
+            }), 200
+
+        payments = PaymentService.history_query(fecha_inicio, fecha_fin).limit(per_page).all()
         
         # Serialización Manual
-        result = []
-        for p in payments:
-            result.append({
-                'id': p.id,
-                'orden_id': p.orden_id,
-                'monto': float(p.monto),
-                'metodo_pago': p.metodo_pago,
-                'referencia': p.referencia or '',
-                'fecha_pago': p.fecha_pago.isoformat() if p.fecha_pago else None,
-                'cliente_nombre': f"{p.cliente_nombre} {p.cliente_apellido or ''}".strip(),
-                'placa': p.placa
-            })
+        result = [PaymentService.serialize_history_row(p) for p in payments]
         
         return jsonify(result), 200
         
@@ -203,6 +261,42 @@ def get_payment_history():
         return jsonify({'msg': 'Error al obtener historial', 'error': str(e)}), 500
 
 
+def _stream_payment_history(export_format, fecha_inicio, fecha_fin):
+    """
+    Respuesta en streaming del historial completo (NDJSON: un pago por línea; CSV con cabecera).
+    Las líneas se envían en bloques para no pagar una escritura de socket por fila.
+    """
+    batch_size = 500
+    
+    def generate():
+        buffer = io.StringIO()
+        writer = None
+        if export_format == 'csv':
+            writer = csv.DictWriter(buffer, fieldnames=PaymentService.HISTORY_FIELDS)
+            writer.writeheader()
+        
+        for i, pago in enumerate(PaymentService.iter_history(fecha_inicio, fecha_fin), 1):
+            if writer:
+                writer.writerow(pago)
+            else:
+                buffer.write(json.dumps(pago, ensure_ascii=False) + "\n")
+            
+            if i % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        
+        yield buffer.getvalue()
+    
+    if export_format == 'csv':
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/csv',
+            headers={'Content-Disposition': f'attachment; filename=pagos_{datetime.now():%Y%m%d}.csv'}
+        )
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 # ==============================================================================
 # Endpoint: Detalle de Pago Individual
 # ==============================================================================
@@ -265,11 +359,20 @@ def get_payment(payment_id):
 def get_revenue_summary():
     """
     Calcula totales para KPIs financieros.
+    
+    Query Params:
+        fecha_inicio, fecha_fin (str): 'YYYY-MM-DD' (fin inclusivo). Con fechas sin hora
+        se responde desde el rollup diario (cacheado), con desglose `por_metodo_pago`;
+        si traen hora se consulta la tabla de pagos directamente.
     """
     try:
         fecha_inicio = request.args.get('fecha_inicio')
         fecha_fin = request.args.get('fecha_fin')
         
+        dias = RollupService.parse_day_range(fecha_inicio, fecha_fin)
+        if dias:
+            return jsonify(ReportService.get_revenue_summary(*dias)), 200
+        
         query = db.session.query(
             db.func.sum(Pago.monto).label('total_ingresos'),
             db.func.count(Pago.id).label('total_pagos')
@@ -327,7 +430,7 @@ def get_order_payment_balance(orden_id):
             'total_pagado': orden.calcular_total_pagado(),
             'saldo_pendiente': orden.calcular_saldo_pendiente(),
             'pagado_completamente': orden.esta_pagado_completamente(),
-            'estado_orden': orden.estado.nombre_estado if orden.estado else None,
+            'estado_orden': reference_data.estado_name(orden.estado_id),
             'pagos': pagos_list
         }
         
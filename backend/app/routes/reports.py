@@ -1,5 +1,6 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, request, jsonify
 from app.services.report_service import ReportService
+from app import cache
 from flask_jwt_extended import jwt_required
 
 # ==============================================================================
@@ -11,6 +12,7 @@ from flask_jwt_extended import jwt_required
 #
 # Interacciones:
 #   - ReportService: Lógica de agregación y cálculo.
+#   - cache: Contadores de uso de la caché de métricas.
 # ==============================================================================
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
@@ -30,14 +32,36 @@ def get_dashboard_metrics():
         - Totales de Clientes y Vehículos.
         - Alertas de Stock.
     
+    Query Params:
+        year (int, opcional): Año a consultar (default: actual).
+        month (int, opcional): Mes a consultar, 1-12 (default: actual).
+    
     Returns:
         JSON: Estructura de métricas lista para renderizado.
     """
     try:
+        year = request.args.get('year', type=int)
+        month = request.args.get('month', type=int)
+        if month is not None and not 1 <= month <= 12:
+            return jsonify({"msg": "El mes debe estar entre 1 y 12"}), 400
+
         # Delegación completa al servicio.
         # El controlador solo actúa como pasarela HTTP.
-        metrics = ReportService.get_monthly_metrics()
+        metrics = ReportService.get_monthly_metrics(year, month)
         return jsonify(metrics), 200
 
     except Exception as e:
         return jsonify({"msg": f"Error al generar reporte: {str(e)}"}), 500
+
+
+# ==============================================================================
+# Endpoint: Estadísticas de Caché
+# ==============================================================================
+@reports_bp.route('/cache-stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    """
+    Devuelve los contadores de hits/misses/invalidaciones de la caché del proceso
+    que atiende la petición (con backend 'memory' cada worker tiene los suyos).
+    """
+    return jsonify(cache.stats()), 200
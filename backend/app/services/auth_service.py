@@ -1,8 +1,11 @@
-from app import db
-from app.models import Usuario, Role
-from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token
-from datetime import timedelta
+import hashlib
+from app import db, cache, reference_data, password_hasher, login_throttle, token_denylist
+from app.models import Usuario
+from app.utils.password_hasher import HashingBusyError
+from flask import current_app
+from sqlalchemy import update
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token, get_jwt
+from datetime import datetime
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Servicio de Autenticación)
@@ -13,13 +16,51 @@ from datetime import timedelta
 #
 # Flujo Lógico Central:
 #   1. Registro: Valida unicidad de correo -> Hash Password -> Persiste Usuario.
-#   2. Login: Busca Usuario -> Verifica Hash -> Emite JWT.
+#   2. Login: Límite de intentos -> Busca Usuario -> Verifica Hash -> (Actualiza el
+#      hash si usa otro costo) -> Emite access token corto (`JWT_ACCESS_TOKEN_EXPIRES`)
+#      con claims de identidad (`rol`, `nombre`) y la firma `sv` de credenciales/rol
+#      del usuario, más un refresh token (`JWT_REFRESH_TOKEN_EXPIRES`) con la misma firma.
+#      Hash y verificación corren en el pool acotado de `password_hasher`.
+#   2b. Renovación: el refresh token obtiene un access token nuevo con los datos de la
+#      caché de usuarios, sin password ni hash. Logout revoca ambos tokens por `jti`.
+#   3. Identidad por petición: `current_identity()` lee los claims del token, sin
+#      consultar `usuarios`.
+#   4. Revocación: `is_token_revoked` (callback de flask_jwt_extended) busca el `jti`
+#      en la denylist en memoria (`token_denylist`, logout) y compara `sv` con la firma vigente, tomada de una caché de usuarios por proceso (namespace
+#      `usuarios`, TTL `USER_CACHE_TTL`). Cambiar rol o password, desactivar o
+#      eliminar al usuario cambia la firma e invalida sus tokens anteriores.
+#
+# Notas:
+#   - Las escrituras sobre usuarios invalidan la caché (versión del namespace) en el
+#     proceso que las ejecuta; los demás workers las ven al vencer el TTL.
+#   - Tokens emitidos antes de los claims (sin `sv`) siguen siendo válidos hasta
+#     expirar; su identidad se completa desde la caché.
+#   - Actualizar el hash por cambio de política también cambia la firma: las otras
+#     sesiones del usuario deben volver a iniciar sesión (una vez por cambio de costo).
 #
 # Interacciones:
-#   - Modelos: Usuario, Role.
-#   - Controladores: auth.py (Consumidor principal).
+#   - Modelos: Usuario (roles vía `app.reference_data`).
+#   - Caché: `app.cache` (ver `utils/cache.py`).
+#   - Seguridad: `app.password_hasher` (`utils/password_hasher.py`), `app.login_throttle`
+#     (`utils/login_throttle.py`) y `app.token_denylist` (`utils/token_denylist.py`).
+#   - Controladores: auth.py (Consumidor principal), payments.py.
 # ==============================================================================
 
+USERS_CACHE = 'usuarios'
+
+def _security_stamp(user):
+    """Firma corta de los datos que autorizan un token (rol, estado, hash de password)."""
+    raw = f"{user.rol_id}:{bool(user.activo)}:{user.password}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+def _identity_claims(user, stamp):
+    """Claims del access token a partir del perfil serializado (`Usuario.to_dict`)."""
+    return {
+        'rol': user['rol_nombre'],
+        'nombre': f"{user['nombre']} {user['apellido_p']}",
+        'sv': stamp
+    }
+
 class AuthService:
     """
     Capa de servicio para lógica de negocio de identidad y acceso.
@@ -40,19 +81,22 @@ class AuthService:
             
         Raises:
             ValueError: Si hay duplicados o datos inválidos.
+            HashingBusyError: Si el pool de hashing está saturado.
         """
         
         # Validar Unicidad
         if Usuario.query.filter_by(correo=correo).first():
             raise ValueError("El correo electrónico ya está registrado")
 
-        # Validar Rol
-        rol_obj = Role.query.filter_by(nombre_rol=rol_nombre).first()
-        if not rol_obj:
+        # Validar Rol (datos de referencia en memoria)
+        rol_id = reference_data.role_id(rol_nombre)
+        if rol_id is None:
             raise ValueError(f"El rol '{rol_nombre}' no existe")
 
         # Seguridad: Hashing
-        hashed_password = generate_password_hash(password)
+        # La conexión vuelve al pool mientras se espera el hash (ver `login_user`)
+        db.session.close()
+        hashed_password = password_hasher.hash(password)
         
         new_user = Usuario(
             nombre=nombre,
@@ -61,40 +105,129 @@ class AuthService:
             correo=correo,
             celular=celular,
             password=hashed_password,
-            rol_id=rol_obj.id
+            rol_id=rol_id
         )
 
         db.session.add(new_user)
         db.session.commit()
+        AuthService.invalidate_users()
         return new_user
 
     @staticmethod
-    def login_user(email, password):
+    def login_user(email, password, remote_addr=None):
         """
         Verifica credenciales y genera sesión.
         
+        Args:
+            email, password: Credenciales.
+            remote_addr (str, optional): IP del cliente (límite de intentos por IP).
+        
         Returns:
-            dict: { access_token, user } si éxito.
+            dict: { access_token, refresh_token, user } si éxito.
             None: si falla validación.
+            
+        Raises:
+            LoginThrottledError: Demasiados intentos fallidos para la cuenta o la IP.
+            HashingBusyError: Si el pool de hashing está saturado.
         """
+        # Se rechaza antes de consultar la BD o gastar CPU en el hash
+        login_throttle.check(email, remote_addr)
+
         user = Usuario.query.filter_by(correo=email).first()
 
+        # La conexión vuelve al pool antes de esperar al pool de hashing: en una ráfaga de
+        # logins, las peticiones en cola agotarían las conexiones del resto de endpoints.
+        # `user` queda desvinculado pero con sus columnas ya cargadas.
+        db.session.close()
+
         # Validación estricta de hash
-        if not user or not check_password_hash(user.password, password):
+        if not user or not password_hasher.verify(user.password, password):
+            login_throttle.record_failure(email, remote_addr)
             return None
 
-        # Emisión de Token (Validez 24h)
-        # Identity es el ID del usuario para easy lookup en decoradores
+        login_throttle.reset(email)
+
+        # Política de costo: el hash se regenera con el método vigente mientras
+        # tenemos la contraseña en claro. Si el pool está saturado se deja para otro login.
+        if password_hasher.needs_rehash(user.password):
+            try:
+                new_hash = password_hasher.hash(password)
+                db.session.execute(update(Usuario).where(Usuario.id == user.id).values(password=new_hash))
+                db.session.commit()
+                user.password = new_hash
+                AuthService.invalidate_users()
+            except HashingBusyError:
+                pass
+
+        # Emisión de Tokens (vida según JWT_ACCESS_TOKEN_EXPIRES / JWT_REFRESH_TOKEN_EXPIRES)
+        # Identity es el ID del usuario; rol y nombre viajan como claims para que las
+        # rutas autoricen y atribuyan acciones sin volver a consultar `usuarios`.
+        stamp = _security_stamp(user)
         access_token = create_access_token(
             identity=str(user.id), 
-            expires_delta=timedelta(days=1)
+            additional_claims=_identity_claims(user.to_dict(), stamp)
         )
+        refresh_token = create_refresh_token(identity=str(user.id), additional_claims={'sv': stamp})
         
         return {
             "access_token": access_token,
+            "refresh_token": refresh_token,
             "user": user
         }
 
+    @staticmethod
+    def refresh_access_token():
+        """
+        Emite un access token nuevo para el refresh token de la petición actual
+        (`@jwt_required(refresh=True)`). Sin password ni hash: los claims salen de la
+        caché de usuarios; el callback de revocación ya validó el token y su firma.
+        
+        Returns:
+            str: Access token.
+            
+        Raises:
+            ValueError: Si el usuario ya no existe.
+        """
+        user_id = get_jwt()['sub']
+        entry = AuthService.get_cached_user(user_id)
+        if not entry:
+            raise ValueError("Usuario no encontrado")
+        return create_access_token(
+            identity=str(user_id),
+            additional_claims=_identity_claims(entry['user'], entry['stamp'])
+        )
+
+    @staticmethod
+    def logout(refresh_token=None):
+        """
+        Revoca el token de la petición actual y, si se envía, el refresh token de la
+        misma sesión (ambos quedan en la denylist hasta su expiración).
+        
+        Args:
+            refresh_token (str, optional): Refresh token emitido en el login.
+            
+        Raises:
+            ValueError: Si el refresh token es inválido o pertenece a otro usuario.
+        """
+        claims = get_jwt()
+        tokens = [claims]
+        if refresh_token:
+            try:
+                refresh_claims = decode_token(refresh_token, allow_expired=True)
+            except Exception:
+                raise ValueError("Refresh token inválido")
+            if refresh_claims.get('type') != 'refresh' or refresh_claims.get('sub') != claims['sub']:
+                raise ValueError("Refresh token inválido")
+            tokens.append(refresh_claims)
+
+        for token in tokens:
+            token_denylist.revoke(
+                token['jti'],
+                token['type'],
+                int(token['sub']),
+                datetime.utcfromtimestamp(token['exp'])
+            )
+
     @staticmethod
     def get_user_by_id(user_id):
         """
@@ -102,13 +235,84 @@ class AuthService:
         """
         return Usuario.query.get(user_id)
 
+    @staticmethod
+    def get_cached_user(user_id):
+        """
+        Perfil del usuario desde la caché por proceso (TTL `USER_CACHE_TTL`).
+
+        Returns:
+            dict | None: {'user': to_dict(), 'stamp': firma vigente}, o None si no existe.
+            El dict es compartido: no mutarlo.
+        """
+        def load():
+            user = Usuario.query.get(int(user_id))
+            # Un dict vacío también se cachea: los tokens de usuarios eliminados no
+            # vuelven a consultar la BD en cada petición.
+            return {'user': user.to_dict(), 'stamp': _security_stamp(user)} if user else {}
+
+        entry = cache.get_or_set(
+            USERS_CACHE,
+            str(user_id),
+            load,
+            ttl=current_app.config.get('USER_CACHE_TTL')
+        )
+        return entry or None
+
+    @staticmethod
+    def current_identity():
+        """
+        Identidad del usuario autenticado a partir de los claims del JWT.
+        Requiere una petición con `@jwt_required()`.
+
+        Returns:
+            dict: {id, rol, nombre}.
+        """
+        claims = get_jwt()
+        user_id = int(claims['sub'])
+        if 'rol' in claims:
+            return {'id': user_id, 'rol': claims['rol'], 'nombre': claims.get('nombre')}
+
+        # Token anterior a los claims de identidad
+        entry = AuthService.get_cached_user(user_id)
+        user = entry['user'] if entry else {}
+        return {
+            'id': user_id,
+            'rol': user.get('rol_nombre'),
+            'nombre': f"{user.get('nombre')} {user.get('apellido_p')}" if user else None
+        }
+
+    @staticmethod
+    def is_token_revoked(jwt_header, jwt_payload):
+        """
+        Callback `token_in_blocklist_loader`: True si el token fue revocado (logout) o
+        ya no es válido porque el usuario fue eliminado o cambió su rol, estado o password.
+        """
+        if token_denylist.is_revoked(jwt_payload['jti']):
+            return True
+        stamp = jwt_payload.get('sv')
+        if stamp is None:
+            return False
+        entry = AuthService.get_cached_user(jwt_payload['sub'])
+        return entry is None or entry['stamp'] != stamp
+
+    @staticmethod
+    def invalidate_users():
+        """
+        Descarta los perfiles cacheados. Llamar después del commit de cualquier
+        escritura sobre usuarios o roles.
+        """
+        cache.invalidate(USERS_CACHE)
+
     @staticmethod
     def get_users_by_role(role_name=None):
         """
         Lista usuarios, opcionalmente filtrando por rol.
         """
         if role_name:
-            return Usuario.query.join(Role).filter(Role.nombre_rol == role_name).all()
+            rol_id = reference_data.role_id(role_name)
+            if rol_id is None:
+                return []
+            return Usuario.query.filter(Usuario.rol_id == rol_id).all()
         return Usuario.query.all()
 
     @staticmethod
@@ -116,7 +320,14 @@ class AuthService:
         """
         Actualiza perfil de usuario.
         Maneja re-hashing de password si se solicita cambio.
+        
+        Raises:
+            ValueError: Usuario inexistente, correo duplicado o rol inválido.
+            HashingBusyError: Si el pool de hashing está saturado.
         """
+        # El hash se calcula antes de abrir la transacción (sin retener una conexión mientras se espera el pool)
+        new_password_hash = password_hasher.hash(data['password']) if data.get('password') else None
+
         user = Usuario.query.get(user_id)
         if not user:
             raise ValueError("Usuario no encontrado")
@@ -136,16 +347,17 @@ class AuthService:
             
         # Logic compleja para rol
         if 'rol_nombre' in data:
-            rol_obj = Role.query.filter_by(nombre_rol=data['rol_nombre']).first()
-            if not rol_obj:
+            rol_id = reference_data.role_id(data['rol_nombre'])
+            if rol_id is None:
                 raise ValueError(f"El rol '{data['rol_nombre']}' no existe")
-            user.rol_id = rol_obj.id
+            user.rol_id = rol_id
             
         # Logic compleja para password
-        if 'password' in data and data['password']:
-            user.password = generate_password_hash(data['password'])
+        if new_password_hash:
+            user.password = new_password_hash
         
         db.session.commit()
+        AuthService.invalidate_users()
         return user
 
     @staticmethod
@@ -160,3 +372,4 @@ class AuthService:
         
         db.session.delete(user)
         db.session.commit()
+        AuthService.invalidate_users()
@@ -1,6 +1,10 @@
-from app import db
+from app import db, lookup_index
 from app.models import Cliente, Auto
+from app.utils.pagination import keyset_paginate, count_rows
+from app.utils.search_index import apply_search
+from sqlalchemy import func
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Visión Macro)
@@ -14,6 +18,7 @@ from sqlalchemy.exc import IntegrityError
 #   2. Verificación de unicidad (CI, Correo, Placa) para evitar duplicados.
 #   3. Persistencia en tablas `clientes` y `autos`.
 #   4. Manejo de relaciones (un cliente tiene muchos autos).
+#   5. Tras cada commit, actualiza el índice en memoria de placas/CIs (`lookup_index`).
 #
 # Interacciones:
 #   - Interactúa con Modelos: `Cliente`, `Auto`.
@@ -63,6 +68,7 @@ class ClientService:
             # Lógica Transaccional
             db.session.add(new_client)
             db.session.commit()
+            lookup_index.put_client(new_client)
             return new_client
         except IntegrityError:
             # Lógica Interna: Manejo de Colisiones
@@ -71,32 +77,69 @@ class ClientService:
             raise ValueError("El correo o CI ya está registrado (verifique datos únicos)")
 
     @staticmethod
-    def get_all_clients(page=1, per_page=10, search=None):
+    def get_all_clients(page=1, per_page=10, search=None, cursor=None, keyset=False, count='exact',
+                        include_autos=False):
         """
         Recupera el listado de clientes aplicando paginación y filtros de búsqueda.
 
         Args:
             page (int): Número de página actual.
             per_page (int): Cantidad de registros por página.
-            search (str, optional): Criterio de búsqueda (coincidencia parcial en nombre, apellido o correo).
+            search (str, optional): Criterio de búsqueda (coincidencia parcial en nombre, apellidos, CI o correo).
+            cursor/keyset (optional): Paginación por cursor sobre (creado_at, id) en lugar de OFFSET.
+            count (str): 'exact', 'estimate' o 'none'.
+            include_autos (bool): Precarga los vehículos de la página en una sola consulta
+                (SELECT ... IN) para serializar `autos` sin una consulta por cliente.
 
         Returns:
-            Pagination: Objeto de paginación de Flask-SQLAlchemy.
+            Pagination | KeysetPagination: Objeto paginado.
+
+        Raises:
+            ValueError: Si el cursor es inválido.
         """
         query = Cliente.query
+        rank = None
         
-        # Filtro dinámico (SQL LIKE)
+        # Búsqueda por el índice de texto (tildes/mayúsculas indistintas, palabras en cualquier orden)
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Cliente.nombre.ilike(search_term)) |
-                (Cliente.apellido_p.ilike(search_term)) |
-                (Cliente.correo.ilike(search_term))
-            )
+            query, rank = apply_search(query, Cliente, search)
             
-        # Ordenamiento: Más recientes primero
-        return query.order_by(Cliente.creado_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
+        total = count_rows(query.with_entities(Cliente.id), count)
+
+        if include_autos:
+            query = query.options(selectinload(Cliente.autos))
+
+        if keyset or cursor:
+            pagination = keyset_paginate(query, Cliente.creado_at, Cliente.id, 'clients', cursor, per_page)
+        else:
+            # Ordenamiento: Más relevantes (si hay búsqueda) y más recientes primero
+            order = [Cliente.creado_at.desc(), Cliente.id.desc()]
+            if rank is not None:
+                order.insert(0, rank)
+            pagination = query.order_by(*order)\
+                .paginate(page=page, per_page=per_page, error_out=False, count=False)
+        pagination.total = total
+        return pagination
         
+    @staticmethod
+    def count_vehicles(client_ids):
+        """
+        Cantidad de vehículos por cliente, en una consulta agrupada.
+
+        Args:
+            client_ids (list): IDs de los clientes (ej: los de una página del listado).
+
+        Returns:
+            dict: {cliente_id: cantidad}; los clientes sin autos no aparecen.
+        """
+        if not client_ids:
+            return {}
+        rows = db.session.query(Auto.cliente_id, func.count(Auto.id))\
+            .filter(Auto.cliente_id.in_(client_ids))\
+            .group_by(Auto.cliente_id)\
+            .all()
+        return dict(rows)
+
     @staticmethod
     def get_client_by_id(client_id):
         """
@@ -138,6 +181,7 @@ class ClientService:
 
         try:
             db.session.commit()
+            lookup_index.put_client(client)
             return client
         except IntegrityError:
             db.session.rollback()
@@ -186,6 +230,7 @@ class ClientService:
         try:
             db.session.add(new_vehicle)
             db.session.commit()
+            lookup_index.put_vehicle(new_vehicle)
             return new_vehicle
         except IntegrityError:
             db.session.rollback()
@@ -246,6 +291,7 @@ class ClientService:
 
         try:
             db.session.commit()
+            lookup_index.put_vehicle(vehicle)
             return vehicle
         except IntegrityError:
             db.session.rollback()
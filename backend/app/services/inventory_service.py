@@ -0,0 +1,114 @@
+import hashlib
+import json
+from flask import current_app
+from sqlalchemy import func
+from app import cache
+from app.models import Repuesto
+from app.utils.pagination import keyset_paginate, count_rows, pagination_meta
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Listado del catálogo de repuestos paginado, filtrable y cacheado (selector de
+#   repuestos del formulario de órdenes y módulo de Inventario).
+#
+# Flujo Lógico Central:
+#   1. Filtros en SQL: búsqueda por nombre/marca, marca exacta y stock bajo
+#      (`stock <= stock_minimo`). Orden estable por (nombre, id).
+#   2. Modos: página (OFFSET), cursor (keyset ascendente sobre nombre, id) o la
+#      lista completa (compatibilidad con clientes que esperan un arreglo).
+#   3. La respuesta ya serializada a JSON se cachea por combinación de parámetros (namespace
+#      `parts`) junto con su ETag (hash del contenido); las rutas responden 304 si
+#      el cliente ya tiene esa versión.
+#   4. `invalidate()` tras cada commit que modifica repuestos o su stock
+#      (CRUD de `routes/inventory.py` y movimientos de stock de OrderService).
+#
+# Interacciones:
+#   - Modelo: Repuesto.
+#   - Caché: `app.cache` (ver `utils/cache.py`); paginación: `utils/pagination.py`.
+#   - Llamado por: `routes/inventory.py`, OrderService.
+# ==============================================================================
+
+PARTS_CACHE = 'parts'
+
+class InventoryService:
+    """
+    Servicio de consulta del catálogo de repuestos.
+    """
+
+    @staticmethod
+    def list_parts(search=None, marca=None, low_stock=False, page=None, per_page=None,
+                   cursor=None, keyset=False, count='exact'):
+        """
+        Listado de repuestos activos (cacheado).
+
+        Args:
+            search (str, optional): Texto en nombre o marca (insensible a mayúsculas).
+            marca (str, optional): Marca exacta (insensible a mayúsculas).
+            low_stock (bool): Solo repuestos con `stock <= stock_minimo`.
+            page, per_page (int, optional): Paginación por OFFSET. Sin `page`, `per_page`
+                ni cursor se devuelve la lista completa.
+            cursor, keyset, count: Modo cursor y conteo (ver `utils/pagination.py`).
+
+        Returns:
+            dict: {'json': cuerpo ya serializado (lista o {items, ...metadatos}), 'etag': str}.
+
+        Raises:
+            ValueError: Si el cursor es inválido.
+        """
+        paginated = bool(page or per_page or keyset or cursor)
+        params = {
+            'search': search or None, 'marca': marca or None, 'low_stock': bool(low_stock),
+            'paginated': paginated, 'page': page or 1, 'per_page': per_page or 50,
+            'cursor': cursor, 'keyset': bool(keyset or cursor), 'count': count
+        }
+        key = json.dumps(params, sort_keys=True)
+
+        return cache.get_or_set(
+            PARTS_CACHE,
+            key,
+            lambda: InventoryService._load_parts(**params),
+            ttl=current_app.config.get('PARTS_CACHE_TTL')
+        )
+
+    @staticmethod
+    def _load_parts(search, marca, low_stock, paginated, page, per_page, cursor, keyset, count):
+        query = Repuesto.query.filter(Repuesto.activo == True)
+
+        if search:
+            search_term = f"%{search}%"
+            query = query.filter(
+                (Repuesto.nombre.ilike(search_term)) |
+                (Repuesto.marca.ilike(search_term))
+            )
+        if marca:
+            query = query.filter(func.lower(Repuesto.marca) == marca.lower())
+        if low_stock:
+            query = query.filter(Repuesto.stock <= Repuesto.stock_minimo)
+
+        if not paginated:
+            body = [p.to_dict() for p in query.order_by(Repuesto.nombre, Repuesto.id).all()]
+        else:
+            total = count_rows(query.with_entities(Repuesto.id), count)
+            if keyset:
+                pagination = keyset_paginate(query, Repuesto.nombre, Repuesto.id, 'parts',
+                                             cursor, per_page, descending=False)
+            else:
+                pagination = query.order_by(Repuesto.nombre, Repuesto.id)\
+                    .paginate(page=page, per_page=per_page, error_out=False, count=False)
+            pagination.total = total
+            body = {'items': [p.to_dict() for p in pagination.items], **pagination_meta(pagination)}
+
+        # Se cachea el JSON ya serializado: un hit no vuelve a recorrer los repuestos
+        body_json = json.dumps(body, ensure_ascii=False, separators=(',', ':'))
+        etag = hashlib.sha256(body_json.encode('utf-8')).hexdigest()[:32]
+        return {'json': body_json, 'etag': etag}
+
+    @staticmethod
+    def invalidate():
+        """
+        Descarta los listados cacheados. Llamar después del commit de cualquier
+        escritura sobre repuestos (incluidos los movimientos de stock).
+        """
+        cache.invalidate(PARTS_CACHE)
@@ -0,0 +1,191 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from app.models import Orden
+from app.services.order_service import OrderService
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Exportación masiva de facturas PDF (lista de IDs o rango de fechas) en un ZIP.
+#
+# Flujo Lógico Central:
+#   1. Carga: una consulta de órdenes con el perfil de carga 'detail' de OrderService
+#      (relaciones a uno con JOIN, colecciones con SELECT ... IN): número de consultas
+#      constante sin importar cuántas órdenes se exporten. Se serializan con `to_dict`
+#      dentro de la petición; el render ya no necesita la BD.
+#   2. Las facturas ya presentes en la caché de disco (`InvoiceCache`) se leen directo.
+#   3. El resto se reparte en un ProcessPoolExecutor (un proceso por núcleo): el render
+#      de ReportLab es CPU puro y con hilos quedaría serializado por el GIL. Los
+#      procesos se crean con 'forkserver'/'spawn', nunca con fork del worker web.
+#   4. El ZIP se escribe en streaming: cada PDF se comprime y se envía al cliente en
+#      cuanto termina, sin armar el archivo completo en memoria.
+#
+# Interacciones:
+#   - `OrderService.loader_options`, `InvoiceCache`, `render_invoice_pdf`.
+#   - Llamado por: `routes/orders.py` (POST /orders/invoices/export).
+# ==============================================================================
+
+# Pools por cantidad de procesos (normalmente uno: INVOICE_EXPORT_WORKERS es fijo por proceso)
+_pools = {}
+_pool_lock = threading.Lock()
+
+def _mp_context():
+    """
+    Contexto de multiprocessing sin fork directo del worker web: este proceso ya
+    tiene hilos (servidor, pool de hashing, recarga de índices) y un fork podría
+    heredar locks tomados (logging, pool de SQLAlchemy, caché de fuentes de
+    ReportLab) y colgar al hijo. 'forkserver' (POSIX) forkea desde un proceso
+    servidor limpio; 'spawn' donde no está disponible.
+    """
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # El servidor precarga ReportLab una vez. Los hijos reimportan el __main__ del
+        # proceso (gunicorn, run.py, worker.py): sus efectos deben seguir bajo
+        # `if __name__ == '__main__'`; a nivel de módulo solo se construye la app.
+        context.set_forkserver_preload(['app.utils.pdf_generator'])
+        return context
+    return multiprocessing.get_context('spawn')
+
+def _render_pool(max_workers):
+    """
+    Pool de procesos del worker web, creado en el primer uso y reutilizado
+    (arrancar procesos en cada exportación costaría más que el render).
+    Se cierran al terminar el intérprete (`_shutdown_pools`).
+    """
+    pool = _pools.get(max_workers)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(max_workers)
+            if pool is None:
+                pool = _pools[max_workers] = ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=_mp_context()
+                )
+    return pool
+
+@atexit.register
+def _shutdown_pools():
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+class _ZipChunks:
+    """
+    Destino de escritura para `zipfile` que acumula bytes para entregarlos por partes.
+    No es posicionable: zipfile usa descriptores de datos al final de cada entrada.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class InvoiceExportService:
+    """
+    Servicio de exportación masiva de facturas.
+    """
+
+    @staticmethod
+    def _orders_query(ids=None, fecha_inicio=None, fecha_fin=None):
+        """Órdenes activas por IDs y/o rango de fecha de ingreso (inclusivo)."""
+        query = Orden.query.filter(Orden.activo == True)
+
+        if ids:
+            query = query.filter(Orden.id.in_(ids))
+        if fecha_inicio:
+            query = query.filter(Orden.fecha_ingreso >= datetime.combine(fecha_inicio, datetime.min.time()))
+        if fecha_fin:
+            query = query.filter(Orden.fecha_ingreso < datetime.combine(fecha_fin + timedelta(days=1), datetime.min.time()))
+        return query
+
+    @staticmethod
+    def count_orders(ids=None, fecha_inicio=None, fecha_fin=None):
+        """
+        Cantidad de órdenes que exportaría `load_orders` (un COUNT, sin cargarlas).
+        """
+        return InvoiceExportService._orders_query(ids, fecha_inicio, fecha_fin).count()
+
+    @staticmethod
+    def load_orders(ids=None, fecha_inicio=None, fecha_fin=None):
+        """
+        Carga y serializa las órdenes a exportar.
+
+        Args:
+            ids (list, optional): IDs de orden.
+            fecha_inicio (date, optional): Primer día de ingreso incluido.
+            fecha_fin (date, optional): Último día de ingreso incluido.
+
+        Returns:
+            list: Diccionarios `Orden.to_dict()` ordenados por ID.
+        """
+        query = InvoiceExportService._orders_query(ids, fecha_inicio, fecha_fin)\
+            .options(*OrderService.loader_options('detail'))
+
+        return [order.to_dict() for order in query.order_by(Orden.id).all()]
+
+    @staticmethod
+    def stream_zip(orders_data, invoice_cache, max_workers=None):
+        """
+        Genera el ZIP de facturas por partes (para una Response en streaming).
+
+        Args:
+            orders_data (list): Órdenes serializadas (`load_orders`).
+            invoice_cache (InvoiceCache): Caché de PDFs en disco.
+            max_workers (int, optional): Procesos de render. Default: núcleos disponibles.
+
+        Yields:
+            bytes: Fragmentos consecutivos del archivo ZIP.
+        """
+        # ReportLab se importa al primer uso (ver `utils/invoice_cache.py`)
+        from app.utils.pdf_generator import render_invoice_pdf
+
+        max_workers = max_workers or os.cpu_count() or 1
+        sink = _ZipChunks()
+
+        with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+            pendientes = []
+            for order_data in orders_data:
+                key = invoice_cache.key_for(order_data)
+                pdf_file = invoice_cache.lookup(key)
+                if pdf_file is None:
+                    pendientes.append((order_data, key))
+                    continue
+                with pdf_file as f:
+                    zf.writestr(f"Orden_{order_data['id']}.pdf", f.read())
+                yield sink.drain()
+
+            if max_workers <= 1 or len(pendientes) <= 1:
+                # Sin paralelismo posible: render en el propio proceso (evita el costo de pickle)
+                renders = ((order_data, key, render_invoice_pdf(order_data)) for order_data, key in pendientes)
+            else:
+                pool = _render_pool(max_workers)
+                futures = {pool.submit(render_invoice_pdf, order_data): (order_data, key)
+                           for order_data, key in pendientes}
+                renders = (futures[f] + (f.result(),) for f in as_completed(futures))
+
+            for order_data, key, pdf_bytes in renders:
+                invoice_cache.store(key, pdf_bytes, evict=False)
+                zf.writestr(f"Orden_{order_data['id']}.pdf", pdf_bytes)
+                yield sink.drain()
+
+        if pendientes:
+            invoice_cache.evict()
+        yield sink.drain()
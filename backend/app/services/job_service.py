@@ -0,0 +1,312 @@
+import glob
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from flask import current_app
+from app import db
+from app.models import Trabajo
+from app.services.order_service import OrderService
+from app.services.invoice_export_service import InvoiceExportService
+from app.utils.invoice_cache import InvoiceCache
+from sqlalchemy import update
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Cola de trabajos en segundo plano respaldada por la tabla `jobs` (sin broker externo).
+#   Las operaciones costosas (PDFs, exportaciones, recálculo masivo) se encolan desde
+#   la API, las ejecuta `worker.py` en otro proceso y el cliente consulta su estado.
+#
+# Flujo Lógico Central:
+#   1. `enqueue`: INSERT del trabajo en estado 'pendiente' (la API responde 202 al instante).
+#   2. `claim_next` (worker): UPDATE condicional
+#        UPDATE jobs SET estado='en_proceso' ... WHERE id = :id AND estado = 'pendiente'
+#      Solo un worker consigue afectar la fila; los demás prueban el siguiente candidato.
+#   3. `run`: ejecuta el handler registrado para el tipo y guarda resultado/archivo o error.
+#      Mientras tanto el worker llama a `heartbeat` (renueva `latido_at`). El cierre es
+#      otro UPDATE condicional (`worker = :yo AND estado = 'en_proceso'`): si el trabajo
+#      fue reencolado y lo tomó otro worker, el resultado tardío se descarta.
+#   4. Mantenimiento: `requeue_stale` devuelve a la cola trabajos sin heartbeat reciente
+#      (worker caído) y `purge_finished` borra trabajos terminados antiguos junto con
+#      sus archivos.
+#
+# Interacciones:
+#   - Modelo: Trabajo.
+#   - Handlers: OrderService, InvoiceExportService, InvoiceCache.
+#   - Llamado por: `routes/jobs.py`, `routes/orders.py`, `worker.py`.
+# ==============================================================================
+
+PENDIENTE = 'pendiente'
+EN_PROCESO = 'en_proceso'
+COMPLETADO = 'completado'
+ERROR = 'error'
+
+# Registro tipo -> handler(trabajo) que devuelve (resultado: dict, archivo: str | None)
+_HANDLERS = {}
+
+def job_handler(tipo):
+    """Decorador que registra la función como handler de un tipo de trabajo."""
+    def register(func):
+        _HANDLERS[tipo] = func
+        return func
+    return register
+
+def _remove_file(path):
+    """Borra un archivo de resultado si existe (no falla si ya no está)."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class JobService:
+    """
+    Servicio de la cola de trabajos.
+    """
+
+    @staticmethod
+    def tipos():
+        """Tipos de trabajo soportados."""
+        return sorted(_HANDLERS)
+
+    # ==============================================================================
+    # API (Productores)
+    # ==============================================================================
+
+    @staticmethod
+    def enqueue(tipo, payload=None, usuario_id=None):
+        """
+        Encola un trabajo.
+
+        Raises:
+            ValueError: Si el tipo no tiene handler registrado.
+        """
+        if tipo not in _HANDLERS:
+            raise ValueError(f"Tipo de trabajo desconocido: '{tipo}'. Opciones: {', '.join(JobService.tipos())}")
+
+        job = Trabajo(tipo=tipo, payload=payload or {}, usuario_id=usuario_id, estado=PENDIENTE)
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def get_job(job_id, usuario_id):
+        """
+        Obtiene un trabajo solo si pertenece a `usuario_id`. Los trabajos sin dueño
+        (encolados sin JWT) no son visibles para nadie desde la API.
+        """
+        return Trabajo.query.filter_by(id=job_id, usuario_id=usuario_id).first()
+
+    # ==============================================================================
+    # WORKER (Consumidores)
+    # ==============================================================================
+
+    @staticmethod
+    def claim_next(worker_id, batch=5):
+        """
+        Toma el trabajo pendiente más antiguo de forma atómica.
+
+        Returns:
+            Trabajo | None: El trabajo reclamado (ya en 'en_proceso') o None si la cola está vacía.
+        """
+        candidatos = db.session.query(Trabajo.id)\
+            .filter(Trabajo.estado == PENDIENTE)\
+            .order_by(Trabajo.id)\
+            .limit(batch)\
+            .all()
+
+        for (job_id,) in candidatos:
+            result = db.session.execute(
+                update(Trabajo)
+                .where(Trabajo.id == job_id, Trabajo.estado == PENDIENTE)
+                .values(
+                    estado=EN_PROCESO,
+                    worker=worker_id,
+                    iniciado_at=datetime.utcnow(),
+                    latido_at=datetime.utcnow(),
+                    intentos=Trabajo.intentos + 1
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            if result.rowcount:
+                return db.session.get(Trabajo, job_id)
+        return None
+
+    @staticmethod
+    def heartbeat(job_id, worker_id):
+        """
+        Renueva `latido_at` de un trabajo en curso del worker.
+
+        Returns:
+            bool: False si el trabajo ya no pertenece al worker (reencolado).
+        """
+        result = db.session.execute(
+            update(Trabajo)
+            .where(Trabajo.id == job_id, Trabajo.worker == worker_id, Trabajo.estado == EN_PROCESO)
+            .values(latido_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return bool(result.rowcount)
+
+    @staticmethod
+    def run(job):
+        """
+        Ejecuta el handler del trabajo y persiste el resultado o el error, solo si el
+        trabajo sigue asignado a este worker.
+        """
+        job_id, worker_id = job.id, job.worker
+        archivo = None
+        try:
+            resultado, archivo = _HANDLERS[job.tipo](job)
+            values = {'estado': COMPLETADO, 'resultado': resultado, 'archivo': archivo, 'error': None}
+        except Exception as e:
+            db.session.rollback()
+            values = {'estado': ERROR, 'error': str(e)}
+
+        result = db.session.execute(
+            update(Trabajo)
+            .where(Trabajo.id == job_id, Trabajo.worker == worker_id, Trabajo.estado == EN_PROCESO)
+            .values(finalizado_at=datetime.utcnow(), **values)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+        if not result.rowcount:
+            print(f"Trabajo #{job_id}: ya no pertenece a {worker_id} (reencolado), se descarta su resultado")
+            if archivo:
+                _remove_file(archivo)
+
+        db.session.expire_all()
+        return db.session.get(Trabajo, job_id)
+
+    @staticmethod
+    def requeue_stale(timeout_seconds, max_attempts=3):
+        """
+        Recupera trabajos 'en_proceso' abandonados (worker caído): los que llevan más de
+        `timeout_seconds` sin heartbeat. Vuelven a 'pendiente' si les quedan intentos;
+        si no, pasan a 'error'.
+
+        Returns:
+            int: Trabajos afectados.
+        """
+        limite = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+        stale = (Trabajo.estado == EN_PROCESO) & (Trabajo.latido_at < limite)
+
+        requeued = db.session.execute(
+            update(Trabajo)
+            .where(stale, Trabajo.intentos < max_attempts)
+            .values(estado=PENDIENTE, worker=None)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        failed = db.session.execute(
+            update(Trabajo)
+            .where(stale, Trabajo.intentos >= max_attempts)
+            .values(estado=ERROR, error='Tiempo de ejecución excedido', finalizado_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        return requeued + failed
+
+    @staticmethod
+    def purge_finished(max_age_seconds):
+        """
+        Elimina trabajos terminados hace más de `max_age_seconds` y los archivos de
+        todos sus intentos (incluidos los parciales de workers caídos).
+
+        Returns:
+            int: Trabajos eliminados.
+        """
+        limite = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+        jobs = Trabajo.query.filter(
+            Trabajo.estado.in_([COMPLETADO, ERROR]),
+            Trabajo.finalizado_at < limite
+        ).all()
+
+        for job in jobs:
+            for archivo in glob.glob(os.path.join(JobService.results_dir(), f"job_{job.id}_*")):
+                _remove_file(archivo)
+            db.session.delete(job)
+        db.session.commit()
+        return len(jobs)
+
+    @staticmethod
+    def results_dir():
+        """
+        Directorio de archivos generados (`JOB_RESULTS_DIR`, default instance/job_results).
+        """
+        directory = current_app.config.get('JOB_RESULTS_DIR') or os.path.join(current_app.instance_path, 'job_results')
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    @staticmethod
+    def result_path(job, extension):
+        """
+        Archivo de resultado de un intento: si un trabajo reencolado corre en dos workers
+        a la vez, cada uno escribe el suyo y el que pierde el cierre lo borra.
+        """
+        return os.path.join(JobService.results_dir(), f"job_{job.id}_{job.intentos}.{extension}")
+
+
+# ==============================================================================
+# HANDLERS
+# ==============================================================================
+
+@job_handler('invoice')
+def _invoice_job(job):
+    """Factura PDF de una orden. Payload: {order_id}."""
+    order_id = job.payload.get('order_id')
+    order = OrderService.get_order_by_id(order_id)
+    if not order:
+        raise ValueError("Orden no encontrada")
+
+    pdf_file, etag = InvoiceCache.for_app(current_app).get_or_render(order.to_dict())
+
+    # Copia propia del trabajo: el desalojo de la caché no invalida el resultado
+    archivo = JobService.result_path(job, 'pdf')
+    try:
+        with pdf_file, open(archivo, 'wb') as f:
+            shutil.copyfileobj(pdf_file, f)
+    except Exception:
+        _remove_file(archivo) # Sin copias parciales (el trabajo queda en 'error')
+        raise
+    return {'order_id': order_id, 'etag': etag, 'filename': f"Orden_{order_id}.pdf"}, archivo
+
+
+@job_handler('invoice_export')
+def _invoice_export_job(job):
+    """ZIP de facturas. Payload: {ids} o {fecha_inicio, fecha_fin} ('YYYY-MM-DD')."""
+    payload = job.payload
+    fecha_inicio = date.fromisoformat(payload['fecha_inicio']) if payload.get('fecha_inicio') else None
+    fecha_fin = date.fromisoformat(payload['fecha_fin']) if payload.get('fecha_fin') else None
+
+    max_orders = current_app.config.get('INVOICE_EXPORT_MAX_ORDERS_ASYNC', 5000)
+    total = InvoiceExportService.count_orders(payload.get('ids'), fecha_inicio, fecha_fin)
+    if total > max_orders:
+        raise ValueError(f"La exportación supera el máximo de {max_orders} órdenes. Reduzca el rango")
+
+    orders_data = InvoiceExportService.load_orders(payload.get('ids'), fecha_inicio, fecha_fin)
+    if not orders_data:
+        raise ValueError("No se encontraron órdenes para exportar")
+
+    archivo = JobService.result_path(job, 'zip')
+    try:
+        with open(archivo, 'wb') as f:
+            for chunk in InvoiceExportService.stream_zip(
+                orders_data,
+                InvoiceCache.for_app(current_app),
+                current_app.config.get('INVOICE_EXPORT_WORKERS')
+            ):
+                f.write(chunk)
+    except Exception:
+        _remove_file(archivo) # ZIP a medias (error de render, disco lleno)
+        raise
+    return {'ordenes': len(orders_data), 'filename': f"facturas_job_{job.id}.zip"}, archivo
+
+
+@job_handler('recalculate_totals')
+def _recalculate_totals_job(job):
+    """Recálculo masivo de totales de órdenes. Payload: {}."""
+    return OrderService.recalculate_all_totals(), None
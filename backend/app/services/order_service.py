@@ -1,7 +1,14 @@
-from app import db
-from app.models import Orden, OrdenDetalleServicio, OrdenDetalleRepuesto, Servicio, Repuesto, Auto, Usuario
+from app import db, reference_data
+from app.models import Orden, OrdenDetalleServicio, OrdenDetalleRepuesto, Servicio, Repuesto, Auto, Usuario, Cliente
+from app.services.stock_service import StockService
+from app.services.rollup_service import RollupService, DIM_ESTADO
+from app.services.report_service import ReportService
+from app.services.inventory_service import InventoryService
+from app.utils.pagination import keyset_paginate, count_rows
+from app.utils.search_index import apply_search
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import func
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import joinedload, selectinload, contains_eager, aliased
 
 # ==============================================================================
 # ENCABEZADO DEL ARCHIVO (Visión Macro)
@@ -22,9 +29,54 @@ from sqlalchemy import func
 #
 # Interacciones:
 #   - Interactúa con Modelos: Orden, Auto, Usuario, Servicio, Repuesto.
+#   - Nombres de estados: `app.reference_data` (sin JOIN a `estados_orden`).
+#   - Delega movimientos de inventario a: `StockService` (reserva atómica de stock).
+#   - Mantiene el rollup diario de reportes vía `RollupService` (misma transacción)
+#     e invalida la caché de KPIs (`ReportService.invalidate_metrics`) tras cada commit;
+#     si hubo movimientos de stock, también la del catálogo (`InventoryService.invalidate`).
 #   - Llamado por: `routes/orders.py` (API REST).
 # ==============================================================================
 
+# ==============================================================================
+# PROYECCIÓN PARA LISTADOS (Vista 'summary')
+# ==============================================================================
+# Cada campo declara las columnas SQL que necesita y cómo formatear la fila.
+# Los nombres coinciden con las claves de `Orden.to_dict` para que el frontend
+# pueda consumir ambas vistas sin cambios.
+
+_cliente_cols = (Cliente.nombre.label('cliente_nombre_'), Cliente.apellido_p.label('cliente_apellido_'))
+_tecnico_cols = (Usuario.nombre.label('tecnico_nombre_'), Usuario.apellido_p.label('tecnico_apellido_'))
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _saldo(row):
+    return (row.total_estimado or 0.0) - (row.total_pagado or 0.0)
+
+
+SUMMARY_FIELDS = {
+    'id': ((Orden.id,), lambda r: r.id),
+    'auto_id': ((Orden.auto_id,), lambda r: r.auto_id),
+    'placa': ((Auto.placa,), lambda r: r.placa),
+    'marca': ((Auto.marca,), lambda r: r.marca),
+    'modelo': ((Auto.modelo,), lambda r: r.modelo),
+    'cliente_nombre': (_cliente_cols, lambda r: f"{r.cliente_nombre_} {r.cliente_apellido_}" if r.cliente_nombre_ else 'Sin cliente'),
+    'cliente_ci': ((Cliente.ci.label('cliente_ci'),), lambda r: r.cliente_ci),
+    'tecnico_id': ((Orden.tecnico_id,), lambda r: r.tecnico_id),
+    'tecnico_nombre': (_tecnico_cols, lambda r: f"{r.tecnico_nombre_} {r.tecnico_apellido_}" if r.tecnico_nombre_ else None),
+    'estado_id': ((Orden.estado_id,), lambda r: r.estado_id),
+    'estado_nombre': ((Orden.estado_id,), lambda r: reference_data.estado_name(r.estado_id)),
+    'fecha_ingreso': ((Orden.fecha_ingreso,), lambda r: _iso(r.fecha_ingreso)),
+    'fecha_entrega': ((Orden.fecha_entrega,), lambda r: _iso(r.fecha_entrega)),
+    'total_estimado': ((Orden.total_estimado,), lambda r: r.total_estimado),
+    'total_pagado': ((Orden.total_pagado,), lambda r: r.total_pagado or 0.0),
+    'saldo_pendiente': ((Orden.total_estimado, Orden.total_pagado), _saldo),
+    'pagado_completamente': ((Orden.total_estimado, Orden.total_pagado), lambda r: _saldo(r) <= 0.01),
+}
+
+
 class OrderService:
     """
     Servicio que encapsula la lógica de negocio relacionada con Órdenes de Trabajo.
@@ -93,78 +145,90 @@ class OrderService:
             db.session.add(new_order)
             db.session.flush()  # CRÍTICO: Genera el ID de la orden sin confirmar la transacción (commit)
 
+            # ==============================================================================
+            # RESOLUCIÓN EN LOTE DEL CATÁLOGO
+            # ==============================================================================
+            # Normalizamos todas las líneas primero y resolvemos servicios y repuestos
+            # con una sola consulta IN (...) por tabla, en lugar de una por línea.
+            servicios_data = [OrderService._normalize_servicio_item(item) for item in data.get('servicios', [])]
+            repuestos_data = [OrderService._normalize_repuesto_item(item) for item in data.get('repuestos', [])]
+
+            servicios_map = OrderService._load_catalog(Servicio, {sid for sid, _ in servicios_data})
+            repuestos_map = OrderService._load_catalog(Repuesto, {rid for rid, _, _ in repuestos_data})
+
             # ==============================================================================
             # DETALLES: SERVICIOS
             # ==============================================================================
-            servicios_data = data.get('servicios', [])
+            detalles_servicios = []
             total_servicios = 0.0
             
-            for item in servicios_data:
-                # Normalización de entrada: Soporta tanto lista de IDs [1, 2] como objetos [{id:1}, {id:2}]
-                if isinstance(item, int):
-                    servicio_id = item
-                    precio_aplicado = None
-                else:
-                    servicio_id = item.get('servicio_id') or item.get('id')
-                    precio_aplicado = item.get('precio_aplicado')
-
-                # Validación
-                servicio = Servicio.query.filter_by(id=servicio_id, activo=True).first()
+            for servicio_id, precio_aplicado in servicios_data:
+                # Validación contra el mapa precargado
+                servicio = servicios_map.get(servicio_id)
                 if not servicio:
                     raise ValueError(f"Servicio con ID {servicio_id} no encontrado")
                 
                 # Determinación de Precio: Prioridad al precio manual, fallback al catálogo.
                 actual_precio = precio_aplicado if precio_aplicado is not None else servicio.precio
                 
-                detalle = OrdenDetalleServicio(
-                    orden_id=new_order.id,
-                    servicio_id=servicio.id,
-                    precio_aplicado=actual_precio
-                )
-                db.session.add(detalle)
+                detalles_servicios.append({
+                    'orden_id': new_order.id,
+                    'servicio_id': servicio.id,
+                    'precio_aplicado': actual_precio
+                })
                 total_servicios += actual_precio
 
             # ==============================================================================
             # DETALLES: REPUESTOS (Gestión de Stock)
             # ==============================================================================
-            repuestos_data = data.get('repuestos', [])
+            detalles_repuestos = []
+            consumo_stock = {}
             total_repuestos = 0.0
             
-            for item in repuestos_data:
-                repuesto_id = item.get('repuesto_id') or item.get('id')
-                cantidad = item.get('cantidad', 1)
-
-                repuesto = Repuesto.query.filter_by(id=repuesto_id, activo=True).first()
+            for repuesto_id, cantidad, precio_unitario in repuestos_data:
+                repuesto = repuestos_map.get(repuesto_id)
                 if not repuesto:
                     raise ValueError(f"Repuesto con ID {repuesto_id} no encontrado")
                 
-                # Lógica de Negocio: Validación estricta de Stock
-                # No permitimos vender lo que no tenemos.
-                if repuesto.stock < cantidad:
+                # Lógica de Negocio: Validación temprana de Stock contra lo leído.
+                # Las líneas repetidas del mismo repuesto se acumulan. La garantía real
+                # la da la reserva atómica de StockService más abajo.
+                consumo_stock[repuesto.id] = consumo_stock.get(repuesto.id, 0) + cantidad
+                if repuesto.stock < consumo_stock[repuesto.id]:
                     raise ValueError(
                         f"Stock insuficiente para '{repuesto.nombre}'. "
-                        f"Disponible: {repuesto.stock}, Solicitado: {cantidad}"
+                        f"Disponible: {repuesto.stock - consumo_stock[repuesto.id] + cantidad}, Solicitado: {cantidad}"
                     )
                 
-                precio_unitario = item.get('precio_unitario_aplicado', repuesto.precio_venta)
+                if precio_unitario is None:
+                    precio_unitario = repuesto.precio_venta
                 
-                detalle = OrdenDetalleRepuesto(
-                    orden_id=new_order.id,
-                    repuesto_id=repuesto.id,
-                    cantidad=cantidad,
-                    precio_unitario_aplicado=precio_unitario
-                )
-                db.session.add(detalle)
-                
-                # Efecto colateral: Descuento de stock en DB
-                repuesto.stock -= cantidad
+                detalles_repuestos.append({
+                    'orden_id': new_order.id,
+                    'repuesto_id': repuesto.id,
+                    'cantidad': cantidad,
+                    'precio_unitario_aplicado': precio_unitario
+                })
                 total_repuestos += (precio_unitario * cantidad)
 
+            # Inserción masiva (executemany) de las líneas de detalle
+            if detalles_servicios:
+                db.session.execute(insert(OrdenDetalleServicio), detalles_servicios)
+            if detalles_repuestos:
+                db.session.execute(insert(OrdenDetalleRepuesto), detalles_repuestos)
+
+            # Efecto colateral: Reserva atómica de stock (UPDATE condicional por repuesto)
+            StockService.reserve_many(consumo_stock)
+
             # Lógica Interna: Cálculo y Persistencia
             new_order.total_estimado = total_servicios + total_repuestos
+            RollupService.apply_order_change(None, RollupService.snapshot_order(new_order))
 
             # Commit final: Si llegamos aquí, todo es válido.
             db.session.commit()
+            ReportService.invalidate_metrics()
+            if consumo_stock:
+                InventoryService.invalidate()
             
             return new_order
 
@@ -205,6 +269,7 @@ class OrderService:
             order = Orden.query.filter_by(id=order_id, activo=True).first()
             if not order:
                 raise ValueError("Orden no encontrada")
+            rollup_antes = RollupService.snapshot_order(order)
 
             # 2. Actualización de campos escalares (Header)
             if 'tecnico_id' in data:
@@ -219,133 +284,140 @@ class OrderService:
             if 'fecha_entrega' in data: order.fecha_entrega = data['fecha_entrega']
             if 'fecha_ingreso' in data: order.fecha_ingreso = data['fecha_ingreso']
 
-            # ==============================================================================
-            # SINCRONIZACIÓN DE SERVICIOS
-            # ==============================================================================
-            if 'servicios' in data:
-                nuevos_servicios = data['servicios']
-                
-                # Normalización a diccionario para búsqueda rápida O(1)
-                nuevos_servicios_map = {}
-                for item in nuevos_servicios:
-                    if isinstance(item, int):
-                         sid = item
-                         nuevos_servicios_map[sid] = {'servicio_id': sid}
-                    else:
-                         sid = item.get('servicio_id') or item.get('id')
-                         nuevos_servicios_map[sid] = item
-                
-                # Mapeo de estado actual en BD
-                servicios_actuales = {d.servicio_id: d for d in order.detalles_servicios}
-                nuevos_ids = set(nuevos_servicios_map.keys())
-
-                # PASO A: Eliminar (Delete)
-                # Si está en BD pero no en la nueva lista, se borra.
-                for servicio_id, detalle in servicios_actuales.items():
-                    if servicio_id not in nuevos_ids:
-                        db.session.delete(detalle)
-                
-                # PASO B: Crear o Actualizar (Upsert logic)
-                for sid, s_data in nuevos_servicios_map.items():
-                    servicio = Servicio.query.filter_by(id=sid, activo=True).first()
-                    if not servicio:
-                         raise ValueError(f"Servicio con ID {sid} no encontrado")
-                    
-                    if sid in servicios_actuales:
-                        # Update: Si ya existe, solo actualizamos precio si cambió
+            # La reconciliación se calcula en memoria: desactivamos el autoflush para que
+            # las cargas de detalles y catálogo no vacíen cambios parciales a mitad del diff.
+            with db.session.no_autoflush:
+                # ==============================================================================
+                # SINCRONIZACIÓN DE SERVICIOS
+                # ==============================================================================
+                if 'servicios' in data:
+                    # Normalización a diccionario para búsqueda rápida O(1)
+                    nuevos_servicios_map = {}
+                    for item in data['servicios']:
+                        sid, _ = OrderService._normalize_servicio_item(item)
+                        nuevos_servicios_map[sid] = {} if isinstance(item, int) else item
+
+                    # Estado actual en BD y catálogo referenciado: una consulta cada uno
+                    servicios_actuales = {d.servicio_id: d for d in order.detalles_servicios}
+                    catalogo = OrderService._load_catalog(Servicio, nuevos_servicios_map.keys())
+
+                    nuevos_ids = set(nuevos_servicios_map)
+                    actuales_ids = set(servicios_actuales)
+
+                    # Validación de todo el catálogo deseado antes de tocar nada
+                    for sid in nuevos_servicios_map:
+                        if sid not in catalogo:
+                            raise ValueError(f"Servicio con ID {sid} no encontrado")
+
+                    # PASO A: Eliminar (Delete) -> en BD pero no en la nueva lista
+                    for sid in actuales_ids - nuevos_ids:
+                        db.session.delete(servicios_actuales[sid])
+
+                    # PASO B: Actualizar -> solo precio si viene explícito
+                    for sid in actuales_ids & nuevos_ids:
+                        s_data = nuevos_servicios_map[sid]
                         if 'precio_aplicado' in s_data:
                             servicios_actuales[sid].precio_aplicado = s_data['precio_aplicado']
-                    else:
-                        # Create: Nuevo registro
-                        precio_aplicado = s_data.get('precio_aplicado', servicio.precio)
-                        nuevo_detalle = OrdenDetalleServicio(
-                            orden_id=order_id,
-                            servicio_id=sid,
-                            precio_aplicado=precio_aplicado
-                        )
-                        db.session.add(nuevo_detalle)
 
-            # ==============================================================================
-            # SINCRONIZACIÓN DE REPUESTOS (Lógica Crítica de Inventario)
-            # ==============================================================================
-            if 'repuestos' in data:
-                nuevos_repuestos = data['repuestos']
-                
-                # Normalización
-                nuevos_repuestos_map = {}
-                for item in nuevos_repuestos:
-                    rid = item.get('repuesto_id') or item.get('id')
-                    nuevos_repuestos_map[rid] = item
-
-                repuestos_actuales = {d.repuesto_id: d for d in order.detalles_repuestos}
-                nuevos_ids = set(nuevos_repuestos_map.keys())
-                
-                # PASO A: Eliminar -> Devolución de Stock
-                # Si quito un repuesto de la orden, debo devolverlo al estante.
-                for rid, detalle in repuestos_actuales.items():
-                    if rid not in nuevos_ids:
-                        repuesto = Repuesto.query.get(rid)
-                        if repuesto:
-                            repuesto.stock += detalle.cantidad # Reembolso
+                    # PASO C: Crear -> inserción masiva
+                    nuevos_detalles = [
+                        {
+                            'orden_id': order_id,
+                            'servicio_id': sid,
+                            'precio_aplicado': nuevos_servicios_map[sid].get('precio_aplicado', catalogo[sid].precio)
+                        }
+                        for sid in nuevos_ids - actuales_ids
+                    ]
+                    if nuevos_detalles:
+                        db.session.execute(insert(OrdenDetalleServicio), nuevos_detalles)
+
+                # ==============================================================================
+                # SINCRONIZACIÓN DE REPUESTOS (Lógica Crítica de Inventario)
+                # ==============================================================================
+                if 'repuestos' in data:
+                    # Normalización
+                    nuevos_repuestos_map = {}
+                    for item in data['repuestos']:
+                        rid, _, _ = OrderService._normalize_repuesto_item(item)
+                        nuevos_repuestos_map[rid] = item
+
+                    repuestos_actuales = {d.repuesto_id: d for d in order.detalles_repuestos}
+                    catalogo = OrderService._load_catalog(Repuesto, nuevos_repuestos_map.keys())
+
+                    nuevos_ids = set(nuevos_repuestos_map)
+                    actuales_ids = set(repuestos_actuales)
+
+                    # Delta de stock a descontar por repuesto (negativo = devolución al estante)
+                    deltas_stock = {}
+
+                    # PASO A: Eliminar -> Devolución de Stock
+                    for rid in actuales_ids - nuevos_ids:
+                        detalle = repuestos_actuales[rid]
+                        deltas_stock[rid] = -detalle.cantidad
                         db.session.delete(detalle)
-                
-                # PASO B: Agregar/Actualizar
-                for rid, r_data in nuevos_repuestos_map.items():
-                    nueva_cantidad = r_data.get('cantidad', 1)
-                    
-                    repuesto = Repuesto.query.filter_by(id=rid, activo=True).first()
-                    if not repuesto:
-                        raise ValueError(f"Repuesto con ID {rid} no encontrado")
-                    
-                    if rid in repuestos_actuales:
-                        # Update: Ajuste diferencial de stock
-                        detalle_actual = repuestos_actuales[rid]
-                        cantidad_actual = detalle_actual.cantidad
-                        diferencia = nueva_cantidad - cantidad_actual
-                        
-                        if diferencia != 0:
-                            # Validar solo si estoy pidiendo MÁS (diferencia positiva)
-                            if diferencia > 0 and repuesto.stock < diferencia:
+
+                    # PASO B: Agregar/Actualizar
+                    nuevos_detalles = []
+                    for rid, r_data in nuevos_repuestos_map.items():
+                        nueva_cantidad = r_data.get('cantidad', 1)
+
+                        repuesto = catalogo.get(rid)
+                        if not repuesto:
+                            raise ValueError(f"Repuesto con ID {rid} no encontrado")
+
+                        if rid in repuestos_actuales:
+                            # Update: Ajuste diferencial de stock
+                            detalle_actual = repuestos_actuales[rid]
+                            diferencia = nueva_cantidad - detalle_actual.cantidad
+
+                            if diferencia != 0:
+                                # Validar solo si estoy pidiendo MÁS (diferencia positiva)
+                                if diferencia > 0 and repuesto.stock < diferencia:
+                                    raise ValueError(
+                                        f"Stock insuficiente para '{repuesto.nombre}'. "
+                                        f"Disponible: {repuesto.stock}, Necesario: {diferencia}"
+                                    )
+                                deltas_stock[rid] = diferencia
+                                detalle_actual.cantidad = nueva_cantidad
+
+                            if 'precio_unitario_aplicado' in r_data:
+                                detalle_actual.precio_unitario_aplicado = r_data['precio_unitario_aplicado']
+
+                        else:
+                            # Create: Nuevo consumo de stock
+                            if repuesto.stock < nueva_cantidad:
                                 raise ValueError(
                                     f"Stock insuficiente para '{repuesto.nombre}'. "
-                                    f"Disponible: {repuesto.stock}, Necesario: {diferencia}"
+                                    f"Disponible: {repuesto.stock}, Solicitado: {nueva_cantidad}"
                                 )
-                            # Si diferencia es negativa (estoy devolviendo), el stock aumenta (menos por menos da mas)
-                            repuesto.stock -= diferencia 
-                            detalle_actual.cantidad = nueva_cantidad
-                        
-                        if 'precio_unitario_aplicado' in r_data:
-                            detalle_actual.precio_unitario_aplicado = r_data['precio_unitario_aplicado']
-                    
-                    else:
-                        # Create: Nuevo consumo de stock
-                        if repuesto.stock < nueva_cantidad:
-                            raise ValueError(
-                                f"Stock insuficiente para '{repuesto.nombre}'. "
-                                f"Disponible: {repuesto.stock}, Solicitado: {nueva_cantidad}"
-                            )
-                        
-                        precio_unitario = r_data.get('precio_unitario_aplicado', repuesto.precio_venta)
-                        
-                        nuevo_detalle = OrdenDetalleRepuesto(
-                            orden_id=order_id,
-                            repuesto_id=rid,
-                            cantidad=nueva_cantidad,
-                            precio_unitario_aplicado=precio_unitario
-                        )
-                        db.session.add(nuevo_detalle)
-                        repuesto.stock -= nueva_cantidad
+
+                            nuevos_detalles.append({
+                                'orden_id': order_id,
+                                'repuesto_id': rid,
+                                'cantidad': nueva_cantidad,
+                                'precio_unitario_aplicado': r_data.get('precio_unitario_aplicado', repuesto.precio_venta)
+                            })
+                            deltas_stock[rid] = nueva_cantidad
+
+                    if nuevos_detalles:
+                        db.session.execute(insert(OrdenDetalleRepuesto), nuevos_detalles)
+
+                    # PASO C: Movimientos de stock: devoluciones en un único UPDATE ... CASE,
+                    # consumos con reserva condicional atómica.
+                    StockService.apply_deltas(deltas_stock)
 
             # 3. Recálculo de Totales Post-Procesamiento
             # Hacemos flush para que las consultas SQL agregadas 'vean' los cambios pendientes en memoria
             db.session.flush()
             OrderService._recalculate_order_total(order)
+            RollupService.apply_order_change(rollup_antes, RollupService.snapshot_order(order))
 
             # 4. Confirmación
+            # El commit expira la instancia: la siguiente lectura trae datos limpios sin refresh explícito.
             db.session.commit()
-            
-            # 5. Refresco para retornar datos limpios
-            db.session.refresh(order)
+            ReportService.invalidate_metrics()
+            if 'repuestos' in data:
+                InventoryService.invalidate()
             return order
 
         except ValueError as e:
@@ -359,6 +431,48 @@ class OrderService:
     # MÉTODOS AUXILIARES Y DE CONSULTA
     # ==============================================================================
 
+    @staticmethod
+    def _normalize_servicio_item(item):
+        """
+        Normaliza una línea de servicio de la petición.
+        Soporta tanto IDs sueltos [1, 2] como objetos [{servicio_id|id, precio_aplicado}].
+        
+        Returns:
+            tuple: (servicio_id, precio_aplicado | None)
+        """
+        if isinstance(item, int):
+            return item, None
+        return item.get('servicio_id') or item.get('id'), item.get('precio_aplicado')
+
+    @staticmethod
+    def _normalize_repuesto_item(item):
+        """
+        Normaliza una línea de repuesto de la petición.
+        
+        Returns:
+            tuple: (repuesto_id, cantidad, precio_unitario_aplicado | None)
+        """
+        repuesto_id = item.get('repuesto_id') or item.get('id')
+        return repuesto_id, item.get('cantidad', 1), item.get('precio_unitario_aplicado')
+
+    @staticmethod
+    def _load_catalog(model, ids):
+        """
+        Carga en una sola consulta (IN) los registros activos del catálogo indicados.
+        
+        Args:
+            model: Clase del catálogo (Servicio o Repuesto).
+            ids (set): IDs referenciados por la orden.
+        
+        Returns:
+            dict: {id: instancia} solo con los registros existentes y activos.
+        """
+        ids = {i for i in ids if i is not None}
+        if not ids:
+            return {}
+        rows = model.query.filter(model.id.in_(ids), model.activo == True).all()
+        return {row.id: row for row in rows}
+
     @staticmethod
     def _recalculate_order_total(order):
         """
@@ -379,61 +493,264 @@ class OrderService:
         order.total_estimado = float(total_servicios) + float(total_repuestos)
 
     @staticmethod
-    def recalculate_all_totals():
+    def recalculate_all_totals(chunk_size=5000):
         """
         Utilidad para mantenimiento: Recalcula los totales de TODAS las órdenes activas.
         Útil si se detectan inconsistencias.
         
+        Consume `iter_recalculate_all_totals` y devuelve solo el resultado final.
+        
         Returns:
             dict: Estadísticas {total, corrected}.
         """
-        orders = Orden.query.filter_by(activo=True).all()
-        count = 0
+        stats = {"total": 0, "corrected": 0}
+        for progress in OrderService.iter_recalculate_all_totals(chunk_size):
+            stats = {"total": progress['total'], "corrected": progress['corrected']}
+        return stats
+
+    @staticmethod
+    def iter_recalculate_all_totals(chunk_size=5000):
+        """
+        Recálculo masivo basado en conjuntos (set-based) con reporte de progreso.
+        
+        Lógica:
+            Los subtotales de servicios y repuestos salen de subconsultas agrupadas
+            (GROUP BY orden_id) y se aplican con UPDATE ... FROM, tocando solo las
+            órdenes cuyo total difiere (> 0.01). `saldo` se ajusta en la misma sentencia.
+            - PostgreSQL/MySQL: una única sentencia para toda la tabla.
+            - SQLite (>= 3.33): bloques de `chunk_size` órdenes por rango de ID, con
+              commit por bloque para no retener el lock de escritura de toda la BD.
+            Si hubo correcciones, la dimensión 'estado' del rollup diario se reconstruye al final.
+        
+        Yields:
+            dict: Progreso {processed, total, corrected}. El último elemento es el resultado final.
+        """
+        total = db.session.query(func.count(Orden.id)).filter(Orden.activo == True).scalar()
         corrected = 0
+
+        if db.session.get_bind().dialect.name != 'sqlite':
+            corrected = OrderService._bulk_recalculate_totals()
+            db.session.commit()
+            if corrected:
+                RollupService.backfill(dimensions=(DIM_ESTADO,))
+                ReportService.invalidate_metrics()
+            yield {"processed": total, "total": total, "corrected": corrected}
+            return
+
+        processed = 0
+        last_id = 0
+        while True:
+            ids = db.session.query(Orden.id)\
+                .filter(Orden.activo == True, Orden.id > last_id)\
+                .order_by(Orden.id)\
+                .limit(chunk_size)\
+                .all()
+            if not ids:
+                break
+
+            first_id, last_id = ids[0].id, ids[-1].id
+            corrected += OrderService._bulk_recalculate_totals(first_id, last_id)
+            db.session.commit()
+
+            processed += len(ids)
+            yield {"processed": processed, "total": total, "corrected": corrected}
+
+        if not processed:
+            yield {"processed": 0, "total": total, "corrected": 0}
+
+        # El UPDATE masivo no pasa por los hooks incrementales: se reconstruye el rollup
+        if corrected:
+            RollupService.backfill(dimensions=(DIM_ESTADO,))
+            ReportService.invalidate_metrics()
+
+    @staticmethod
+    def _bulk_recalculate_totals(first_id=None, last_id=None):
+        """
+        Ejecuta el UPDATE ... FROM de recálculo, opcionalmente limitado a un rango de IDs.
+        No hace commit.
         
-        for order in orders:
-            old_total = order.total_estimado or 0.0
-            
-            # Sumar servicios
-            total_servicios = db.session.query(func.sum(OrdenDetalleServicio.precio_aplicado))\
-                .filter_by(orden_id=order.id).scalar() or 0.0
-                
-            # Sumar repuestos (precio * cantidad)
-            total_repuestos = db.session.query(func.sum(OrdenDetalleRepuesto.precio_unitario_aplicado * OrdenDetalleRepuesto.cantidad))\
-                .filter_by(orden_id=order.id).scalar() or 0.0
-                
-            order.total_estimado = float(total_servicios) + float(total_repuestos)
-            
-            if abs(old_total - order.total_estimado) > 0.01:
-                corrected += 1
-                
-            count += 1
-            
-        db.session.commit()
-        return {"total": count, "corrected": corrected}
+        Returns:
+            int: Órdenes corregidas (filas afectadas).
+        """
+        servicios = db.session.query(
+            OrdenDetalleServicio.orden_id.label('orden_id'),
+            func.sum(OrdenDetalleServicio.precio_aplicado).label('subtotal')
+        )
+        repuestos = db.session.query(
+            OrdenDetalleRepuesto.orden_id.label('orden_id'),
+            func.sum(OrdenDetalleRepuesto.precio_unitario_aplicado * OrdenDetalleRepuesto.cantidad).label('subtotal')
+        )
+        orden = aliased(Orden)
+        ordenes = db.session.query(orden.id.label('id')).filter(orden.activo == True)
+
+        if first_id is not None:
+            servicios = servicios.filter(OrdenDetalleServicio.orden_id.between(first_id, last_id))
+            repuestos = repuestos.filter(OrdenDetalleRepuesto.orden_id.between(first_id, last_id))
+            ordenes = ordenes.filter(orden.id.between(first_id, last_id))
+
+        servicios = servicios.group_by(OrdenDetalleServicio.orden_id).subquery()
+        repuestos = repuestos.group_by(OrdenDetalleRepuesto.orden_id).subquery()
+
+        nuevo_total = func.coalesce(servicios.c.subtotal, 0.0) + func.coalesce(repuestos.c.subtotal, 0.0)
+        totales = ordenes\
+            .outerjoin(servicios, servicios.c.orden_id == orden.id)\
+            .outerjoin(repuestos, repuestos.c.orden_id == orden.id)\
+            .add_columns(nuevo_total.label('total'))\
+            .subquery()
+
+        result = db.session.execute(
+            update(Orden)
+            .where(
+                Orden.id == totales.c.id,
+                func.abs(func.coalesce(Orden.total_estimado, 0.0) - totales.c.total) > 0.01
+            )
+            .values(total_estimado=totales.c.total, saldo=totales.c.total - Orden.total_pagado)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @staticmethod
+    def loader_options(profile='detail'):
+        """
+        Perfiles de carga (Eager Loading) para serializar órdenes con `Orden.to_dict`.
+        
+        Lógica:
+            Todas las relaciones del modelo son lazy=True; sin estas opciones cada
+            fila dispara consultas por auto, cliente, técnico, detalles y pagos.
+            - Relaciones a uno (auto.cliente, técnico): joinedload en la misma consulta.
+              El nombre del estado sale de `reference_data`, sin JOIN.
+            - Colecciones (detalles y pagos): selectinload, una consulta IN por colección
+              para toda la página, sin producto cartesiano.
+        
+        Perfiles:
+            - 'list': Para consultas que ya hacen JOIN con Auto (reutiliza ese join).
+            - 'detail': Para consultas de una orden sin join previo.
+        
+        Returns:
+            list: Opciones para `query.options(*...)`.
+        """
+        colecciones = [
+            selectinload(Orden.detalles_servicios).joinedload(OrdenDetalleServicio.servicio),
+            selectinload(Orden.detalles_repuestos).joinedload(OrdenDetalleRepuesto.repuesto),
+            selectinload(Orden.pagos),
+        ]
+        cabecera = [joinedload(Orden.tecnico)]
+
+        if profile == 'list':
+            return [contains_eager(Orden.auto).joinedload(Auto.cliente)] + cabecera + colecciones
+        if profile == 'detail':
+            return [joinedload(Orden.auto).joinedload(Auto.cliente)] + cabecera + colecciones
+        raise ValueError(f"Perfil de carga desconocido: {profile}")
 
     @staticmethod
     def get_order_by_id(order_id):
         """
-        Obtiene una orden por su ID si está activa.
+        Obtiene una orden por su ID si está activa, con el perfil de carga 'detail'.
         Returns: Orden o None.
         """
-        return Orden.query.filter_by(id=order_id, activo=True).first()
+        return Orden.query.options(*OrderService.loader_options('detail'))\
+            .filter_by(id=order_id, activo=True).first()
 
     @staticmethod
-    def get_all_orders(page=1, per_page=10, estado_id=None, search=None, client_id=None):
+    def get_all_orders(page=1, per_page=10, estado_id=None, search=None, client_id=None,
+                       cursor=None, keyset=False, count='exact'):
         """
         Obtiene órdenes registradas con paginación, filtros y búsqueda.
         
         Parámetros:
-            - search: Busca por placa, marca o modelo (ILIKE).
+            - search: Busca por placa, marca o modelo (índice de texto).
             - client_id: Filtra por dueño del vehículo.
+            - keyset/cursor: Paginación por cursor sobre (fecha_ingreso, id) en lugar de OFFSET.
+            - count: 'exact', 'estimate' o 'none' (ver `count_rows`).
             
         Returns:
-            Pagination: Objeto paginado de Flask-SQLAlchemy.
+            Pagination | KeysetPagination: Objeto paginado.
+            
+        Raises:
+            ValueError: Si el cursor es inválido.
         """
         query = Orden.query.filter_by(activo=True).join(Auto)
+        query = OrderService._apply_list_filters(query, estado_id, search, client_id)
+        total = count_rows(query.with_entities(Orden.id), count)
+        
+        # Perfil 'list': la página completa se serializa en un número constante de consultas.
+        query = query.options(*OrderService.loader_options('list'))
+        
+        if keyset or cursor:
+            pagination = keyset_paginate(query, Orden.fecha_ingreso, Orden.id, 'orders', cursor, per_page)
+        else:
+            # Ordenar por fecha de ingreso descendente (más recientes primero)
+            query = query.order_by(Orden.fecha_ingreso.desc(), Orden.id.desc())
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+        pagination.total = total
+        return pagination
 
+    @staticmethod
+    def get_orders_summary(page=1, per_page=10, estado_id=None, search=None, client_id=None, fields=None,
+                           cursor=None, keyset=False, count='exact'):
+        """
+        Listado de órdenes en modo proyección (vista 'summary').
+        
+        Descripción:
+            Construye la respuesta directamente desde tuplas de columnas de un
+            `db.session.query(...)` estrecho, sin hidratar objetos ORM ni cargar
+            detalles o pagos. El total pagado es la columna desnormalizada de la orden.
+        
+        Args:
+            fields (list, optional): Subconjunto de `SUMMARY_FIELDS`. Default: todos.
+            cursor, keyset, count: Igual que en `get_all_orders`.
+        
+        Returns:
+            tuple: (items: list[dict], pagination: Pagination | KeysetPagination de filas).
+            
+        Raises:
+            ValueError: Si se solicita un campo no disponible o el cursor es inválido.
+        """
+        fields = fields or list(SUMMARY_FIELDS)
+        unknown = [f for f in fields if f not in SUMMARY_FIELDS]
+        if unknown:
+            raise ValueError(
+                f"Campos no disponibles: {', '.join(unknown)}. "
+                f"Permitidos: {', '.join(SUMMARY_FIELDS)}"
+            )
+
+        # Columnas necesarias (deduplicadas por etiqueta, preservando orden).
+        # La clave del cursor siempre se proyecta aunque no se pida en `fields`.
+        columns = {}
+        for field in fields + ['fecha_ingreso', 'id']:
+            for column in SUMMARY_FIELDS[field][0]:
+                columns.setdefault(column.key, column)
+
+        query = db.session.query(*columns.values())\
+            .select_from(Orden)\
+            .join(Auto, Orden.auto_id == Auto.id)\
+            .outerjoin(Cliente, Auto.cliente_id == Cliente.id)\
+            .outerjoin(Usuario, Orden.tecnico_id == Usuario.id)\
+            .filter(Orden.activo == True)
+        query = OrderService._apply_list_filters(query, estado_id, search, client_id)
+
+        if keyset or cursor:
+            pagination = keyset_paginate(query, Orden.fecha_ingreso, Orden.id, 'orders', cursor, per_page)
+        else:
+            query = query.order_by(Orden.fecha_ingreso.desc(), Orden.id.desc())
+            pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+        # El conteo se hace solo sobre los filtros y joins, sin las columnas proyectadas
+        pagination.total = count_rows(query.with_entities(Orden.id), count)
+        items = [
+            {field: SUMMARY_FIELDS[field][1](row) for field in fields}
+            for row in pagination.items
+        ]
+        return items, pagination
+
+    @staticmethod
+    def _apply_list_filters(query, estado_id=None, search=None, client_id=None):
+        """
+        Aplica los filtros comunes del listado de órdenes (requiere JOIN con Auto).
+        
+        Parámetros:
+            - search: Busca por placa, marca o modelo (índice de texto, ver search_index).
+            - client_id: Filtra por dueño del vehículo.
+        """
         if estado_id:
             query = query.filter(Orden.estado_id == estado_id)
         
@@ -441,17 +758,9 @@ class OrderService:
             query = query.filter(Auto.cliente_id == client_id)
         
         if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Auto.placa.ilike(search_term)) |
-                (Auto.marca.ilike(search_term)) |
-                (Auto.modelo.ilike(search_term))
-            )
-        
-        # Ordenar por fecha de ingreso descendente (más recientes primero)
-        query = query.order_by(Orden.fecha_ingreso.desc())
-        
-        return query.paginate(page=page, per_page=per_page, error_out=False)
+            # Índice de texto del vehículo; el listado conserva el orden por fecha
+            query, _ = apply_search(query, Auto, search)
+        return query
 
     @staticmethod
     def update_order_status(order_id, estado_id):
@@ -462,8 +771,11 @@ class OrderService:
         if not order:
             raise ValueError("Orden no encontrada")
 
+        rollup_antes = RollupService.snapshot_order(order)
         order.estado_id = estado_id
+        RollupService.apply_order_change(rollup_antes, RollupService.snapshot_order(order))
         db.session.commit()
+        ReportService.invalidate_metrics()
         return order
 
     # ==============================================================================
@@ -490,6 +802,7 @@ class OrderService:
         order = Orden.query.filter_by(id=order_id, activo=True).first()
         if not order:
             raise ValueError("Orden no encontrada")
+        rollup_antes = RollupService.snapshot_order(order)
 
         servicio = Servicio.query.filter_by(id=servicio_id, activo=True).first()
         if not servicio:
@@ -504,7 +817,9 @@ class OrderService:
         db.session.commit()
 
         OrderService._recalculate_order_total(order)
+        RollupService.apply_order_change(rollup_antes, RollupService.snapshot_order(order))
         db.session.commit()
+        ReportService.invalidate_metrics()
         
         return detalle
 
@@ -514,12 +829,15 @@ class OrderService:
         order = Orden.query.filter_by(id=order_id, activo=True).first()
         if not order:
             raise ValueError("Orden no encontrada")
+        rollup_antes = RollupService.snapshot_order(order)
 
         repuesto = Repuesto.query.filter_by(id=repuesto_id, activo=True).first()
         if not repuesto:
             raise ValueError("Repuesto no encontrado o inactivo")
 
-        if repuesto.stock < cantidad:
+        # Reserva atómica: evita perder actualizaciones entre peticiones concurrentes
+        if not StockService.reserve(repuesto_id, cantidad):
+            db.session.rollback()
             raise ValueError(f"Stock insuficiente para el repuesto {repuesto.nombre}. Disponible: {repuesto.stock}")
 
         detalle = OrdenDetalleRepuesto(
@@ -528,14 +846,15 @@ class OrderService:
             cantidad=cantidad,
             precio_unitario_aplicado=repuesto.precio_venta
         )
-        
-        repuesto.stock -= cantidad
 
         db.session.add(detalle)
         db.session.commit()
 
         OrderService._recalculate_order_total(order)
+        RollupService.apply_order_change(rollup_antes, RollupService.snapshot_order(order))
         db.session.commit()
+        ReportService.invalidate_metrics()
+        InventoryService.invalidate()
         
         return detalle
 
@@ -546,6 +865,9 @@ class OrderService:
         if not order:
             return 0.0
 
+        rollup_antes = RollupService.snapshot_order(order)
         OrderService._recalculate_order_total(order)
+        RollupService.apply_order_change(rollup_antes, RollupService.snapshot_order(order))
         db.session.commit()
+        ReportService.invalidate_metrics()
         return order.total_estimado
@@ -0,0 +1,242 @@
+from app import db
+from app.models import Orden, Pago, Auto, Cliente
+from app.services.rollup_service import RollupService
+from sqlalchemy import func, update, select
+from sqlalchemy.exc import SQLAlchemyError
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Lógica financiera de las órdenes: registro y anulación de pagos, y
+#   mantenimiento de los totales desnormalizados `ordenes.total_pagado` y `ordenes.saldo`.
+#
+# Flujo Lógico Central:
+#   1. Registro: INSERT del Pago + UPDATE atómico e incremental de la orden
+#        UPDATE ordenes SET total_pagado = total_pagado + :m, saldo = saldo - :m
+#        WHERE id = :id AND saldo >= :m - tolerancia
+#      El WHERE impide sobrepagos aunque dos cajas cobren la misma orden a la vez.
+#   2. Anulación: Soft delete condicional del Pago (UPDATE ... WHERE activo) + UPDATE
+#      incremental inverso, solo si la anulación afectó la fila.
+#      Ambas operaciones actualizan el rollup diario (`daily_metrics`) en la misma transacción.
+#   3. Historial: consulta Pago -> Orden -> Auto -> Cliente compartida por el listado JSON
+#      y la exportación en streaming (NDJSON/CSV con `yield_per`, memoria constante).
+#   4. Verificador de consistencia: recalcula desde `pagos` con una subconsulta
+#      agrupada y, opcionalmente, reconstruye las columnas desfasadas.
+#
+# Interacciones:
+#   - Modelos: Orden, Pago, Auto, Cliente.
+#   - Servicios: RollupService (métricas diarias por método de pago).
+#   - Llamado por: `routes/payments.py`.
+# ==============================================================================
+
+# Tolerancia de punto flotante para comparar montos (centavos)
+TOLERANCIA = 0.01
+
+class PaymentService:
+    """
+    Servicio de Dominio: Pagos y balance financiero de las órdenes.
+    """
+
+    @staticmethod
+    def register_payment(orden_id, monto, metodo_pago, referencia, usuario_id, fecha_pago):
+        """
+        Registra un pago y actualiza de forma incremental los totales de la orden.
+
+        Args:
+            orden_id (int): ID de la orden.
+            monto (float): Monto validado (> 0).
+            metodo_pago (str): Efectivo, Tarjeta, Transferencia, etc.
+            referencia (str): Nro de operación o nota.
+            usuario_id (int): Usuario que cobra.
+            fecha_pago (datetime): Momento del cobro.
+
+        Returns:
+            Pago: El pago persistido.
+
+        Raises:
+            ValueError: Si el monto excede el saldo pendiente en BD.
+        """
+        try:
+            result = db.session.execute(
+                update(Orden)
+                .where(Orden.id == orden_id, Orden.saldo >= monto - TOLERANCIA)
+                .values(total_pagado=Orden.total_pagado + monto, saldo=Orden.saldo - monto)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                raise ValueError("El monto del pago excede el saldo pendiente")
+
+            nuevo_pago = Pago(
+                orden_id=orden_id,
+                monto=monto,
+                metodo_pago=metodo_pago,
+                referencia=referencia,
+                fecha_pago=fecha_pago,
+                usuario_id=usuario_id,
+                activo=True
+            )
+            db.session.add(nuevo_pago)
+            RollupService.record_payment(fecha_pago, metodo_pago, monto)
+            db.session.commit()
+            return nuevo_pago
+
+        except ValueError as e:
+            db.session.rollback()
+            raise e
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error en la base de datos: {str(e)}")
+
+    @staticmethod
+    def deactivate_payment(pago_id):
+        """
+        Anula (Soft Delete) un pago y devuelve su monto al saldo de la orden.
+
+        Returns:
+            Pago: El pago anulado.
+
+        Raises:
+            ValueError: Si el pago no existe o ya estaba anulado.
+        """
+        try:
+            pago = Pago.query.filter_by(id=pago_id, activo=True).first()
+            if not pago:
+                raise ValueError("Pago no encontrado o ya anulado")
+
+            # Reclamo atómico: solo una anulación concurrente del mismo pago afecta la fila.
+            # Las demás ven rowcount 0 y no devuelven el monto ni tocan el rollup por segunda vez.
+            result = db.session.execute(
+                update(Pago)
+                .where(Pago.id == pago_id, Pago.activo == True)
+                .values(activo=False)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                raise ValueError("Pago no encontrado o ya anulado")
+
+            db.session.execute(
+                update(Orden)
+                .where(Orden.id == pago.orden_id)
+                .values(total_pagado=Orden.total_pagado - pago.monto, saldo=Orden.saldo + pago.monto)
+                .execution_options(synchronize_session=False)
+            )
+            RollupService.record_payment(pago.fecha_pago, pago.metodo_pago, pago.monto, sign=-1)
+            db.session.commit()
+            return pago
+
+        except ValueError as e:
+            db.session.rollback()
+            raise e
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise Exception(f"Error en la base de datos: {str(e)}")
+
+    # ==============================================================================
+    # HISTORIAL Y EXPORTACIÓN
+    # ==============================================================================
+
+    # Columnas del historial en el orden de la exportación CSV
+    HISTORY_FIELDS = ['id', 'orden_id', 'monto', 'metodo_pago', 'referencia', 'fecha_pago', 'cliente_nombre', 'placa']
+
+    @staticmethod
+    def history_query(fecha_inicio=None, fecha_fin=None):
+        """
+        Consulta del historial de pagos activos con contexto de Cliente y Auto.
+
+        Returns:
+            Query: Filas (id, orden_id, monto, ..., placa) ordenadas por fecha descendente.
+        """
+        query = db.session.query(
+            Pago.id,
+            Pago.orden_id,
+            Pago.monto,
+            Pago.metodo_pago,
+            Pago.referencia,
+            Pago.fecha_pago,
+            Cliente.nombre.label('cliente_nombre'),
+            Cliente.apellido_p.label('cliente_apellido'),
+            Auto.placa
+        ).join(
+            Orden, Pago.orden_id == Orden.id
+        ).join(
+            Auto, Orden.auto_id == Auto.id
+        ).join(
+            Cliente, Auto.cliente_id == Cliente.id
+        ).filter(
+            Pago.activo == True
+        )
+
+        if fecha_inicio:
+            query = query.filter(Pago.fecha_pago >= fecha_inicio)
+        if fecha_fin:
+            query = query.filter(Pago.fecha_pago <= fecha_fin)
+
+        return query.order_by(Pago.fecha_pago.desc(), Pago.id.desc())
+
+    @staticmethod
+    def serialize_history_row(p):
+        """Fila del historial -> dict JSON."""
+        return {
+            'id': p.id,
+            'orden_id': p.orden_id,
+            'monto': float(p.monto),
+            'metodo_pago': p.metodo_pago,
+            'referencia': p.referencia or '',
+            'fecha_pago': p.fecha_pago.isoformat() if p.fecha_pago else None,
+            'cliente_nombre': f"{p.cliente_nombre} {p.cliente_apellido or ''}".strip(),
+            'placa': p.placa
+        }
+
+    @staticmethod
+    def iter_history(fecha_inicio=None, fecha_fin=None, batch_size=1000):
+        """
+        Recorre el historial completo en lotes sin cargarlo en memoria.
+
+        Lógica:
+            `yield_per` activa `stream_results`: en PostgreSQL se usa un cursor del lado
+            del servidor y solo `batch_size` filas viven a la vez en el proceso.
+
+        Yields:
+            dict: Pago serializado (`serialize_history_row`).
+        """
+        for row in PaymentService.history_query(fecha_inicio, fecha_fin).yield_per(batch_size):
+            yield PaymentService.serialize_history_row(row)
+
+    @staticmethod
+    def check_payment_totals(repair=False):
+        """
+        Verificador de consistencia de `total_pagado` / `saldo` contra la tabla `pagos`.
+
+        Lógica:
+            Una subconsulta agrupada (SUM de pagos activos por orden) se compara con las
+            columnas desnormalizadas. Con `repair=True` las órdenes desfasadas se
+            reconstruyen con un único UPDATE. Útil tras migraciones o cargas manuales.
+
+        Returns:
+            dict: Estadísticas {total, inconsistent, repaired}.
+        """
+        pagado_real = select(func.coalesce(func.sum(Pago.monto), 0.0))\
+            .where(Pago.orden_id == Orden.id, Pago.activo == True)\
+            .correlate(Orden)\
+            .scalar_subquery()
+        saldo_real = func.coalesce(Orden.total_estimado, 0.0) - pagado_real
+
+        desfasadas = (func.abs(Orden.total_pagado - pagado_real) > TOLERANCIA) | \
+                     (func.abs(Orden.saldo - saldo_real) > TOLERANCIA)
+
+        total = db.session.query(func.count(Orden.id)).scalar()
+        inconsistent = db.session.query(func.count(Orden.id)).filter(desfasadas).scalar()
+
+        repaired = 0
+        if repair and inconsistent:
+            result = db.session.execute(
+                update(Orden)
+                .where(desfasadas)
+                .values(total_pagado=pagado_real, saldo=saldo_real)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            repaired = result.rowcount
+
+        return {"total": total, "inconsistent": inconsistent, "repaired": repaired}
@@ -1,6 +1,6 @@
-from app import db
-from app.models import Orden, EstadoOrden
-from sqlalchemy import func, extract
+from app import cache, reference_data
+from flask import current_app
+from app.services.rollup_service import RollupService, DIM_ESTADO, DIM_METODO_PAGO
 from datetime import datetime
 
 # ==============================================================================
@@ -12,30 +12,127 @@ from datetime import datetime
 #   los controladores.
 #
 # Flujo Lógico:
-#   1. Agregación de datos por períodos (mes actual).
-#   2. Filtrado complejo (por estado, fechas).
+#   1. Agregación de datos por períodos (mes actual) con rangos de fecha semiabiertos.
+#   2. Lectura del rollup diario (`daily_metrics`): un rango de N días suma como mucho
+#      N x estados filas, sin importar cuántas órdenes contenga.
 #   3. Transformación de datos crudos SQL a estructuras JSON-friendly para el Dashboard.
+#   4. Caché con TTL (namespace `metrics`): las escrituras de órdenes y pagos llaman a
+#      `invalidate_metrics()` tras su commit, así un hit nunca sirve datos ya modificados
+#      en este proceso; el TTL acota el desfase entre workers con caché en memoria.
 #
 # Interacciones:
-#   - Interactúa con Modelos: Orden, EstadoOrden.
+#   - Nombres de estados: `app.reference_data` (sin consultar `estados_orden`).
+#   - Delega la agregación a: `RollupService`.
+#   - Caché: `app.cache` (ver `utils/cache.py`).
 #   - Llamado por: `routes/reports.py`.
 # ==============================================================================
 
+# Namespace de caché compartido por todos los KPIs derivados de órdenes y pagos
+METRICS_CACHE = 'metrics'
+
 class ReportService:
     """
     Servicio de Analytics y Reportes.
     Provee métodos estáticos puros para extracción de métricas.
     """
 
+    # Estados que cuentan como ingreso comprometido (trabajo en ejecución o cerrado)
+    ESTADOS_INGRESO = ('En Proceso', 'Finalizado', 'Entregado', 'Completado')
+
+    @staticmethod
+    def month_range(year=None, month=None):
+        """
+        Rango semiabierto [inicio, fin) del mes indicado (default: mes en curso, UTC).
+
+        Filtrar con `fecha_ingreso >= inicio AND fecha_ingreso < fin` es sargable:
+        usa el índice sobre la columna, a diferencia de EXTRACT(month/year ...).
+
+        Returns:
+            tuple: (datetime inicio, datetime fin)
+        """
+        now = datetime.utcnow()
+        year = year or now.year
+        month = month or now.month
+
+        start = datetime(year, month, 1)
+        end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+        return start, end
+
     @staticmethod
-    def get_monthly_metrics():
+    def get_monthly_metrics(year=None, month=None):
         """
         Calcula las métricas clave (KPIs) del mes en curso para el Dashboard.
+        El resultado se cachea por mes durante `DASHBOARD_CACHE_TTL` segundos.
+
+        Args:
+            year (int, optional): Año a consultar. Default: actual.
+            month (int, optional): Mes a consultar (1-12). Default: actual.
+
+        Returns:
+            dict: Ver `get_metrics_range`.
+        """
+        start, end = ReportService.month_range(year, month)
+        return cache.get_or_set(
+            METRICS_CACHE,
+            f"dashboard:{start:%Y-%m}",
+            lambda: ReportService.get_metrics_range(start.date(), end.date()),
+            ttl=current_app.config.get('DASHBOARD_CACHE_TTL')
+        )
+
+    @staticmethod
+    def get_revenue_summary(start=None, end=None):
+        """
+        Ingresos cobrados en el rango de días [start, end), desde el rollup por método de pago.
+        Cacheado como los KPIs del Dashboard.
+
+        Returns:
+            dict: {total_ingresos, total_pagos, por_metodo_pago: {metodo: {total, pagos}}}
+        """
+        def load():
+            por_metodo = {}
+            total_ingresos, total_pagos = 0.0, 0
+            for _, metodo, cantidad, monto in RollupService.totals(start, end, DIM_METODO_PAGO):
+                if not cantidad:
+                    continue
+                por_metodo[metodo] = {'total': float(monto or 0.0), 'pagos': int(cantidad)}
+                total_ingresos += float(monto or 0.0)
+                total_pagos += int(cantidad)
+
+            return {
+                'total_ingresos': total_ingresos,
+                'total_pagos': total_pagos,
+                'por_metodo_pago': por_metodo
+            }
+
+        return cache.get_or_set(
+            METRICS_CACHE,
+            f"revenue:{start}:{end}",
+            load,
+            ttl=current_app.config.get('DASHBOARD_CACHE_TTL')
+        )
+
+    @staticmethod
+    def invalidate_metrics():
+        """
+        Descarta los KPIs cacheados. Llamar después del commit de cualquier
+        escritura que afecte órdenes o pagos.
+        """
+        cache.invalidate(METRICS_CACHE)
+
+    @staticmethod
+    def get_metrics_range(start, end):
+        """
+        Calcula los KPIs del Dashboard para el rango de días [start, end).
 
         Lógica de Cálculo:
-        - Total Ordenes: Conteo simple.
-        - Ingresos Estimados: Suma de `total_estimado` para ordenes activas (En Proceso, Finalizadas, etc.).
-        - Distribución: Agrupación (Group By) por estado.
+        - Lee el rollup diario (dimensión 'estado') en lugar de escanear `ordenes`.
+        - Total Ordenes: Suma de los conteos por estado.
+        - Ingresos Estimados: Suma de `total_estimado` de los estados de `ESTADOS_INGRESO`.
+        - Distribución: Conteo por estado (se omiten los buckets que quedaron en 0).
+
+        Args:
+            start (date): Primer día incluido.
+            end (date): Día excluido.
 
         Returns:
             dict: {
@@ -44,38 +141,25 @@ class ReportService:
                 "orders_by_status": dict {estado: count}
             }
         """
-        now = datetime.utcnow()
-        current_month = now.month
-        current_year = now.year
-
-        # 1. Total de órdenes del mes actual
-        # Query: COUNT(id) WHERE mes = actual AND año = actual
-        total_orders_month = db.session.query(func.count(Orden.id))\
-            .filter(extract('month', Orden.fecha_ingreso) == current_month)\
-            .filter(extract('year', Orden.fecha_ingreso) == current_year)\
-            .scalar()
-
-        # 2. Ingreso estimado (Pipeline de Ventas)
-        # Sumamos el potencial de todas las órdenes en curso o cerradas.
-        # FIX: Incluimos 'En Proceso' porque representa trabajo ya comprometido/en ejecución.
-        estimated_income = db.session.query(func.sum(Orden.total_estimado))\
-            .join(EstadoOrden)\
-            .filter(EstadoOrden.nombre_estado.in_(['En Proceso', 'Finalizado', 'Entregado', 'Completado']))\
-            .scalar()
-        
-        # Manejo de nulos (Si no hay registros, sum() retorna None en SQL)
-        if estimated_income is None:
-            estimated_income = 0.0
-
-        # 3. Distribución de carga de trabajo
-        # Query: SELECT estado, COUNT(*) FROM orden GROUP BY estado
-        orders_by_status_query = db.session.query(EstadoOrden.nombre_estado, func.count(Orden.id))\
-            .join(Orden)\
-            .group_by(EstadoOrden.nombre_estado)\
-            .all()
-        
-        # Transformación de datos: [('Pendiente', 5)] -> {'Pendiente': 5}
-        orders_by_status = {status: count for status, count in orders_by_status_query}
+        rows = RollupService.totals(start, end, DIM_ESTADO)
+        nombres = {str(estado_id): nombre for estado_id, nombre in reference_data.estado_names().items()}
+
+        total_orders_month = 0
+        estimated_income = 0.0
+        orders_by_status = {}
+
+        # Transformación de datos: [('estado', '1', 5, 120.0)] -> KPIs
+        for _, clave, count, income in rows:
+            count = int(count or 0)
+            if not count:
+                continue
+            status = nombres.get(clave)
+            total_orders_month += count
+            if status in ReportService.ESTADOS_INGRESO:
+                # Manejo de nulos (sum() retorna None si no hay valores)
+                estimated_income += float(income or 0.0)
+            if status is not None:
+                orders_by_status[status] = count
 
         return {
             "total_orders_month": total_orders_month,
@@ -0,0 +1,246 @@
+from app import db
+from app.models import MetricaDiaria, Orden, Pago
+from sqlalchemy import func, cast, insert, update, select, literal
+from datetime import date, datetime, timedelta
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Mantiene la tabla `daily_metrics` (rollup diario) para que los reportes
+#   respondan rangos de fechas arbitrarios sumando unos cientos de filas
+#   en lugar de escanear años de órdenes y pagos.
+#
+# Flujo Lógico Central:
+#   1. Escrituras de órdenes/pagos llaman a `apply_order_change` / `record_payment`
+#      dentro de su transacción (sin commit propio).
+#   2. Cada cambio se traduce en incrementos (+cantidad, +monto) sobre la fila
+#      (fecha, dimensión, clave) mediante un UPSERT atómico.
+#   3. `backfill` reconstruye un rango completo con INSERT ... SELECT agrupado.
+#
+# Interacciones:
+#   - Modelos: MetricaDiaria, Orden, Pago.
+#   - Llamado por: OrderService, PaymentService, ReportService, `backfill_metrics.py`.
+# ==============================================================================
+
+DIM_ESTADO = 'estado'
+DIM_METODO_PAGO = 'metodo_pago'
+
+class RollupService:
+    """
+    Servicio de mantenimiento y lectura del rollup diario de métricas.
+    """
+
+    # ==============================================================================
+    # MANTENIMIENTO INCREMENTAL
+    # ==============================================================================
+
+    @staticmethod
+    def snapshot_order(orden):
+        """
+        Captura la parte de la orden que alimenta el rollup.
+
+        Returns:
+            tuple: (día, estado_id, total_estimado) o None si la orden no cuenta (inactiva).
+        """
+        if orden is None or orden.activo is False:
+            return None
+        return (
+            RollupService._to_day(orden.fecha_ingreso),
+            orden.estado_id,
+            float(orden.total_estimado or 0.0)
+        )
+
+    @staticmethod
+    def apply_order_change(before, after):
+        """
+        Traslada una orden entre buckets del rollup (alta, cambio de estado/fecha/total).
+
+        Args:
+            before (tuple | None): `snapshot_order` previo al cambio (None = orden nueva).
+            after (tuple | None): `snapshot_order` posterior al cambio.
+        """
+        if before == after:
+            return
+        if before is not None:
+            day, estado_id, total = before
+            RollupService._bump(day, DIM_ESTADO, estado_id, -1, -total)
+        if after is not None:
+            day, estado_id, total = after
+            RollupService._bump(day, DIM_ESTADO, estado_id, 1, total)
+
+    @staticmethod
+    def record_payment(fecha_pago, metodo_pago, monto, sign=1):
+        """
+        Registra (sign=1) o revierte (sign=-1) un pago en el rollup.
+        """
+        RollupService._bump(RollupService._to_day(fecha_pago), DIM_METODO_PAGO, metodo_pago, sign, sign * monto)
+
+    # ==============================================================================
+    # RECONSTRUCCIÓN (Backfill)
+    # ==============================================================================
+
+    @staticmethod
+    def backfill(start=None, end=None, dimensions=(DIM_ESTADO, DIM_METODO_PAGO)):
+        """
+        Reconstruye el rollup del rango [start, end) desde las tablas transaccionales.
+
+        Lógica:
+            DELETE de las filas del rango + INSERT ... SELECT con GROUP BY día/clave.
+            Hace commit al finalizar.
+
+        Args:
+            start (date, optional): Primer día incluido. Default: sin límite.
+            end (date, optional): Día excluido. Default: sin límite.
+            dimensions (tuple): Dimensiones a reconstruir.
+
+        Returns:
+            dict: {dimension: filas insertadas}.
+        """
+        stats = {}
+        for dimension in dimensions:
+            delete_query = MetricaDiaria.query.filter(MetricaDiaria.dimension == dimension)
+            if start:
+                delete_query = delete_query.filter(MetricaDiaria.fecha >= start)
+            if end:
+                delete_query = delete_query.filter(MetricaDiaria.fecha < end)
+            delete_query.delete(synchronize_session=False)
+
+            if dimension == DIM_ESTADO:
+                fecha_col, clave_col = Orden.fecha_ingreso, Orden.estado_id
+                source = select().select_from(Orden).where(Orden.activo == True)
+                cantidad, monto = func.count(Orden.id), func.sum(func.coalesce(Orden.total_estimado, 0.0))
+            else:
+                fecha_col, clave_col = Pago.fecha_pago, Pago.metodo_pago
+                source = select().select_from(Pago).where(Pago.activo == True)
+                cantidad, monto = func.count(Pago.id), func.sum(Pago.monto)
+
+            if start:
+                source = source.where(fecha_col >= datetime.combine(start, datetime.min.time()))
+            if end:
+                source = source.where(fecha_col < datetime.combine(end, datetime.min.time()))
+
+            dia = func.date(fecha_col)
+            clave = func.coalesce(cast(clave_col, db.String), '')
+            source = source.add_columns(dia, literal(dimension), clave, cantidad, monto)\
+                .where(fecha_col.isnot(None))\
+                .group_by(dia, clave)
+
+            result = db.session.execute(
+                insert(MetricaDiaria).from_select(
+                    ['fecha', 'dimension', 'clave', 'cantidad', 'monto'], source
+                )
+            )
+            stats[dimension] = result.rowcount
+
+        db.session.commit()
+        return stats
+
+    # ==============================================================================
+    # LECTURA
+    # ==============================================================================
+
+    @staticmethod
+    def totals(start=None, end=None, dimension=None):
+        """
+        Suma el rollup en el rango [start, end) agrupando por dimensión y clave.
+
+        Returns:
+            list: Filas (dimension, clave, cantidad, monto).
+        """
+        query = db.session.query(
+            MetricaDiaria.dimension,
+            MetricaDiaria.clave,
+            func.sum(MetricaDiaria.cantidad).label('cantidad'),
+            func.sum(MetricaDiaria.monto).label('monto')
+        )
+        if dimension:
+            query = query.filter(MetricaDiaria.dimension == dimension)
+        if start:
+            query = query.filter(MetricaDiaria.fecha >= start)
+        if end:
+            query = query.filter(MetricaDiaria.fecha < end)
+        return query.group_by(MetricaDiaria.dimension, MetricaDiaria.clave).all()
+
+    @staticmethod
+    def parse_day_range(fecha_inicio=None, fecha_fin=None):
+        """
+        Convierte filtros 'YYYY-MM-DD' (fin inclusivo) al rango semiabierto de días.
+
+        Returns:
+            tuple | None: (start, end) en días, o None si algún filtro trae hora
+                          (el rollup diario no puede responderlo con exactitud).
+        """
+        days = []
+        for value in (fecha_inicio, fecha_fin):
+            if not value:
+                days.append(None)
+                continue
+            try:
+                days.append(date.fromisoformat(value))
+            except ValueError:
+                return None
+
+        start, end = days
+        return start, (end + timedelta(days=1) if end else None)
+
+    # ==============================================================================
+    # MÉTODOS AUXILIARES
+    # ==============================================================================
+
+    @staticmethod
+    def _bump(day, dimension, clave, cantidad, monto):
+        """
+        UPSERT atómico: suma (cantidad, monto) a la fila (día, dimensión, clave).
+        No hace commit.
+        """
+        if day is None:
+            return
+        clave = '' if clave is None else str(clave)
+        dialect = db.session.get_bind().dialect.name
+
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert as upsert
+            else:
+                from sqlalchemy.dialects.sqlite import insert as upsert
+
+            stmt = upsert(MetricaDiaria).values(
+                fecha=day, dimension=dimension, clave=clave, cantidad=cantidad, monto=monto
+            )
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=['fecha', 'dimension', 'clave'],
+                set_={
+                    'cantidad': MetricaDiaria.cantidad + stmt.excluded.cantidad,
+                    'monto': MetricaDiaria.monto + stmt.excluded.monto
+                }
+            ))
+            return
+
+        # Otros motores: UPDATE y, si la fila aún no existe, INSERT
+        result = db.session.execute(
+            update(MetricaDiaria)
+            .where(MetricaDiaria.fecha == day, MetricaDiaria.dimension == dimension, MetricaDiaria.clave == clave)
+            .values(cantidad=MetricaDiaria.cantidad + cantidad, monto=MetricaDiaria.monto + monto)
+            .execution_options(synchronize_session=False)
+        )
+        if not result.rowcount:
+            db.session.execute(insert(MetricaDiaria).values(
+                fecha=day, dimension=dimension, clave=clave, cantidad=cantidad, monto=monto
+            ))
+
+    @staticmethod
+    def _to_day(value):
+        """
+        Normaliza datetime/date/str ISO a `date` (las fechas pueden llegar como texto del JSON).
+        """
+        if value is None:
+            return None
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        try:
+            return datetime.fromisoformat(str(value)).date()
+        except ValueError:
+            return date.fromisoformat(str(value)[:10])
@@ -0,0 +1,196 @@
+from app import db
+from app.models import Repuesto
+from flask import current_app
+from sqlalchemy import update, case
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Capa de Reserva de Stock para el inventario de Repuestos.
+#   Garantiza que varias peticiones concurrentes (varios workers de gunicorn)
+#   no vendan más unidades de las que existen, sin bloquear la tabla completa.
+#
+# Flujo Lógico Central:
+#   1. Reserva: UPDATE condicional atómico
+#        UPDATE repuestos SET stock = stock - :n WHERE id = :id AND stock >= :n
+#      Si la fila no resulta afectada, otra transacción se llevó el stock -> se rechaza.
+#      Con soporte de RETURNING, todos los repuestos se reservan en una sola sentencia.
+#   2. Devolución: UPDATE ... CASE único (sumar stock nunca puede fallar).
+#   3. (Opcional, PostgreSQL) Pre-bloqueo con SELECT ... FOR UPDATE SKIP LOCKED
+#      para rechazar rápido en lugar de esperar a otra transacción.
+#
+# Notas:
+#   - Ninguna operación hace commit: se ejecutan dentro de la transacción del llamador,
+#     que es quien hace rollback si se lanza ValueError.
+#   - Los bloqueos de fila se toman en orden ascendente de ID para evitar deadlocks
+#     entre órdenes que comparten repuestos: la reserva fila a fila recorre los IDs
+#     ordenados y, antes del UPDATE ... IN (...) único (cuyo orden de bloqueo depende
+#     del plan), `_lock_parts` hace SELECT ... ORDER BY id FOR UPDATE.
+#
+# Interacciones:
+#   - Modelo: Repuesto.
+#   - Llamado por: `services/order_service.py`.
+# ==============================================================================
+
+class StockService:
+    """
+    Servicio de Dominio: Reserva y devolución atómica de stock de repuestos.
+    """
+
+    @staticmethod
+    def reserve(repuesto_id, cantidad):
+        """
+        Descuenta stock de un repuesto solo si hay suficiente disponible.
+
+        Args:
+            repuesto_id (int): ID del repuesto.
+            cantidad (int): Unidades a reservar.
+
+        Returns:
+            int: Filas afectadas (1 si la reserva se aplicó, 0 si no había stock).
+        """
+        result = db.session.execute(
+            update(Repuesto)
+            .where(Repuesto.id == repuesto_id, Repuesto.stock >= cantidad)
+            .values(stock=Repuesto.stock - cantidad)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @staticmethod
+    def reserve_many(cantidades):
+        """
+        Reserva stock para varios repuestos dentro de la transacción actual.
+
+        Lógica:
+            Si el motor soporta UPDATE ... RETURNING (PostgreSQL, SQLite >= 3.35) se usa
+            una única sentencia condicional con CASE y se comparan los IDs devueltos
+            con los solicitados. En otro caso se aplica un UPDATE condicional por repuesto.
+
+        Args:
+            cantidades (dict): {repuesto_id: cantidad_a_descontar}.
+
+        Raises:
+            ValueError: Si algún repuesto no tiene stock suficiente (o está bloqueado
+                        por otra operación en modo SKIP LOCKED). El llamador debe hacer rollback.
+        """
+        cantidades = {rid: n for rid, n in cantidades.items() if n > 0}
+        if not cantidades:
+            return
+
+        StockService._lock_parts(cantidades.keys())
+
+        if db.session.get_bind().dialect.update_returning:
+            cantidad_case = case(cantidades, value=Repuesto.id)
+            reservados = db.session.execute(
+                update(Repuesto)
+                .where(Repuesto.id.in_(cantidades.keys()), Repuesto.stock >= cantidad_case)
+                .values(stock=Repuesto.stock - cantidad_case)
+                .returning(Repuesto.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+
+            fallidos = set(cantidades) - set(reservados)
+            if fallidos:
+                rid = min(fallidos)
+                raise StockService._insufficient_stock_error(rid, cantidades[rid])
+            return
+
+        for rid in sorted(cantidades):
+            if not StockService.reserve(rid, cantidades[rid]):
+                raise StockService._insufficient_stock_error(rid, cantidades[rid])
+
+    @staticmethod
+    def release_many(cantidades):
+        """
+        Devuelve stock al inventario para varios repuestos en una sola sentencia.
+
+        Lógica:
+            UPDATE repuestos SET stock = stock + CASE id WHEN :id THEN :n ... END
+            WHERE id IN (...).
+
+        Args:
+            cantidades (dict): {repuesto_id: cantidad_a_devolver}.
+        """
+        cantidades = {rid: n for rid, n in cantidades.items() if n > 0}
+        if not cantidades:
+            return
+
+        db.session.execute(
+            update(Repuesto)
+            .where(Repuesto.id.in_(cantidades.keys()))
+            .values(stock=Repuesto.stock + case(cantidades, value=Repuesto.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def apply_deltas(deltas):
+        """
+        Aplica movimientos de stock mixtos (consumos y devoluciones).
+
+        Primero devuelve (deltas negativos) y luego reserva (deltas positivos),
+        de modo que una devolución en la misma edición libere stock antes de consumir.
+
+        Args:
+            deltas (dict): {repuesto_id: cantidad_a_descontar}. Negativo = devolución.
+
+        Raises:
+            ValueError: Si algún consumo no puede reservarse.
+        """
+        StockService.release_many({rid: -d for rid, d in deltas.items() if d < 0})
+        StockService.reserve_many({rid: d for rid, d in deltas.items() if d > 0})
+
+    # ==============================================================================
+    # MÉTODOS AUXILIARES
+    # ==============================================================================
+
+    @staticmethod
+    def _lock_parts(ids):
+        """
+        Bloquea las filas de repuestos en orden ascendente de ID antes de reservar.
+
+        - `STOCK_SKIP_LOCKED` activo (solo PostgreSQL): SELECT ... FOR UPDATE SKIP LOCKED;
+          si otra transacción ya tiene alguna fila bloqueada, se rechaza de inmediato
+          en vez de esperar a que termine.
+        - Si no, con varios repuestos y la reserva en una sola sentencia (RETURNING):
+          SELECT ... ORDER BY id FOR UPDATE (espera). El UPDATE ... IN (...) no garantiza
+          el orden en que bloquea las filas y dos órdenes con repuestos en común podrían
+          bloquearse mutuamente.
+        - SQLite no bloquea filas (un único escritor por BD): no hace nada.
+        """
+        dialect = db.session.get_bind().dialect
+        if dialect.name == 'sqlite':
+            return
+
+        ids = set(ids)
+        skip_locked = bool(current_app.config.get('STOCK_SKIP_LOCKED')) and dialect.name == 'postgresql'
+        if not skip_locked and (len(ids) < 2 or not dialect.update_returning):
+            return
+
+        locked = db.session.execute(
+            db.select(Repuesto.id)
+            .where(Repuesto.id.in_(ids))
+            .order_by(Repuesto.id)
+            .with_for_update(skip_locked=skip_locked)
+        ).scalars().all()
+
+        busy = ids - set(locked)
+        if skip_locked and busy:
+            raise ValueError(
+                f"Repuesto con ID {min(busy)} está siendo reservado por otra operación. Intente nuevamente"
+            )
+
+    @staticmethod
+    def _insufficient_stock_error(repuesto_id, solicitado):
+        """
+        Construye el error de stock insuficiente leyendo el stock vigente en BD
+        (la fila no fue modificada porque el UPDATE condicional no la afectó).
+        """
+        row = db.session.query(Repuesto.nombre, Repuesto.stock).filter(Repuesto.id == repuesto_id).first()
+        if not row:
+            return ValueError(f"Repuesto con ID {repuesto_id} no encontrado")
+        return ValueError(
+            f"Stock insuficiente para '{row.nombre}'. "
+            f"Disponible: {row.stock}, Solicitado: {solicitado}"
+        )
@@ -0,0 +1,160 @@
+import json
+import os
+import tempfile
+import threading
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Documentación OpenAPI (/apidocs/, /apispec.json) sin cargar Flasgger ni parsear
+#   `openapi.yaml` durante el arranque de cada worker.
+#
+# Flujo Lógico Central:
+#   1. Spec precompilada: `openapi.yaml` se parsea una vez y se guarda como JSON
+#      (`OPENAPI_CACHE_PATH`, default instance/openapi.json) junto con el mtime y el
+#      tamaño del YAML. Mientras el YAML no cambie, cargar la spec es un `json.load`.
+#   2. Modo `API_DOCS_MODE`:
+#      - 'lazy' (default): un despachador WSGI delante de la aplicación envía las
+#        rutas de documentación a una mini app con Flasgger, construida en la primera
+#        petición a esas rutas. El resto de peticiones no pasa por Flasgger.
+#      - 'eager': comportamiento anterior, Flasgger registrado en la app al arrancar.
+#      - 'off': sin documentación (producción).
+#
+# Notas:
+#   - La spec servida es la misma en ambos modos: las rutas no documentan con
+#     docstrings YAML, todo sale de `openapi.yaml`.
+#   - Si no se puede escribir el JSON (disco de solo lectura) se usa el YAML parseado.
+#
+# Interacciones:
+#   - Instancia global `api_docs` creada en `app/__init__.py`.
+#   - Medición del arranque: `bench_startup.py`.
+# ==============================================================================
+
+# Rutas que atiende Flasgger (UI, assets y spec)
+DOCS_ROUTE = '/apidocs/'
+SPEC_ROUTE = '/apispec.json'
+STATIC_URL_PATH = '/flasgger_static'
+
+MODES = ('lazy', 'eager', 'off')
+
+
+def load_openapi_spec(yaml_path, cache_path=None):
+    """
+    Spec OpenAPI como dict, desde el JSON precompilado si sigue vigente.
+
+    Args:
+        yaml_path (str): Ruta de `openapi.yaml`.
+        cache_path (str, optional): JSON precompilado. Sin él siempre parsea el YAML.
+
+    Returns:
+        dict: Spec OpenAPI.
+    """
+    stat = os.stat(yaml_path)
+    source = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+    if cache_path:
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('source') == source:
+                return cached['spec']
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass # Sin caché o corrupta: se regenera
+
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader) # libyaml si está disponible
+    with open(yaml_path, 'r', encoding='utf-8') as f:
+        spec = yaml.load(f, Loader=loader)
+
+    if cache_path:
+        try:
+            directory = os.path.dirname(cache_path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as tmp:
+                json.dump({'source': source, 'spec': spec}, tmp, ensure_ascii=False, default=str)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"No se pudo guardar la spec OpenAPI precompilada: {str(e)}")
+    return spec
+
+
+class ApiDocs:
+    """
+    Registro de Flasgger diferido (o inmediato) según `API_DOCS_MODE`.
+    """
+
+    def __init__(self):
+        self.mode = 'lazy'
+        self.yaml_path = None
+        self.cache_path = None
+        self._docs_app = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.mode = (app.config.get('API_DOCS_MODE') or 'lazy').lower()
+        if self.mode not in MODES:
+            print(f"API_DOCS_MODE desconocido '{self.mode}', se usa 'lazy' (opciones: {', '.join(MODES)})")
+            self.mode = 'lazy'
+        self.yaml_path = os.path.join(app.root_path, '../openapi.yaml')
+        self.cache_path = app.config.get('OPENAPI_CACHE_PATH') or os.path.join(app.instance_path, 'openapi.json')
+        app.extensions['api_docs'] = self
+
+        if self.mode == 'eager':
+            self._init_swagger(app)
+        elif self.mode == 'lazy':
+            app.wsgi_app = _DocsDispatcher(app.wsgi_app, self)
+
+    def spec(self):
+        return load_openapi_spec(self.yaml_path, self.cache_path)
+
+    def _init_swagger(self, app):
+        """Registra Flasgger en `app` con la spec de `openapi.yaml`."""
+        from flasgger import Swagger
+
+        # Configuración explícita para OpenAPI 3.0
+        app.config['SWAGGER'] = {
+            "headers": [],
+            "specs": [
+                {
+                    "endpoint": 'apispec',
+                    "route": SPEC_ROUTE,
+                    "rule_filter": lambda rule: True,  # all in
+                    "model_filter": lambda tag: True,  # all in
+                }
+            ],
+            "static_url_path": STATIC_URL_PATH,
+            "swagger_ui": True,
+            "specs_route": DOCS_ROUTE,
+            "openapi": "3.0.0" # Forzamos versión 3 para evitar conflicto
+        }
+        Swagger(app, template=self.spec())
+
+    def docs_app(self):
+        """Mini app de Flasgger para el modo 'lazy' (se construye en la primera petición)."""
+        if self._docs_app is None:
+            with self._lock:
+                if self._docs_app is None:
+                    from flask import Flask
+
+                    docs_app = Flask(__name__)
+                    self._init_swagger(docs_app)
+                    self._docs_app = docs_app
+        return self._docs_app
+
+
+class _DocsDispatcher:
+    """
+    Middleware WSGI: rutas de documentación a la mini app, el resto a la aplicación.
+    """
+
+    def __init__(self, wsgi_app, api_docs):
+        self.wsgi_app = wsgi_app
+        self.api_docs = api_docs
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if path == SPEC_ROUTE or path.startswith((DOCS_ROUTE.rstrip('/'), STATIC_URL_PATH + '/')):
+            return self.api_docs.docs_app()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
@@ -0,0 +1,260 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Caché de resultados con TTL e invalidación explícita por espacio de nombres,
+#   para consultas de lectura frecuente cuyo resultado solo cambia con escrituras
+#   conocidas (p.ej. KPIs del Dashboard).
+#
+# Flujo Lógico Central:
+#   1. `get_or_set(namespace, key, loader)`: devuelve el valor cacheado o ejecuta
+#      `loader()` y lo guarda con TTL.
+#   2. `invalidate(namespace)`: incrementa la versión del namespace. Las claves se
+#      construyen como `prefijo:namespace:v<versión>:clave`, por lo que todas las
+#      entradas anteriores quedan huérfanas de una vez (sin recorrer claves) y se
+#      descartan por LRU/TTL.
+#   3. Contadores de hits/misses/invalidaciones por namespace (por proceso).
+#
+# Backends (config `CACHE_BACKEND`):
+#   - 'memory' (default): LRU en memoria del proceso. Con varios workers cada uno
+#     tiene su copia: una invalidación solo alcanza al worker que la ejecuta y
+#     el TTL acota la desactualización de los demás.
+#   - 'redis': Servidor compatible con Redis (Redis, Valkey, KeyDB...) en
+#     `CACHE_REDIS_URL`, compartido por todos los workers. Requiere el paquete
+#     `redis`; si no está instalado se usa el backend en memoria. Si el servidor no
+#     responde (caída, timeout de `CACHE_REDIS_TIMEOUT`), la caché se degrada sin
+#     errores: lectura fallida = miss (se consulta la BD), escritura/invalidación
+#     fallida = se omite (el TTL acota lo que quede desactualizado), y durante unos
+#     segundos no se vuelve a intentar la conexión.
+#
+# Interacciones:
+#   - Instancia global `cache` creada en `app/__init__.py`.
+#   - Llamado por: ReportService, OrderService, `routes/payments.py`.
+# ==============================================================================
+
+class MemoryBackend:
+    """
+    LRU en memoria con expiración por entrada. Seguro entre hilos.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value = (self._data.get(key, (0, None))[0] or 0) + 1
+            self._data[key] = (value, None)
+            self._data.move_to_end(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisBackend:
+    """
+    Backend sobre un servidor compatible con Redis. Los valores se guardan como JSON.
+
+    Los errores de conexión/timeout no se propagan: `invalidate` corre después del
+    commit de órdenes y pagos, y una caída de Redis no debe convertir una escritura
+    ya confirmada en un 500 (el cliente reintentaría y la duplicaría).
+    """
+
+    # Tras un error, segundos sin intentar contactar al servidor (cada intento puede costar el timeout)
+    RETRY_INTERVAL = 5
+    # Segundos entre avisos de error en el log (evita una línea por petición durante una caída)
+    ERROR_LOG_INTERVAL = 30
+
+    def __init__(self, url, prefix, timeout=0.5):
+        import redis  # Dependencia opcional
+        self.client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.errors = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+        self.prefix = prefix
+        self._down_until = 0.0
+        self._last_error_log = 0.0
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, operation, error):
+        now = time.monotonic()
+        self._down_until = now + self.RETRY_INTERVAL
+        if now - self._last_error_log >= self.ERROR_LOG_INTERVAL:
+            self._last_error_log = now
+            print(f"Advertencia: caché Redis no disponible ({operation}): {str(error)}")
+
+    def get(self, key):
+        if not self._available():
+            return None
+        try:
+            raw = self.client.get(key)
+        except self.errors as e:
+            self._failed('get', e)
+            return None # Se trata como miss
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        if not self._available():
+            return
+        try:
+            self.client.set(key, json.dumps(value), ex=ttl or None)
+        except self.errors as e:
+            self._failed('set', e)
+
+    def incr(self, key):
+        if not self._available():
+            return None
+        try:
+            return self.client.incr(key)
+        except self.errors as e:
+            self._failed('incr', e)
+            return None
+
+    def clear(self):
+        try:
+            for key in self.client.scan_iter(f"{self.prefix}:*"):
+                self.client.delete(key)
+        except self.errors as e:
+            self._failed('clear', e)
+
+
+class Cache:
+    """
+    Fachada de caché con namespaces versionados y métricas de uso.
+
+    Los valores cacheados se comparten entre peticiones: quien los lea no debe mutarlos.
+    """
+
+    def __init__(self):
+        self.prefix = 'taller'
+        self.default_ttl = 60
+        self.backend = MemoryBackend()
+        self.backend_name = 'memory'
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """
+        Configura el backend según `CACHE_BACKEND`, `CACHE_REDIS_URL`,
+        `CACHE_MAX_ENTRIES`, `CACHE_DEFAULT_TTL` y `CACHE_KEY_PREFIX`.
+        """
+        self.prefix = app.config.get('CACHE_KEY_PREFIX', self.prefix)
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', self.default_ttl)
+        self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        self.backend_name = 'memory'
+
+        if app.config.get('CACHE_BACKEND') == 'redis':
+            try:
+                self.backend = RedisBackend(
+                    app.config.get('CACHE_REDIS_URL'), self.prefix, app.config.get('CACHE_REDIS_TIMEOUT', 0.5)
+                )
+                self.backend_name = 'redis'
+            except ImportError:
+                print("Advertencia: paquete 'redis' no instalado, se usa la caché en memoria")
+
+        self._stats = {}
+
+    # ==============================================================================
+    # API PÚBLICA
+    # ==============================================================================
+
+    def get_or_set(self, namespace, key, loader, ttl=None):
+        """
+        Devuelve el valor cacheado de (namespace, key) o lo calcula con `loader()`.
+
+        Args:
+            namespace (str): Grupo de claves que se invalida en bloque.
+            key (str): Clave dentro del namespace (debe incluir todos los parámetros).
+            loader (callable): Función sin argumentos que produce el valor.
+            ttl (int, optional): Segundos de vida. Default: `CACHE_DEFAULT_TTL`.
+        """
+        full_key = self._key(namespace, key)
+        value = self.backend.get(full_key)
+        if value is not None:
+            self._count(namespace, 'hits')
+            return value
+
+        self._count(namespace, 'misses')
+        value = loader()
+        if value is not None:
+            self.backend.set(full_key, value, ttl or self.default_ttl)
+        return value
+
+    def invalidate(self, namespace):
+        """
+        Descarta todas las entradas del namespace (O(1): incrementa su versión).
+
+        Se llama después de confirmar escrituras: nunca lanza excepción.
+        """
+        try:
+            self.backend.incr(self._version_key(namespace))
+        except Exception as e:
+            print(f"Error al invalidar la caché '{namespace}': {str(e)}")
+        self._count(namespace, 'invalidations')
+
+    def stats(self):
+        """
+        Contadores del proceso actual.
+
+        Returns:
+            dict: {backend, namespaces: {namespace: {hits, misses, invalidations, hit_ratio}}}
+        """
+        with self._lock:
+            namespaces = {}
+            for namespace, counters in self._stats.items():
+                lookups = counters['hits'] + counters['misses']
+                namespaces[namespace] = dict(
+                    counters,
+                    hit_ratio=round(counters['hits'] / lookups, 4) if lookups else 0.0
+                )
+        return {"backend": self.backend_name, "namespaces": namespaces}
+
+    def clear(self):
+        """Vacía el backend y reinicia los contadores."""
+        self.backend.clear()
+        with self._lock:
+            self._stats = {}
+
+    # ==============================================================================
+    # MÉTODOS AUXILIARES
+    # ==============================================================================
+
+    def _version_key(self, namespace):
+        return f"{self.prefix}:{namespace}:__version__"
+
+    def _key(self, namespace, key):
+        version = self.backend.get(self._version_key(namespace)) or 0
+        return f"{self.prefix}:{namespace}:v{int(version)}:{key}"
+
+    def _count(self, namespace, counter):
+        with self._lock:
+            counters = self._stats.setdefault(namespace, {'hits': 0, 'misses': 0, 'invalidations': 0})
+            counters[counter] += 1
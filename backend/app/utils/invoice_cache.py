@@ -0,0 +1,190 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Caché en disco de facturas PDF direccionada por contenido.
+#   Una descarga repetida de una orden sin cambios cuesta una lectura de archivo
+#   en lugar de un render de ReportLab.
+#
+# Flujo Lógico Central:
+#   1. Clave = SHA-256 del payload exacto `order.to_dict()` (JSON canónico) más la
+#      versión de la plantilla. Cualquier cambio en la orden (items, pagos, estado,
+#      cliente...) produce otra clave; no hace falta invalidar nada.
+#   2. La clave se usa como nombre de archivo (`<hash>.pdf`) y como ETag.
+#   3. Escritura atómica (archivo temporal + os.replace): dos workers que rendericen
+#      la misma factura a la vez no dejan archivos corruptos.
+#   4. Desalojo LRU por tamaño: cada hit actualiza el mtime del archivo; al superar
+#      `INVOICE_CACHE_MAX_BYTES` se borran los de mtime más antiguo. Un contador de
+#      bytes evita recorrer el directorio en cada miss.
+#   5. Los hits se entregan como archivo abierto: si otro hilo o worker lo desaloja
+#      entre la búsqueda y el envío, el descriptor sigue siendo legible.
+#
+# Notas:
+#   - `pdf_generator` (ReportLab) se importa en el primer uso, no al registrar las
+#     rutas: los workers que nunca sirven facturas no pagan esa importación al arrancar.
+#
+# Interacciones:
+#   - `InvoiceGenerator` (render en caso de miss).
+#   - Llamado por: `routes/orders.py`, `InvoiceExportService` (exportación masiva), `JobService`.
+# ==============================================================================
+
+class InvoiceCache:
+    """
+    Almacén de PDFs renderizados en un directorio local.
+    """
+
+    _lock = threading.Lock()
+
+    # Segundos máximos entre escaneos del directorio (corrige el contador con lo de otros workers)
+    RESCAN_INTERVAL = 300
+    # Fracción de `max_bytes` a la que se baja al desalojar
+    EVICT_TARGET = 0.9
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._size = None # Bytes en disco según el último escaneo + lo escrito después (None = sin escanear)
+        self._scanned_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, app):
+        """
+        Construye la caché con `INVOICE_CACHE_DIR` e `INVOICE_CACHE_MAX_BYTES`.
+        Por defecto usa `instance/invoice_cache` (ignorado por git).
+        """
+        directory = app.config.get('INVOICE_CACHE_DIR') or os.path.join(app.instance_path, 'invoice_cache')
+        return cls(directory, app.config.get('INVOICE_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+
+    @classmethod
+    def for_app(cls, app):
+        """
+        Instancia compartida de la aplicación (se crea en el primer uso).
+        """
+        if 'invoice_cache' not in app.extensions:
+            app.extensions['invoice_cache'] = cls.from_config(app)
+        return app.extensions['invoice_cache']
+
+    @staticmethod
+    def key_for(order_data):
+        """
+        Hash de contenido de la factura: payload de la orden + versión de plantilla.
+        """
+        from app.utils.pdf_generator import TEMPLATE_VERSION
+
+        payload = json.dumps(order_data, sort_keys=True, default=str, separators=(',', ':'))
+        digest = hashlib.sha256(f"v{TEMPLATE_VERSION}:".encode('utf-8'))
+        digest.update(payload.encode('utf-8'))
+        return digest.hexdigest()
+
+    def get_or_render(self, order_data, key=None):
+        """
+        Devuelve el PDF de la orden abierto para lectura, renderizándolo solo si no está en caché.
+
+        Args:
+            order_data (dict): `Orden.to_dict()`.
+            key (str, optional): `key_for(order_data)` si el llamador ya lo calculó.
+
+        Returns:
+            tuple: (archivo binario abierto, etag). El llamador lo cierra (send_file lo hace).
+        """
+        key = key or self.key_for(order_data)
+        pdf_file = self.lookup(key)
+        if pdf_file is None:
+            from app.utils.pdf_generator import InvoiceGenerator
+            pdf_bytes = InvoiceGenerator.generate(order_data).getvalue()
+            self.store(key, pdf_bytes)
+            # Se sirve lo recién renderizado: el archivo pudo desalojarse ya
+            pdf_file = io.BytesIO(pdf_bytes)
+        return pdf_file, key
+
+    def lookup(self, key):
+        """
+        PDF cacheado para `key`, ya abierto (o None). Un hit lo marca como usado recientemente.
+
+        Se devuelve el archivo abierto y no la ruta: un desalojo concurrente (otro hilo u
+        otro worker) puede borrar el archivo, pero un descriptor abierto sigue siendo legible.
+        """
+        path = os.path.join(self.directory, f"{key}.pdf")
+        try:
+            pdf_file = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass # Desalojado justo ahora; el descriptor abierto sigue sirviendo
+        return pdf_file
+
+    def store(self, key, pdf_bytes, evict=True):
+        """
+        Guarda un PDF ya renderizado (escritura atómica) y aplica el desalojo si hace falta.
+        Con `evict=False` el llamador debe invocar `evict()` al terminar un lote.
+
+        Returns:
+            str: Ruta del archivo.
+        """
+        path = os.path.join(self.directory, f"{key}.pdf")
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(pdf_bytes)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(pdf_bytes)
+
+        if evict:
+            self.evict()
+        return path
+
+    def evict(self):
+        """
+        Borra los PDFs menos usados si el directorio supera `max_bytes`.
+
+        Lógica:
+            Un contador de bytes del proceso evita recorrer el directorio en cada miss:
+            solo se escanea cuando el contador supera el máximo o cuando pasaron
+            `RESCAN_INTERVAL` segundos (lo escrito por otros workers no suma aquí).
+            Al desalojar se baja hasta `EVICT_TARGET` del máximo, para no volver a
+            escanear en el siguiente miss.
+        """
+        with self._lock:
+            if self._size is not None and self._size <= self.max_bytes and \
+                    time.monotonic() - self._scanned_at < self.RESCAN_INTERVAL:
+                return
+
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.name.endswith('.pdf'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total > self.max_bytes:
+                target = self.max_bytes * self.EVICT_TARGET
+                entries.sort()
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                        total -= size
+                    except FileNotFoundError:
+                        pass
+
+            self._size = total
+            self._scanned_at = time.monotonic()
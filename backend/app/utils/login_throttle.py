@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import deque
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Limita los intentos fallidos de login por cuenta y por IP (ventana deslizante),
+#   para frenar ataques de fuerza bruta antes de gastar CPU en verificar hashes.
+#
+# Flujo Lógico Central:
+#   1. `check(correo, ip)` antes de verificar: si la cuenta o la IP alcanzaron su
+#      máximo de fallos dentro de `LOGIN_FAILURE_WINDOW`, lanza `LoginThrottledError`
+#      con los segundos hasta que venza el fallo más antiguo.
+#   2. `record_failure(correo, ip)` tras credenciales inválidas.
+#   3. `reset(correo)` tras un login exitoso (los fallos de la IP se mantienen).
+#
+# Notas:
+#   - Contadores por proceso: con N workers el límite efectivo puede llegar a N veces
+#     el configurado.
+#   - Las entradas vencidas se purgan al superar `MAX_KEYS` claves.
+#
+# Interacciones:
+#   - Instancia global `login_throttle` creada en `app/__init__.py`.
+#   - Llamado por: AuthService.login_user.
+# ==============================================================================
+
+MAX_KEYS = 10000
+
+
+class LoginThrottledError(Exception):
+    """Demasiados intentos fallidos; reintentar en `retry_after` segundos."""
+
+    def __init__(self, retry_after):
+        super().__init__("Demasiados intentos fallidos, intente más tarde")
+        self.retry_after = retry_after
+
+
+class LoginThrottle:
+    """
+    Ventanas de intentos fallidos por cuenta y por IP.
+    """
+
+    def __init__(self):
+        self.window = 900
+        self.max_per_account = 5
+        self.max_per_ip = 20
+        self._failures = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.window = app.config.get('LOGIN_FAILURE_WINDOW', self.window)
+        self.max_per_account = app.config.get('LOGIN_MAX_FAILURES_ACCOUNT', self.max_per_account)
+        self.max_per_ip = app.config.get('LOGIN_MAX_FAILURES_IP', self.max_per_ip)
+        app.extensions['login_throttle'] = self
+
+    def _keys(self, correo, ip):
+        keys = [(f"cuenta:{(correo or '').strip().lower()}", self.max_per_account)]
+        if ip:
+            keys.append((f"ip:{ip}", self.max_per_ip))
+        return keys
+
+    def _recent(self, key, now):
+        """Fallos de `key` dentro de la ventana (descarta los vencidos)."""
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def check(self, correo, ip=None):
+        """
+        Raises:
+            LoginThrottledError: Si la cuenta o la IP superaron su máximo de fallos.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key, limit in self._keys(correo, ip):
+                failures = self._recent(key, now)
+                if limit and failures and len(failures) >= limit:
+                    retry_after = failures[-limit] + self.window - now
+                    raise LoginThrottledError(max(1, int(retry_after) + 1))
+
+    def record_failure(self, correo, ip=None):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= MAX_KEYS:
+                for key in list(self._failures):
+                    self._recent(key, now)
+            for key, limit in self._keys(correo, ip):
+                self._failures.setdefault(key, deque(maxlen=max(limit, 1))).append(now)
+
+    def reset(self, correo):
+        with self._lock:
+            self._failures.pop(self._keys(correo, None)[0][0], None)
@@ -0,0 +1,224 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from app.utils.search_index import normalize
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Índice en memoria por prefijo de placas (`Auto.placa`) y CIs (`Cliente.ci`)
+#   para el autocompletado de Recepción: cada tecla se resuelve en microsegundos
+#   sin consultar la BD.
+#
+# Flujo Lógico Central:
+#   1. Carga completa (dos SELECT de columnas) en el primer uso del proceso; las
+#      recargas periódicas corren en un hilo aparte sin bloquear las búsquedas.
+#   2. Cada índice es un arreglo ordenado de (clave, id); el prefijo se ubica con
+#      `bisect` y se recorren las claves consecutivas que lo comparten.
+#   3. ClientService actualiza el índice tras cada commit de alta/edición de
+#      clientes y vehículos (`put_client`, `put_vehicle`). Mientras una carga está en
+#      curso esas escrituras también se anotan y se reaplican sobre el índice nuevo
+#      antes de publicarlo (el SELECT pudo haberse leído antes de ese commit).
+#   4. Claves normalizadas: mayúsculas, sin tildes ni separadores ("2020-abc" -> "2020ABC").
+#
+# Notas:
+#   - El índice es por proceso: con varios workers, los cambios hechos en otro
+#     worker se ven tras la recarga periódica (`LOOKUP_INDEX_REFRESH` segundos).
+#
+# Interacciones:
+#   - Instancia global `lookup_index` creada en `app/__init__.py`.
+#   - Llamado por: ClientService, `routes/clients.py` (GET /clients/lookup).
+# ==============================================================================
+
+_NO_ALFANUMERICO = re.compile(r'[\W_]+')
+# Caso común (placas y CIs ASCII): borrar separadores con str.translate, sin regex
+_ASCII_SEPARADORES = {i: None for i in range(128) if not chr(i).isalnum()}
+
+def lookup_key(value):
+    """Clave de búsqueda: alfanuméricos en mayúsculas, sin tildes."""
+    if not value:
+        return ''
+    value = str(value)
+    if value.isascii():
+        return value.translate(_ASCII_SEPARADORES).upper()
+    return _NO_ALFANUMERICO.sub('', normalize(value)).upper()
+
+
+class PrefixIndex:
+    """
+    Arreglo ordenado de (clave, id) con búsqueda por prefijo. Guarda la fila original
+    (tupla de columnas, `row[0]` es el id). No es seguro entre hilos por sí solo
+    (lo protege `LookupIndex`).
+    """
+
+    def __init__(self, rows=(), key_of=None):
+        self._rows = {row[0]: row for row in rows}
+        self._keys = {item_id: key_of(row) for item_id, row in self._rows.items()}
+        self._entries = sorted((key, item_id) for item_id, key in self._keys.items())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, key, row):
+        """Inserta o reemplaza la fila de `row[0]`."""
+        item_id = row[0]
+        self.remove(item_id)
+        self._rows[item_id] = row
+        self._keys[item_id] = key
+        insort(self._entries, (key, item_id))
+
+    def remove(self, item_id):
+        key = self._keys.pop(item_id, None)
+        self._rows.pop(item_id, None)
+        if key is not None:
+            i = bisect_left(self._entries, (key, item_id))
+            if i < len(self._entries) and self._entries[i] == (key, item_id):
+                del self._entries[i]
+
+    def search(self, prefix, limit=10):
+        """Hasta `limit` filas cuyas claves empiezan con `prefix`, en orden de clave."""
+        results = []
+        i = bisect_left(self._entries, (prefix,))
+        while i < len(self._entries) and len(results) < limit:
+            key, item_id = self._entries[i]
+            if not key.startswith(prefix):
+                break
+            results.append(self._rows[item_id])
+            i += 1
+        return results
+
+
+# Filas: (id, placa, marca, modelo, cliente_id) y (id, ci, nombre, apellido_p).
+# Los dicts de respuesta se arman solo para los resultados, no para todo el índice.
+
+def _row_key(row):
+    return lookup_key(row[1])
+
+def _vehicle_payload(row):
+    auto_id, placa, marca, modelo, cliente_id = row
+    return {'tipo': 'auto', 'id': auto_id, 'placa': placa, 'marca': marca, 'modelo': modelo, 'cliente_id': cliente_id}
+
+def _client_payload(row):
+    cliente_id, ci, nombre, apellido_p = row
+    return {'tipo': 'cliente', 'id': cliente_id, 'ci': ci, 'nombre': f"{nombre} {apellido_p}"}
+
+
+class LookupIndex:
+    """
+    Índices de placas y CIs del proceso, con carga diferida y recarga periódica.
+    """
+
+    def __init__(self):
+        self.refresh_seconds = 300
+        self._app = None
+        self._placas = None
+        self._cis = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        # Una lista por carga en curso: escrituras (índice, clave, fila) a reaplicar
+        self._pending = []
+        self._reloading = threading.Event()
+
+    def init_app(self, app):
+        self.refresh_seconds = app.config.get('LOOKUP_INDEX_REFRESH', 300)
+        self._app = app
+        app.extensions['lookup_index'] = self
+
+    def load(self):
+        """(Re)construye ambos índices desde la BD. Requiere contexto de aplicación."""
+        from app import db
+        from app.models import Auto, Cliente
+
+        # Se empieza a anotar antes del SELECT: todo `put_*` posterior se reaplica
+        pending = []
+        with self._lock:
+            self._pending.append(pending)
+        try:
+            # Conexión Core: filas planas, sin la capa de carga del ORM
+            connection = db.session.connection()
+            autos = connection.execute(db.select(Auto.id, Auto.placa, Auto.marca, Auto.modelo, Auto.cliente_id))
+            clientes = connection.execute(db.select(Cliente.id, Cliente.ci, Cliente.nombre, Cliente.apellido_p))
+
+            indexes = {
+                'placas': PrefixIndex(map(tuple, autos), _row_key),
+                'cis': PrefixIndex(map(tuple, clientes), _row_key),
+            }
+        finally:
+            with self._lock:
+                self._pending.remove(pending)
+
+        with self._lock:
+            for name, key, row in pending:
+                indexes[name].put(key, row)
+            self._placas, self._cis = indexes['placas'], indexes['cis']
+            self._loaded_at = time.monotonic()
+
+    def _reload_in_background(self):
+        """Recarga en otro hilo; mientras tanto se sigue respondiendo con el índice anterior."""
+        if self._reloading.is_set():
+            return
+        self._reloading.set()
+
+        def run():
+            try:
+                with self._app.app_context():
+                    self.load()
+            except Exception as e:
+                print(f"Error al recargar índice de placas/CIs: {str(e)}")
+            finally:
+                self._reloading.clear()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _ensure_loaded(self):
+        if self._placas is None:
+            self.load()
+        elif self.refresh_seconds and time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self._reload_in_background()
+
+    def lookup(self, prefix, limit=10, tipo=None):
+        """
+        Busca placas y/o CIs que empiezan con `prefix`.
+
+        Args:
+            prefix (str): Texto tecleado (se normaliza como las claves).
+            limit (int): Máximo de resultados por tipo.
+            tipo (str, optional): 'placa' o 'ci'. Default: ambos.
+
+        Returns:
+            list: Payloads de vehículos y/o clientes.
+        """
+        key = lookup_key(prefix)
+        if not key:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            autos = self._placas.search(key, limit) if tipo in (None, 'placa') else []
+            clientes = self._cis.search(key, limit) if tipo in (None, 'ci') else []
+        return [_vehicle_payload(r) for r in autos] + [_client_payload(r) for r in clientes]
+
+    def _put(self, name, row):
+        key = _row_key(row)
+        with self._lock:
+            for pending in self._pending:
+                pending.append((name, key, row))
+            index = self._placas if name == 'placas' else self._cis
+            if index is not None:
+                index.put(key, row)
+
+    def put_vehicle(self, auto):
+        """Refleja un vehículo recién creado o editado (llamar tras el commit)."""
+        self._put('placas', (auto.id, auto.placa, auto.marca, auto.modelo, auto.cliente_id))
+
+    def put_client(self, cliente):
+        """Refleja un cliente recién creado o editado (llamar tras el commit)."""
+        self._put('cis', (cliente.id, cliente.ci, cliente.nombre, cliente.apellido_p))
+
+    def stats(self):
+        return {
+            'placas': len(self._placas) if self._placas is not None else None,
+            'cis': len(self._cis) if self._cis is not None else None,
+            'edad_segundos': round(time.monotonic() - self._loaded_at, 1) if self._placas is not None else None
+        }
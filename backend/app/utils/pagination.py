@@ -0,0 +1,195 @@
+import base64
+import json
+from datetime import datetime
+from app import db
+from sqlalchemy import func, select, tuple_
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Paginación por cursor (keyset) y conteo opcional para los listados grandes
+#   (órdenes, clientes, pagos).
+#
+# Flujo Lógico Central:
+#   1. Orden estable por (columna_fecha DESC, id DESC) (o ascendente, p.ej. por nombre).
+#   2. La página siguiente se pide con un cursor opaco (base64 de [tipo, id, valor]
+#      de la última fila) y se filtra con una comparación de fila:
+#        WHERE (fecha, id) < (:fecha, :id) ORDER BY fecha DESC, id DESC LIMIT n + 1
+#      El índice sobre la fecha resuelve cualquier página con el mismo costo que la
+#      primera, a diferencia de OFFSET, que recorre y descarta las filas previas.
+#   3. El total es opcional: 'exact' (COUNT), 'estimate' (estimación del planificador
+#      en PostgreSQL, COUNT en otros motores) o 'none'.
+#
+# Notas:
+#   - Las filas con la columna de orden en NULL no participan del modo cursor
+#     (las fechas tienen default, solo aparecen con cargas manuales).
+#
+# Interacciones:
+#   - Llamado por: OrderService, ClientService, InventoryService, `routes/payments.py`.
+# ==============================================================================
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+
+class KeysetPagination:
+    """
+    Página de resultados por cursor.
+
+    Atributos:
+        items (list): Filas de la página.
+        per_page (int): Tamaño solicitado.
+        next_cursor (str | None): Cursor de la página siguiente (None = última página).
+        total (int | None): Total de filas según el modo de conteo.
+    """
+
+    def __init__(self, items, per_page, next_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.total = total
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(kind, sort_value, row_id):
+    """Cursor opaco a partir de la clave (valor de orden, id) de la última fila."""
+    if isinstance(sort_value, datetime):
+        payload = [kind, row_id, 'dt', sort_value.isoformat()]
+    else:
+        payload = [kind, row_id, 'v', sort_value]
+    raw = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, kind):
+    """
+    Decodifica un cursor de `encode_cursor`.
+
+    Raises:
+        ValueError: Si el cursor está corrupto o pertenece a otro listado.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_kind, row_id, value_type, sort_value = json.loads(base64.urlsafe_b64decode(padded))
+        if cursor_kind != kind:
+            raise ValueError
+        if value_type == 'dt':
+            sort_value = datetime.fromisoformat(sort_value)
+        elif not isinstance(sort_value, (str, int, float)):
+            raise ValueError
+        return sort_value, int(row_id)
+    except (ValueError, TypeError, json.JSONDecodeError, UnicodeDecodeError):
+        raise ValueError("Cursor de paginación inválido")
+
+
+def keyset_paginate(query, sort_col, id_col, kind, cursor=None, per_page=10, key_of=None, descending=True):
+    """
+    Aplica paginación keyset a una consulta ya filtrada (descendente por defecto).
+
+    Args:
+        query (Query): Consulta con filtros (su ORDER BY se reemplaza).
+        sort_col, id_col: Columnas de la clave de orden.
+        kind (str): Identificador del listado (se valida al decodificar el cursor).
+        cursor (str, optional): Cursor recibido; None = primera página.
+        per_page (int): Tamaño de página.
+        key_of (callable, optional): fila -> (valor, id). Default: atributos homónimos.
+        descending (bool): False para recorrer (valor, id) en orden ascendente.
+
+    Returns:
+        KeysetPagination: Página sin total (ver `count_rows`).
+
+    Raises:
+        ValueError: Si el cursor es inválido.
+    """
+    key_of = key_of or (lambda row: (getattr(row, sort_col.key), getattr(row, id_col.key)))
+
+    query = query.filter(sort_col.isnot(None))
+    if cursor:
+        sort_value, last_id = decode_cursor(cursor, kind)
+        key = tuple_(sort_col, id_col)
+        query = query.filter(key < (sort_value, last_id) if descending else key > (sort_value, last_id))
+
+    order = (sort_col.desc(), id_col.desc()) if descending else (sort_col.asc(), id_col.asc())
+    rows = query.order_by(None).order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(kind, *key_of(rows[-1]))
+    return KeysetPagination(rows, per_page, next_cursor)
+
+
+def count_rows(query, mode='exact'):
+    """
+    Total de filas de una consulta filtrada según el modo de conteo.
+
+    Args:
+        query (Query): Consulta con filtros, idealmente sin opciones de carga.
+        mode (str): 'exact', 'estimate' o 'none'.
+
+    Returns:
+        int | None
+    """
+    if mode == 'none':
+        return None
+
+    statement = query.order_by(None).statement
+    bind = db.session.get_bind()
+
+    if mode == 'estimate' and bind.dialect.name == 'postgresql':
+        compiled = statement.compile(dialect=bind.dialect)
+        plan = db.session.connection().exec_driver_sql(
+            'EXPLAIN (FORMAT JSON) ' + str(compiled), compiled.params
+        ).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    return db.session.execute(
+        select(func.count()).select_from(statement.subquery())
+    ).scalar()
+
+
+def pagination_args(args):
+    """
+    Lee los parámetros de paginación comunes de `request.args`.
+
+    Query Params:
+        pagination (str): 'cursor' para pedir la primera página en modo keyset.
+        cursor (str): Cursor de la página siguiente (implica modo keyset).
+        count (str): 'exact', 'estimate' o 'none'. Default: 'exact' en modo página,
+            'none' en modo cursor.
+
+    Returns:
+        dict: Argumentos `cursor`, `keyset` y `count` para los servicios de listado.
+
+    Raises:
+        ValueError: Si el modo de conteo no es válido.
+    """
+    cursor = args.get('cursor', type=str) or None
+    keyset = cursor is not None or args.get('pagination', type=str) == 'cursor'
+    count = args.get('count', type=str) or ('none' if keyset else 'exact')
+    if count not in COUNT_MODES:
+        raise ValueError(f"Modo de conteo inválido: '{count}'. Opciones: {', '.join(COUNT_MODES)}")
+    return {'cursor': cursor, 'keyset': keyset, 'count': count}
+
+
+def pagination_meta(pagination):
+    """
+    Metadatos de paginación para la respuesta JSON (modo página o modo cursor).
+    """
+    if isinstance(pagination, KeysetPagination):
+        return {
+            'next_cursor': pagination.next_cursor,
+            'has_more': pagination.has_more,
+            'per_page': pagination.per_page,
+            'total': pagination.total
+        }
+    return {
+        'total': pagination.total,
+        'pages': pagination.pages,
+        'current_page': pagination.page,
+        'per_page': pagination.per_page
+    }
@@ -0,0 +1,111 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Hashing y verificación de contraseñas fuera del hilo de la petición, en un pool
+#   acotado, para que una ráfaga de logins (cambio de turno) no acapare la CPU que
+#   necesitan el resto de endpoints.
+#
+# Flujo Lógico Central:
+#   1. Pool de hilos compartido por el proceso (`PASSWORD_HASH_WORKERS`): el KDF
+#      (scrypt/pbkdf2 de hashlib) corre en C y libera el GIL, así que los hilos no se
+#      serializan y el pool limita cuántos núcleos se dedican a hashear a la vez.
+#   2. Cola acotada (`PASSWORD_HASH_QUEUE`): si ya hay trabajos de más esperando, la
+#      petición se rechaza de inmediato con `HashingBusyError` (la ruta responde 503)
+#      en lugar de acumular hilos bloqueados. Lo mismo si la espera supera
+#      `PASSWORD_HASH_TIMEOUT`.
+#   3. Política de costo (`PASSWORD_HASH_METHOD`, formato de werkzeug): `needs_rehash`
+#      indica si un hash guardado usa otro método/parámetros; AuthService lo
+#      reemplaza en el siguiente login exitoso.
+#
+# Interacciones:
+#   - Instancia global `password_hasher` creada en `app/__init__.py`.
+#   - Llamado por: AuthService.
+# ==============================================================================
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class HashingBusyError(Exception):
+    """La cola de hashing está llena; reintentar en `retry_after` segundos."""
+
+    def __init__(self, retry_after=1):
+        super().__init__("Servicio de autenticación saturado, intente nuevamente")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Pool acotado para `generate_password_hash` / `check_password_hash`.
+    """
+
+    def __init__(self):
+        self.method = DEFAULT_METHOD
+        self.workers = 1
+        self.queue_size = 32
+        self.timeout = 30
+        self._pool = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS') or max(1, (os.cpu_count() or 2) // 2)
+        self.queue_size = app.config.get('PASSWORD_HASH_QUEUE', self.queue_size)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        app.extensions['password_hasher'] = self
+
+    def _executor(self):
+        """Pool creado en el primer uso (los workers web que nunca hashean no lo pagan)."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+        return self._pool
+
+    def _run(self, fn, *args):
+        pool = self._executor()
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusyError()
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            raise HashingBusyError()
+
+    # ==============================================================================
+    # API PÚBLICA
+    # ==============================================================================
+
+    def hash(self, password):
+        """
+        Hash de `password` con el método configurado.
+
+        Raises:
+            HashingBusyError: Si la cola está llena o se agotó la espera.
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """
+        True si `password` corresponde a `pwhash`.
+
+        Raises:
+            HashingBusyError: Si la cola está llena o se agotó la espera.
+        """
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True si `pwhash` no usa el método y parámetros de la política actual."""
+        return pwhash.split('$', 1)[0] != self.method
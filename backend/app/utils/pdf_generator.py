@@ -1,28 +1,57 @@
 import io
+import threading
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
 
-class InvoiceGenerator:
-    @staticmethod
-    def generate(order_data):
-        """
-        Genera un PDF en memoria para una orden dada.
-        Retorna un objeto BytesIO con el contenido del PDF.
-        """
-        buffer = io.BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter,
-                                rightMargin=40, leftMargin=40,
-                                topMargin=40, bottomMargin=40)
-        
-        elements = []
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Generación de la factura/orden de servicio en PDF (ReportLab).
+#
+# Flujo Lógico Central:
+#   1. `InvoiceTemplate` (una instancia por proceso, creada al primer uso) precalcula
+#      todo lo que no depende de la orden: hojas de estilo, TableStyles, anchos de
+#      columna, filas fijas y el bloque de datos del taller.
+#   2. `InvoiceGenerator.generate` solo arma las filas propias de la orden.
+#   3. Las descripciones que caben en una línea se dibujan como texto plano de celda
+#      (mismo Helvetica 10/12 que el estilo Normal); solo las largas usan Paragraph,
+#      cuyo wrap/draw domina el costo de render.
+#
+# Notas:
+#   - Los estilos se comparten entre hilos (solo lectura). Los flowables no: ReportLab
+#     guarda el estado de maquetado en ellos, por eso el encabezado se cachea por hilo.
+# ==============================================================================
+
+# Versión del diseño: forma parte de la clave de la caché de PDFs (`utils/invoice_cache.py`).
+# Incrementarla al cambiar la plantilla invalida todas las facturas ya renderizadas.
+TEMPLATE_VERSION = 1
+
+# --- Datos del Taller (Hardcoded por ahora, idealmente config) ---
+WORKSHOP_INFO = """
+<b>TALLER AUTOMOTRIZ APP</b><br/>
+Av. Principal #123<br/>
+La Paz, Bolivia<br/>
+Tel: (591) 2-1234567<br/>
+Email: contacto@tallerapp.com
+"""
+
+class InvoiceTemplate:
+    """
+    Plantilla de factura preparada: estilos y layout construidos una sola vez.
+    """
+
+    def __init__(self):
         styles = getSampleStyleSheet()
-        
+        self.normal_style = styles['Normal']
+
         # --- Estilos Personalizados ---
-        title_style = ParagraphStyle(
+        self.title_style = ParagraphStyle(
             'InvoiceTitle',
             parent=styles['Heading1'],
             fontSize=24,
@@ -30,8 +59,8 @@ class InvoiceGenerator:
             alignment=TA_RIGHT,
             spaceAfter=20
         )
-        
-        workshop_style = ParagraphStyle(
+
+        self.workshop_style = ParagraphStyle(
             'WorkshopInfo',
             parent=styles['Normal'],
             fontSize=10,
@@ -39,106 +68,174 @@ class InvoiceGenerator:
             alignment=TA_LEFT,
             leading=14
         )
-        
-        header_table_style = TableStyle([
+
+        self.header_table_style = TableStyle([
             ('VALIGN', (0, 0), (-1, -1), 'TOP'),
             ('ALIGN', (1, 0), (1, 0), 'RIGHT'),
         ])
 
-        # --- Datos del Taller (Hardcoded por ahora, idealmente config) ---
-        workshop_info = """
-        <b>TALLER AUTOMOTRIZ APP</b><br/>
-        Av. Principal #123<br/>
-        La Paz, Bolivia<br/>
-        Tel: (591) 2-1234567<br/>
-        Email: contacto@tallerapp.com
+        self.info_table_style = TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('LINEBELOW', (0,0), (-1,-1), 1, colors.HexColor("#ecf0f1")),
+            ('PADDING', (0,0), (-1,-1), 12),
+        ])
+
+        # Estilo de Tabla de Items
+        self.items_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#f8f9fa")),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'), # Default left
+            ('ALIGN', (1, 0), (1, -1), 'CENTER'), # Cantidad center
+            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'), # Precios right
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#ecf0f1")),
+            # Filas de totales (las últimas 3)
+            ('FONTNAME', (-2, -3), (-1, -1), 'Helvetica-Bold'), # Bold labels and values for totals
+            ('LINEABOVE', (-2, -3), (-1, -3), 1, colors.black), # Line above Total
+        ])
+
+        # --- Layout de columnas ---
+        self.header_col_widths = [4*inch, 3*inch]
+        self.info_col_widths = [3.5*inch, 3.5*inch]
+        self.items_col_widths = [4*inch, 1*inch, 1*inch, 1*inch]
+        self.items_header_row = ['DESCRIPCIÓN', 'CANT.', 'P. UNIT (Bs)', 'SUBTOTAL (Bs)']
+
+        # Ancho útil de la columna de descripción (padding de celda por defecto: 6 + 6)
+        self.description_width = self.items_col_widths[0] - 12
+        self.description_font = (self.normal_style.fontName, self.normal_style.fontSize)
+
+        self._local = threading.local()
+
+    def workshop_paragraph(self):
+        """
+        Bloque estático de datos del taller, parseado una vez por hilo.
+        """
+        paragraph = getattr(self._local, 'workshop', None)
+        if paragraph is None:
+            paragraph = self._local.workshop = Paragraph(WORKSHOP_INFO, self.workshop_style)
+        return paragraph
+
+    def description_cell(self, text):
+        """
+        Celda de descripción: texto plano si cabe en una línea, Paragraph (con wrap) si no.
+        """
+        if '<' not in text and '&' not in text and \
+                stringWidth(text, *self.description_font) <= self.description_width:
+            return text
+        return Paragraph(text, self.normal_style)
+
+    def section_row(self, row_index, label):
+        """
+        Fila separadora (SERVICIOS / REPUESTOS) y su comando de estilo en negrita.
+        """
+        return [label, "", "", ""], ('FONTNAME', (0, row_index), (0, row_index), 'Helvetica-Bold')
+
+
+_template = None
+_template_lock = threading.Lock()
+
+class InvoiceGenerator:
+    @staticmethod
+    def template():
         """
+        Devuelve la plantilla preparada del proceso (se construye en el primer uso).
+        """
+        global _template
+        if _template is None:
+            with _template_lock:
+                if _template is None:
+                    _template = InvoiceTemplate()
+        return _template
+
+    @staticmethod
+    def generate(order_data):
+        """
+        Genera un PDF en memoria para una orden dada.
+        Retorna un objeto BytesIO con el contenido del PDF.
+        """
+        tpl = InvoiceGenerator.template()
+
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=letter,
+                                rightMargin=40, leftMargin=40,
+                                topMargin=40, bottomMargin=40)
+
+        elements = []
 
         # --- Encabezado ---
         # Izquierda: Datos Taller, Derecha: Título Factura e ID
         header_data = [
-            [Paragraph(workshop_info, workshop_style), Paragraph(f"ORDEN DE SERVICIO<br/>#{order_data.get('id')}", title_style)]
+            [tpl.workshop_paragraph(), Paragraph(f"ORDEN DE SERVICIO<br/>#{order_data.get('id')}", tpl.title_style)]
         ]
-        
-        header_table = Table(header_data, colWidths=[4*inch, 3*inch])
-        header_table.setStyle(header_table_style)
+
+        header_table = Table(header_data, colWidths=tpl.header_col_widths)
+        header_table.setStyle(tpl.header_table_style)
         elements.append(header_table)
         elements.append(Spacer(1, 0.5*inch))
-        
+
         # --- Información Cliente y Vehículo ---
         # Se asume que order_data ya viene 'aplanado' o con dicts anidados
         # Ajustar según como venga del to_dict() del modelo
-        
+
         client_info = f"""
         <b>CLIENTE:</b><br/>
         {order_data.get('cliente_nombre', 'N/A')}<br/>
         CI/NIT: {order_data.get('cliente_ci', 'N/A')}
         """
-        
+
         vehicle_info = f"""
         <b>VEHÍCULO:</b><br/>
         {order_data.get('marca', '')} {order_data.get('modelo', '')} {order_data.get('anio', '')}<br/>
         Placa: {order_data.get('placa', 'N/A')}<br/>
         VIN: {order_data.get('vin', 'N/A')}
         """
-        
+
         info_data = [
-            [Paragraph(client_info, styles['Normal']), Paragraph(vehicle_info, styles['Normal'])]
+            [Paragraph(client_info, tpl.normal_style), Paragraph(vehicle_info, tpl.normal_style)]
         ]
-        
-        info_table = Table(info_data, colWidths=[3.5*inch, 3.5*inch])
-        info_table.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('LINEBELOW', (0,0), (-1,-1), 1, colors.HexColor("#ecf0f1")),
-            ('PADDING', (0,0), (-1,-1), 12),
-        ]))
+
+        info_table = Table(info_data, colWidths=tpl.info_col_widths)
+        info_table.setStyle(tpl.info_table_style)
         elements.append(info_table)
         elements.append(Spacer(1, 0.3*inch))
-        
+
         # --- Detalle de Servicios y Repuestos ---
         # Columnas: Descripción, Cantidad, P.Unit, Subtotal
-        
-        # Estilo de Tabla de Items
-        items_style = TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#f8f9fa")),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'), # Default left
-            ('ALIGN', (1, 0), (1, -1), 'CENTER'), # Cantidad center
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'), # Precios right
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#ecf0f1")),
-        ])
-        
-        table_data = [['DESCRIPCIÓN', 'CANT.', 'P. UNIT (Bs)', 'SUBTOTAL (Bs)']]
-        
+        table_data = [tpl.items_header_row]
+        section_styles = []
+
         # Servicios
         servicios = order_data.get('detalles_servicios', [])
         if servicios:
-            table_data.append([Paragraph("<b>SERVICIOS</b>", styles['Normal']), "", "", ""])
+            row, style = tpl.section_row(len(table_data), "SERVICIOS")
+            table_data.append(row)
+            section_styles.append(style)
             for s in servicios:
                 nombre = s.get('servicio_nombre') or (s.get('servicio') or {}).get('nombre', 'Servicio')
                 precio = float(s.get('precio_aplicado') or s.get('precio') or 0)
                 table_data.append([
-                    Paragraph(nombre, styles['Normal']),
+                    tpl.description_cell(nombre),
                     "1",
                     f"{precio:,.2f}",
                     f"{precio:,.2f}"
                 ])
-                
+
         # Repuestos
         repuestos = order_data.get('detalles_repuestos', [])
         if repuestos:
-            table_data.append([Paragraph("<b>REPUESTOS</b>", styles['Normal']), "", "", ""])
+            row, style = tpl.section_row(len(table_data), "REPUESTOS")
+            table_data.append(row)
+            section_styles.append(style)
             for r in repuestos:
                 nombre = r.get('repuesto_nombre') or (r.get('repuesto') or {}).get('nombre', 'Repuesto')
                 cantidad = int(r.get('cantidad', 0))
                 precio = float(r.get('precio_unitario_aplicado') or r.get('precio') or 0)
                 subtotal = cantidad * precio
                 table_data.append([
-                    Paragraph(nombre, styles['Normal']),
+                    tpl.description_cell(nombre),
                     str(cantidad),
                     f"{precio:,.2f}",
                     f"{subtotal:,.2f}"
@@ -148,25 +245,28 @@ class InvoiceGenerator:
         total_estimado = float(order_data.get('total_estimado', 0))
         total_pagado = float(order_data.get('total_pagado', 0))
         saldo = float(order_data.get('saldo_pendiente', 0))
-        
+
         # Rows de totales
         table_data.append(["", "", "TOTAL:", f"{total_estimado:,.2f}"])
         table_data.append(["", "", "PAGADO:", f"{total_pagado:,.2f}"])
         table_data.append(["", "", "SALDO:", f"{saldo:,.2f}"])
-        
-        items_table = Table(table_data, colWidths=[4*inch, 1*inch, 1*inch, 1*inch])
-        items_table.setStyle(items_style)
-        
-        # Estilos específicos para las filas de totales (las últimas 3)
-        num_rows = len(table_data)
-        items_table.setStyle(TableStyle([
-            ('FONTNAME', (-2, -3), (-1, -1), 'Helvetica-Bold'), # Bold labels and values for totals
-            ('LINEABOVE', (-2, -3), (-1, -3), 1, colors.black), # Line above Total
-        ]))
-        
+
+        items_table = Table(table_data, colWidths=tpl.items_col_widths)
+        items_table.setStyle(tpl.items_style)
+        if section_styles:
+            items_table.setStyle(TableStyle(section_styles))
+
         elements.append(items_table)
-        
+
         # --- Build PDF ---
         doc.build(elements)
         buffer.seek(0)
         return buffer
+
+
+def render_invoice_pdf(order_data):
+    """
+    Renderiza una factura y devuelve los bytes del PDF.
+    Función de módulo (serializable con pickle) para usarla en un ProcessPoolExecutor.
+    """
+    return InvoiceGenerator.generate(order_data).getvalue()
@@ -0,0 +1,121 @@
+import threading
+import time
+from types import MappingProxyType
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Copia en memoria de las tablas maestras `roles` y `estados_orden` (pocas filas,
+#   casi nunca cambian) para resolver nombre -> id e id -> nombre en O(1), sin
+#   consultas ni JOINs en servicios, serializadores y reportes.
+#
+# Flujo Lógico Central:
+#   1. Carga diferida (dos SELECT de columnas) en el primer uso del proceso.
+#   2. Cada carga produce una instantánea inmutable (dicts de solo lectura) que se
+#      reemplaza completa; las lecturas no toman locks.
+#   3. Los eventos de sesión de `models.py` marcan la instantánea como vencida
+#      cuando se confirma (commit) una escritura sobre Role o EstadoOrden; la
+#      siguiente lectura recarga.
+#
+# Notas:
+#   - Es por proceso: cambios hechos fuera de este proceso (seed, SQL manual u otro
+#     worker) se ven tras `REFERENCE_DATA_REFRESH` segundos.
+#
+# Interacciones:
+#   - Instancia global `reference_data` creada en `app/__init__.py`.
+#   - Llamado por: `models.py` (to_dict), AuthService, OrderService, ReportService,
+#     `routes/orders.py`, `routes/payments.py`.
+# ==============================================================================
+
+class _Snapshot:
+    """Mapeos de solo lectura de una carga."""
+
+    def __init__(self, roles, estados):
+        self.role_names = MappingProxyType(dict(roles))
+        self.role_ids = MappingProxyType({nombre: rol_id for rol_id, nombre in roles})
+        self.estado_names = MappingProxyType(dict(estados))
+        self.estado_ids = MappingProxyType({nombre: estado_id for estado_id, nombre in estados})
+
+
+class ReferenceData:
+    """
+    Roles y estados de orden del proceso, con recarga al confirmarse cambios.
+    """
+
+    def __init__(self):
+        self.refresh_seconds = 300
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.refresh_seconds = app.config.get('REFERENCE_DATA_REFRESH', 300)
+        app.extensions['reference_data'] = self
+
+    def load(self):
+        """(Re)construye la instantánea desde la BD. Requiere contexto de aplicación."""
+        from app import db
+        from app.models import Role, EstadoOrden
+
+        generation = self._generation
+        roles = db.session.execute(db.select(Role.id, Role.nombre_rol)).all()
+        estados = db.session.execute(db.select(EstadoOrden.id, EstadoOrden.nombre_estado)).all()
+        snapshot = _Snapshot([tuple(r) for r in roles], [tuple(e) for e in estados])
+        with self._lock:
+            # Si hubo un commit durante la carga, no se publica: la próxima lectura recarga
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def mark_stale(self):
+        """Fuerza la recarga en la próxima lectura (tras el commit de cambios en las tablas)."""
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+
+    def _current(self):
+        snapshot = self._snapshot
+        if snapshot is None or (
+            self.refresh_seconds and time.monotonic() - self._loaded_at > self.refresh_seconds
+        ):
+            snapshot = self.load()
+        return snapshot
+
+    # ==============================================================================
+    # API PÚBLICA
+    # ==============================================================================
+
+    def role_name(self, role_id):
+        """Nombre del rol o None."""
+        return self._current().role_names.get(role_id) if role_id is not None else None
+
+    def role_id(self, nombre_rol):
+        """Id del rol o None si no existe."""
+        return self._current().role_ids.get(nombre_rol)
+
+    def estado_name(self, estado_id):
+        """Nombre del estado de orden o None."""
+        return self._current().estado_names.get(estado_id) if estado_id is not None else None
+
+    def estado_id(self, nombre_estado):
+        """Id del estado de orden o None si no existe."""
+        return self._current().estado_ids.get(nombre_estado)
+
+    def estado(self, estado_id):
+        """Estado serializado como `EstadoOrden.to_dict` o None."""
+        nombre = self.estado_name(estado_id)
+        return {'id': estado_id, 'nombre_estado': nombre} if nombre is not None else None
+
+    def estados(self):
+        """Lista maestra de estados (como `EstadoOrden.to_dict`), ordenada por id."""
+        return [
+            {'id': estado_id, 'nombre_estado': nombre}
+            for estado_id, nombre in sorted(self._current().estado_names.items())
+        ]
+
+    def estado_names(self):
+        """Mapeo de solo lectura id -> nombre de todos los estados."""
+        return self._current().estado_names
@@ -0,0 +1,198 @@
+import re
+import sqlite3
+import unicodedata
+from sqlalchemy import DDL, bindparam, column, func, inspect, literal_column, select, table, text, update
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Búsqueda por texto de clientes y vehículos sin `ILIKE '%term%'` sobre varias
+#   columnas (que siempre recorre la tabla completa).
+#
+# Flujo Lógico Central:
+#   1. Cada modelo buscable declara `SEARCH_COLUMNS` y una columna `search_text`:
+#      esas columnas concatenadas, en minúsculas y sin tildes. La mantienen los
+#      eventos del ORM (`models.py`) en cada INSERT/UPDATE.
+#   2. Índice según el motor (se crea junto con la tabla, ver `install`):
+#        - PostgreSQL: GIN con `gin_trgm_ops` (extensión pg_trgm) sobre `search_text`;
+#          resuelve `LIKE '%tok%'` con el índice y ordena por `similarity()`.
+#        - SQLite: tabla virtual FTS5 `<tabla>_fts` (tokenizador trigram, contenido
+#          externo) sincronizada por triggers; ordena por `rank` (bm25).
+#        - Otros motores (y SQLite < 3.34, sin tokenizador trigram): LIKE sobre
+#          `search_text` (sin índice ni ranking).
+#   3. `apply_search`: normaliza el término igual que la columna y exige que cada
+#      palabra aparezca (AND), en cualquier orden: "juan perez" encuentra al cliente
+#      aunque nombre y apellido estén en columnas distintas.
+#
+# Notas:
+#   - Los trigramas necesitan al menos 3 caracteres: las palabras más cortas se
+#     filtran con LIKE sobre el resultado del índice.
+#   - BDs existentes: `reindex_search.py` agrega la columna, crea el índice y la rellena.
+#
+# Interacciones:
+#   - Modelos: `Cliente`, `Auto` (eventos en `models.py`).
+#   - Llamado por: ClientService, OrderService, `reindex_search.py`.
+# ==============================================================================
+
+MIN_TRIGRAM = 3
+
+# El tokenizador 'trigram' de FTS5 existe desde SQLite 3.34 (versión de la librería enlazada)
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34)
+
+def normalize(value):
+    """Minúsculas, sin tildes/diacríticos y con espacios simples."""
+    if not value:
+        return ''
+    folded = unicodedata.normalize('NFKD', str(value))
+    folded = ''.join(ch for ch in folded if not unicodedata.combining(ch))
+    return re.sub(r'\s+', ' ', folded).strip().lower()
+
+
+def build_search_text(*parts):
+    """Valor de `search_text` a partir de las columnas buscables de una fila."""
+    return ' '.join(filter(None, (normalize(p) for p in parts)))
+
+
+def set_search_text(target):
+    """Recalcula `search_text` de una instancia (eventos before_insert/before_update)."""
+    target.search_text = build_search_text(*(getattr(target, c) for c in type(target).SEARCH_COLUMNS))
+
+
+# ==============================================================================
+# DDL POR MOTOR
+# ==============================================================================
+
+def _sqlite_fts(dialect):
+    """True si el motor usa la tabla FTS5 trigram (SQLite con soporte)."""
+    return dialect == 'sqlite' and SQLITE_TRIGRAM
+
+
+def _ddl_statements(table_name, dialect):
+    if dialect == 'postgresql':
+        return [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            f"CREATE INDEX IF NOT EXISTS ix_{table_name}_search_trgm "
+            f"ON {table_name} USING gin (search_text gin_trgm_ops)",
+        ]
+    if _sqlite_fts(dialect):
+        fts = f"{table_name}_fts"
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"search_text, content='{table_name}', content_rowid='id', tokenize='trigram')",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table_name} BEGIN "
+            f"INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table_name} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text); END",
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF search_text ON {table_name} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, search_text) VALUES ('delete', old.id, old.search_text); "
+            f"INSERT INTO {fts}(rowid, search_text) VALUES (new.id, new.search_text); END",
+        ]
+    return []
+
+
+def install(target, connection, **kw):
+    """
+    Crea el índice de búsqueda de la tabla `target` (listener 'after_create'; idempotente).
+    """
+    for statement in _ddl_statements(target.name, connection.dialect.name):
+        connection.execute(DDL(statement))
+
+
+def uninstall(target, connection, **kw):
+    """
+    Elimina la tabla FTS5 de SQLite junto con la tabla base (listener 'before_drop').
+    En PostgreSQL el índice GIN cae con la tabla.
+    """
+    if connection.dialect.name == 'sqlite':
+        connection.execute(DDL(f"DROP TABLE IF EXISTS {target.name}_fts"))
+
+
+# ==============================================================================
+# CONSULTA
+# ==============================================================================
+
+def _like_pattern(token):
+    return '%' + token.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def apply_search(query, model, term):
+    """
+    Filtra `query` por las filas de `model` cuyo texto contiene todas las palabras de `term`.
+
+    Args:
+        query (Query): Consulta que ya incluye `model` en el FROM.
+        model: Modelo con `search_text` (Cliente, Auto).
+        term (str): Texto buscado por el usuario.
+
+    Returns:
+        tuple: (query filtrada, criterio ORDER BY por relevancia o None si el motor no rankea).
+    """
+    # Importación diferida: este módulo se carga durante `app/__init__` (vía lookup_index)
+    from app import db
+
+    tokens = normalize(term).split()
+    if not tokens:
+        return query, None
+
+    dialect = db.session.get_bind().dialect.name
+    rank = None
+    long_tokens = [t for t in tokens if len(t) >= MIN_TRIGRAM]
+    like_tokens = tokens
+
+    if _sqlite_fts(dialect) and long_tokens:
+        fts = table(f"{model.__tablename__}_fts", column('rowid'), column('rank'))
+        match = ' AND '.join('"' + t.replace('"', '""') + '"' for t in long_tokens)
+        query = query.join(fts, fts.c.rowid == model.id)\
+            .filter(literal_column(fts.name).op('MATCH')(match))
+        rank = fts.c.rank
+        like_tokens = [t for t in tokens if len(t) < MIN_TRIGRAM]
+    elif dialect == 'postgresql':
+        rank = func.similarity(model.search_text, ' '.join(tokens)).desc()
+
+    for token in like_tokens:
+        query = query.filter(model.search_text.like(_like_pattern(token), escape='\\'))
+    return query, rank
+
+
+# ==============================================================================
+# MANTENIMIENTO
+# ==============================================================================
+
+def reindex(model, batch_size=2000):
+    """
+    Prepara una tabla existente: agrega `search_text` si falta, crea el índice del motor
+    y recalcula la columna para todas las filas (cargas hechas fuera del ORM).
+
+    Returns:
+        int: Filas reindexadas.
+    """
+    from app import db
+
+    table_obj = model.__table__
+    connection = db.session.connection()
+    if 'search_text' not in {c['name'] for c in inspect(connection).get_columns(table_obj.name)}:
+        connection.execute(text(f"ALTER TABLE {table_obj.name} ADD COLUMN search_text TEXT"))
+    install(table_obj, connection)
+
+    source = [model.id] + [getattr(model, c) for c in model.SEARCH_COLUMNS]
+    stmt = update(table_obj).where(table_obj.c.id == bindparam('b_id'))\
+        .values(search_text=bindparam('b_text'))
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*source).where(model.id > last_id).order_by(model.id).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        connection.execute(stmt, [{'b_id': r[0], 'b_text': build_search_text(*r[1:])} for r in rows])
+        total += len(rows)
+        last_id = rows[-1][0]
+
+    if _sqlite_fts(connection.dialect.name):
+        fts = f"{table_obj.name}_fts"
+        connection.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    db.session.commit()
+    return total
@@ -0,0 +1,117 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Visión Macro)
+# ==============================================================================
+# Propósito:
+#   Revocación explícita de JWT (logout) por `jti`, consultada en cada petición
+#   autenticada sin tocar la BD.
+#
+# Flujo Lógico Central:
+#   1. `revoke`: inserta el `jti` en `tokens_revocados` (fuente compartida por todos
+#      los workers) y lo agrega al dict en memoria del proceso.
+#   2. `is_revoked`: búsqueda en el dict (jti -> expiración). Cada
+#      `TOKEN_DENYLIST_REFRESH` segundos, la primera petición relee las filas creadas
+#      desde la última sincronización (con margen), así los logouts hechos en otro
+#      worker se aplican en ese plazo.
+#   3. Los `jti` cuyo token ya expiró salen del dict y de la tabla: la denylist solo
+#      crece con las revocaciones vigentes (a lo sumo la vida de un refresh token).
+#
+# Notas:
+#   - La sincronización usa su propia conexión: no altera la transacción de la petición.
+#   - La revocación por cambios del usuario (rol, password, baja) no pasa por aquí:
+#     la cubre la firma `sv` de los claims (ver AuthService.is_token_revoked).
+#
+# Interacciones:
+#   - Modelo: TokenRevocado.
+#   - Instancia global `token_denylist` creada en `app/__init__.py`.
+#   - Llamado por: AuthService.
+# ==============================================================================
+
+# Margen de relectura: cubre commits que terminan después de la sincronización anterior
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class TokenDenylist:
+    """
+    `jti` revocados y vigentes del proceso, sincronizados desde la BD.
+    """
+
+    def __init__(self):
+        self.refresh_seconds = 10
+        self._jtis = {}
+        self._synced_at = None
+        self._synced_since = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.refresh_seconds = app.config.get('TOKEN_DENYLIST_REFRESH', self.refresh_seconds)
+        app.extensions['token_denylist'] = self
+
+    def is_revoked(self, jti):
+        """True si el `jti` fue revocado (O(1); sincroniza como máximo cada `refresh_seconds`)."""
+        if self._synced_at is None or time.monotonic() - self._synced_at > self.refresh_seconds:
+            self._sync()
+        return jti in self._jtis
+
+    def _sync(self):
+        """Incorpora las revocaciones recientes de la BD y descarta las expiradas."""
+        from app import db
+        from app.models import TokenRevocado
+
+        with self._lock:
+            # Otra petición pudo sincronizar mientras se esperaba el lock
+            if self._synced_at is not None and time.monotonic() - self._synced_at <= self.refresh_seconds:
+                return
+            started = datetime.utcnow()
+            query = select(TokenRevocado.jti, TokenRevocado.expira_at).where(TokenRevocado.expira_at > started)
+            if self._synced_since is not None:
+                query = query.where(TokenRevocado.creado_at >= self._synced_since - SYNC_OVERLAP)
+            try:
+                with db.engine.connect() as connection:
+                    rows = connection.execute(query).all()
+            except Exception as e:
+                # Se reintenta en el siguiente intervalo con lo que ya estaba en memoria
+                print(f"Error al sincronizar tokens revocados: {str(e)}")
+                self._synced_at = time.monotonic()
+                return
+
+            jtis = dict(self._jtis)
+            jtis.update({jti: expira_at for jti, expira_at in rows})
+            self._jtis = {jti: expira_at for jti, expira_at in jtis.items() if expira_at > started}
+            self._synced_since = started
+            self._synced_at = time.monotonic()
+
+    def revoke(self, jti, tipo, usuario_id, expira_at):
+        """
+        Revoca un token hasta su expiración.
+
+        Args:
+            jti (str): Identificador del token.
+            tipo (str): 'access' o 'refresh'.
+            usuario_id (int): Dueño del token (auditoría).
+            expira_at (datetime): Expiración del token (UTC); luego la fila se purga.
+        """
+        from app import db
+        from app.models import TokenRevocado
+
+        now = datetime.utcnow()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(insert(TokenRevocado).values(
+                    jti=jti, tipo=tipo, usuario_id=usuario_id, expira_at=expira_at, creado_at=now
+                ))
+        except IntegrityError:
+            pass # Ya revocado
+        with db.engine.begin() as connection:
+            connection.execute(delete(TokenRevocado).where(TokenRevocado.expira_at <= now))
+
+        with self._lock:
+            self._jtis[jti] = expira_at
+
+    def __len__(self):
+        return len(self._jtis)
@@ -0,0 +1,38 @@
+from app import create_app, db
+from app.services.rollup_service import RollupService
+from datetime import date
+import argparse
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Script de Mantenimiento)
+# ==============================================================================
+# Propósito:
+#   Construye o reconstruye la tabla `daily_metrics` a partir de `ordenes` y `pagos`.
+#   Necesario al desplegar el rollup sobre una BD existente, o tras cargas/ediciones
+#   manuales que no pasan por los servicios.
+#
+# Uso:
+#   python backfill_metrics.py                                 # Todo el histórico
+#   python backfill_metrics.py --desde 2024-01-01 --hasta 2024-02-01
+#   (--hasta es exclusivo)
+# ==============================================================================
+
+app = create_app()
+
+def backfill_metrics(desde=None, hasta=None):
+    with app.app_context():
+        # Crea `daily_metrics` si aún no existe (no toca las demás tablas)
+        db.create_all()
+
+        print("Reconstruyendo métricas diarias...")
+        stats = RollupService.backfill(desde, hasta)
+        for dimension, filas in stats.items():
+            print(f"  {dimension:<12} | filas: {filas}")
+        print("=== ROLLUP ACTUALIZADO ===")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Backfill del rollup diario de métricas")
+    parser.add_argument('--desde', type=date.fromisoformat, help="Primer día incluido (YYYY-MM-DD)")
+    parser.add_argument('--hasta', type=date.fromisoformat, help="Día excluido (YYYY-MM-DD)")
+    args = parser.parse_args()
+    backfill_metrics(args.desde, args.hasta)
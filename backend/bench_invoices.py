@@ -0,0 +1,56 @@
+from app.utils.pdf_generator import InvoiceGenerator
+import argparse
+import time
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Script de Benchmark)
+# ==============================================================================
+# Propósito:
+#   Mide el throughput de render de facturas PDF (facturas/segundo) en un solo
+#   proceso, con una orden sintética representativa. No necesita base de datos.
+#
+# Uso:
+#   python bench_invoices.py                       # 300 facturas, 6 servicios + 8 repuestos
+#   python bench_invoices.py -n 1000 --servicios 10 --repuestos 20
+# ==============================================================================
+
+def sample_order(order_id, servicios, repuestos):
+    return {
+        'id': order_id,
+        'cliente_nombre': 'Juan Perez',
+        'cliente_ci': '1234567',
+        'marca': 'Toyota', 'modelo': 'Corolla', 'anio': 2015,
+        'placa': '1234-ABC', 'vin': '1HGBH41JXMN109186',
+        'detalles_servicios': [
+            {'servicio_nombre': f'Servicio de mantenimiento {i}', 'precio_aplicado': 50 + i}
+            for i in range(servicios)
+        ],
+        'detalles_repuestos': [
+            {'repuesto_nombre': f'Repuesto {i}', 'cantidad': 2, 'precio_unitario_aplicado': 20 + i}
+            for i in range(repuestos)
+        ],
+        'total_estimado': 1000, 'total_pagado': 400, 'saldo_pendiente': 600
+    }
+
+def bench_invoices(n, servicios, repuestos):
+    # Calentamiento: construye la plantilla del proceso fuera de la medición
+    InvoiceGenerator.generate(sample_order(0, servicios, repuestos))
+
+    start = time.perf_counter()
+    total_bytes = 0
+    for i in range(1, n + 1):
+        total_bytes += len(InvoiceGenerator.generate(sample_order(i, servicios, repuestos)).getvalue())
+    elapsed = time.perf_counter() - start
+
+    print(f"Facturas:       {n}")
+    print(f"Tiempo total:   {elapsed:.2f} s")
+    print(f"Throughput:     {n / elapsed:.1f} facturas/s ({elapsed / n * 1000:.2f} ms c/u)")
+    print(f"Tamaño medio:   {total_bytes / n / 1024:.1f} KB")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de render de facturas PDF")
+    parser.add_argument('-n', type=int, default=300, help="Cantidad de facturas")
+    parser.add_argument('--servicios', type=int, default=6, help="Líneas de servicio por factura")
+    parser.add_argument('--repuestos', type=int, default=8, help="Líneas de repuesto por factura")
+    args = parser.parse_args()
+    bench_invoices(args.n, args.servicios, args.repuestos)
@@ -0,0 +1,100 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Script de Benchmark)
+# ==============================================================================
+# Propósito:
+#   Mide la creación de órdenes (`OrderService.create_order_with_details`) según la
+#   cantidad de líneas: consultas SQL por orden y latencia (mediana). Con la
+#   resolución del catálogo en lote las consultas son constantes y la latencia solo
+#   crece con el trabajo en Python por línea, no con idas y vueltas a la BD.
+#
+# Uso:
+#   python bench_order_create.py                        # 1, 5, 20, 50 y 100 líneas
+#   python bench_order_create.py --lineas 10 200 -r 50
+#   python bench_order_create.py --db sqlite:////tmp/bench.db
+#
+# Notas:
+#   - Usa una BD SQLite temporal propia (se recrea en cada ejecución); nunca la de `.env`.
+#   - "líneas" = N servicios + N repuestos en la misma orden.
+# ==============================================================================
+
+def bench_order_create(lineas, repeticiones):
+    from app import create_app, db
+    from app.models import Role, EstadoOrden, Usuario, Cliente, Auto, Servicio, Repuesto
+    from app.services.order_service import OrderService
+    from sqlalchemy import event
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        # Datos mínimos: un técnico, un auto y un catálogo con stock de sobra
+        db.session.add(Role(nombre_rol='admin'))
+        db.session.add(EstadoOrden(nombre_estado='Pendiente'))
+        db.session.flush()
+        tecnico = Usuario(nombre='Bench', apellido_p='Tecnico', correo='bench@taller.com',
+                          password='-', rol_id=1, activo=True)
+        cliente = Cliente(ci='0000001', nombre='Bench', apellido_p='Cliente')
+        db.session.add_all([tecnico, cliente])
+        db.session.flush()
+        auto = Auto(cliente_id=cliente.id, placa='BENCH-1', marca='Toyota', modelo='Corolla', anio=2015, activo=True)
+        db.session.add(auto)
+        max_lineas = max(lineas)
+        db.session.add_all([Servicio(nombre=f'Servicio {i}', precio=50.0 + i, activo=True)
+                            for i in range(max_lineas)])
+        db.session.add_all([Repuesto(nombre=f'Repuesto {i}', marca='Bench', precio_venta=20.0 + i,
+                                     stock=10 ** 9, activo=True)
+                            for i in range(max_lineas)])
+        db.session.commit()
+        auto_id, tecnico_id = auto.id, tecnico.id
+
+        consultas = [0]
+        def contar(*_):
+            consultas[0] += 1
+
+        def crear(n):
+            OrderService.create_order_with_details({
+                'auto_id': auto_id, 'tecnico_id': tecnico_id, 'estado_id': 1,
+                'problema_reportado': 'Benchmark',
+                'servicios': list(range(1, n + 1)),
+                'repuestos': [{'repuesto_id': i, 'cantidad': 1} for i in range(1, n + 1)],
+            })
+            db.session.expunge_all()
+
+        # Calentamiento: datos de referencia, caches y compilación de sentencias
+        crear(1)
+
+        print(f"{'Líneas':>7} | {'Consultas':>9} | {'p50 (ms)':>9} | {'min (ms)':>9}")
+        event.listen(db.engine, 'before_cursor_execute', contar)
+        try:
+            for n in lineas:
+                tiempos = []
+                consultas[0] = 0
+                for _ in range(repeticiones):
+                    start = time.perf_counter()
+                    crear(n)
+                    tiempos.append((time.perf_counter() - start) * 1000)
+                print(f"{n:>7} | {consultas[0] / repeticiones:>9.1f} | "
+                      f"{statistics.median(tiempos):>9.2f} | {min(tiempos):>9.2f}")
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', contar)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de creación de órdenes por cantidad de líneas")
+    parser.add_argument('--lineas', type=int, nargs='+', default=[1, 5, 20, 50, 100],
+                        help="Servicios y repuestos por orden")
+    parser.add_argument('-r', type=int, default=20, help="Órdenes creadas por cada tamaño")
+    parser.add_argument('--db', default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_order_create.db')}",
+                        help="URI de la BD de prueba (se borra su contenido)")
+    args = parser.parse_args()
+
+    # La configuración lee la URI al importarse: debe fijarse antes de importar `app`
+    os.environ['SQLALCHEMY_DATABASE_URI'] = args.db
+    bench_order_create(args.lineas, args.r)
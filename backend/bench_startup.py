@@ -0,0 +1,91 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Script de Benchmark)
+# ==============================================================================
+# Propósito:
+#   Mide el arranque en frío de un worker: `create_app()` en un intérprete nuevo,
+#   con `python -X importtime`. Reporta el tiempo de pared (mediana de N arranques),
+#   el tiempo total de importación y los paquetes más caros, y si se cargaron
+#   ReportLab, Flasgger y PyYAML (deberían diferirse al primer uso).
+#
+# Uso:
+#   python bench_startup.py                        # 10 arranques, API_DOCS_MODE=lazy
+#   python bench_startup.py -n 20 --mode eager     # comparar con el registro inmediato
+#   python bench_startup.py --top 25
+# ==============================================================================
+
+CHILD = """
+import time
+start = time.perf_counter()
+from app import create_app
+create_app()
+print(f"create_app_ms={(time.perf_counter() - start) * 1000:.3f}")
+"""
+
+DIFERIDOS = ('reportlab', 'flasgger', 'yaml')
+
+
+def cold_start(mode):
+    """
+    Un arranque en un proceso nuevo.
+
+    Returns:
+        tuple: (ms de create_app, {paquete raíz: µs acumulados}, µs totales de importación)
+    """
+    env = dict(os.environ, API_DOCS_MODE=mode)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True
+    )
+    wall_ms = float(result.stdout.strip().splitlines()[-1].split('=', 1)[1])
+
+    # Formato: "import time: <self us> | <cumulative us> | <indentación><módulo>"
+    paquetes = {}
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        total_us += int(self_us)
+        raiz = name.strip().split('.')[0]
+        paquetes[raiz] = paquetes.get(raiz, 0) + int(self_us)
+    return wall_ms, paquetes, total_us
+
+
+def bench_startup(n, mode, top):
+    # Calentamiento: compila los .pyc fuera de la medición
+    cold_start(mode)
+
+    walls, totals = [], []
+    paquetes = {}
+    for _ in range(n):
+        wall_ms, por_paquete, total_us = cold_start(mode)
+        walls.append(wall_ms)
+        totals.append(total_us)
+        for raiz, us in por_paquete.items():
+            paquetes.setdefault(raiz, []).append(us)
+
+    print(f"Modo:               {mode}")
+    print(f"Arranques:          {n}")
+    print(f"create_app (p50):   {statistics.median(walls):.1f} ms (min {min(walls):.1f}, max {max(walls):.1f})")
+    print(f"Importación (p50):  {statistics.median(totals) / 1000:.1f} ms (-X importtime, suma de 'self')")
+    print(f"Diferidos cargados: {', '.join(p for p in DIFERIDOS if p in paquetes) or 'ninguno'}")
+    print(f"Paquetes más caros (mediana):")
+    ranking = sorted(((statistics.median(v), k) for k, v in paquetes.items()), reverse=True)
+    for us, raiz in ranking[:top]:
+        print(f"  {raiz:<28} {us / 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark de arranque en frío (create_app)")
+    parser.add_argument('-n', type=int, default=10, help="Cantidad de arranques medidos")
+    parser.add_argument('--mode', choices=['lazy', 'eager', 'off'], default='lazy', help="API_DOCS_MODE")
+    parser.add_argument('--top', type=int, default=15, help="Paquetes a listar")
+    args = parser.parse_args()
+    bench_startup(args.n, args.mode, args.top)
@@ -0,0 +1,122 @@
+import argparse
+import os
+import sys
+import tempfile
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Script de Verificación)
+# ==============================================================================
+# Propósito:
+#   Regresión de cantidad de consultas SQL de la serialización de órdenes: con los
+#   perfiles de carga de `OrderService.loader_options`, una página de GET /orders y
+#   el detalle GET /orders/<id> deben resolverse en un número fijo de sentencias,
+#   sin importar cuántas filas, detalles o pagos tengan.
+#
+# Flujo Lógico Central:
+#   1. BD de prueba con órdenes de 3 servicios, 2 repuestos y 1 pago cada una.
+#   2. Login real (POST /auth/login) y una petición de calentamiento por endpoint:
+#      las cachés por proceso (perfil del usuario, datos de referencia, denylist)
+#      se cargan una vez por worker, no por página.
+#   3. Cuenta las sentencias con un listener `before_cursor_execute` y sale con
+#      código 1 si alguna supera su máximo.
+#
+# Uso:
+#   python check_order_queries.py
+#   python check_order_queries.py -v                 # muestra las sentencias
+# ==============================================================================
+
+# Máximos aceptados (perfiles 'list' y 'detail')
+MAX_QUERIES_LIST = 5
+MAX_QUERIES_DETAIL = 4
+
+
+def check_order_queries(ordenes, verbose=False):
+    from app import create_app, db
+    from app.models import Role, EstadoOrden, Usuario, Cliente, Auto, Servicio, Repuesto
+    from app.services.order_service import OrderService
+    from app.services.payment_service import PaymentService
+    from datetime import datetime
+    from sqlalchemy import event
+    from werkzeug.security import generate_password_hash
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(Role(nombre_rol='admin'))
+        db.session.add(EstadoOrden(nombre_estado='Pendiente'))
+        db.session.flush()
+        tecnico = Usuario(nombre='Check', apellido_p='Admin', correo='check@taller.com',
+                          password=generate_password_hash('check123'), rol_id=1, activo=True)
+        cliente = Cliente(ci='0000001', nombre='Check', apellido_p='Cliente')
+        db.session.add_all([tecnico, cliente])
+        db.session.flush()
+        auto = Auto(cliente_id=cliente.id, placa='CHECK-1', marca='Toyota', modelo='Corolla', anio=2015, activo=True)
+        db.session.add(auto)
+        db.session.add_all([Servicio(nombre=f'Servicio {i}', precio=50.0, activo=True) for i in range(3)])
+        db.session.add_all([Repuesto(nombre=f'Repuesto {i}', marca='Check', precio_venta=20.0,
+                                     stock=1000, activo=True) for i in range(2)])
+        db.session.commit()
+
+        for _ in range(ordenes):
+            orden = OrderService.create_order_with_details({
+                'auto_id': auto.id, 'tecnico_id': tecnico.id, 'estado_id': 1,
+                'servicios': [1, 2, 3],
+                'repuestos': [{'repuesto_id': 1, 'cantidad': 1}, {'repuesto_id': 2, 'cantidad': 2}],
+            })
+            PaymentService.register_payment(orden.id, 10.0, 'Efectivo', None, tecnico.id, datetime.utcnow())
+        orden_id = orden.id
+
+    client = app.test_client()
+    login = client.post('/auth/login', json={'email': 'check@taller.com', 'password': 'check123'})
+    if login.status_code != 200:
+        print(f"Login falló: {login.status_code} {login.get_json()}")
+        sys.exit(1)
+    headers = {'Authorization': f"Bearer {login.get_json()['access_token']}"}
+
+    def medir(url):
+        # Calentamiento de las cachés por proceso antes de contar
+        client.get(url, headers=headers)
+        sentencias = []
+        def contar(conn, cursor, statement, *_):
+            sentencias.append(statement)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', contar)
+        try:
+            response = client.get(url, headers=headers)
+        finally:
+            event.remove(engine, 'before_cursor_execute', contar)
+        if response.status_code != 200:
+            print(f"{url} respondió {response.status_code}: {response.get_json()}")
+            sys.exit(1)
+        return sentencias
+
+    fallos = []
+    for url, maximo in (('/orders?per_page=10', MAX_QUERIES_LIST), (f'/orders/{orden_id}', MAX_QUERIES_DETAIL)):
+        sentencias = medir(url)
+        estado = 'OK' if len(sentencias) <= maximo else 'FALLA'
+        print(f"  {url:<22} | consultas: {len(sentencias):>3} | máximo: {maximo} | {estado}")
+        if verbose:
+            for sentencia in sentencias:
+                print(f"      {' '.join(sentencia.split())[:160]}")
+        if len(sentencias) > maximo:
+            fallos.append(url)
+
+    if fallos:
+        print(f"=== FALLÓ: {', '.join(fallos)} superó el máximo (¿relaciones cargadas de forma perezosa?) ===")
+        sys.exit(1)
+    print("=== OK ===")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Regresión de consultas SQL de GET /orders y GET /orders/<id>")
+    parser.add_argument('-n', type=int, default=12, help="Órdenes de prueba")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Mostrar las sentencias ejecutadas")
+    parser.add_argument('--db', default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'check_order_queries.db')}",
+                        help="URI de la BD de prueba (se borra su contenido)")
+    args = parser.parse_args()
+
+    # La configuración lee la URI al importarse: debe fijarse antes de importar `app`
+    os.environ['SQLALCHEMY_DATABASE_URI'] = args.db
+    check_order_queries(args.n, args.verbose)
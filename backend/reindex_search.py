@@ -0,0 +1,29 @@
+from app import create_app
+from app.models import Cliente, Auto
+from app.utils.search_index import reindex
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Script de Mantenimiento)
+# ==============================================================================
+# Propósito:
+#   Prepara el índice de búsqueda de `clientes` y `autos` en una BD existente:
+#   agrega la columna `search_text` si falta, crea el índice del motor
+#   (GIN pg_trgm en PostgreSQL, FTS5 en SQLite) y recalcula el texto de cada fila.
+#   También sirve tras cargas o ediciones manuales que no pasan por el ORM.
+#
+# Uso:
+#   python reindex_search.py
+# ==============================================================================
+
+app = create_app()
+
+def reindex_search():
+    with app.app_context():
+        print("Reconstruyendo índice de búsqueda...")
+        for model in (Cliente, Auto):
+            filas = reindex(model)
+            print(f"  {model.__tablename__:<10} | filas: {filas}")
+        print("=== ÍNDICE DE BÚSQUEDA ACTUALIZADO ===")
+
+if __name__ == '__main__':
+    reindex_search()
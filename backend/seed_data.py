@@ -1,5 +1,6 @@
 from app import create_app, db
 from app.models import Role, Usuario, Cliente, Auto, Servicio, Repuesto, Orden, EstadoOrden, OrdenDetalleServicio, OrdenDetalleRepuesto
+from app.services.rollup_service import RollupService
 from werkzeug.security import generate_password_hash
 from datetime import datetime, timedelta
 import random
@@ -245,6 +246,12 @@ def seed_data():
 
         o3.total_estimado = item_s3_1.precio_aplicado + item_s3_2.precio_aplicado
         db.session.commit()
+
+        # ==============================================================================
+        # 7. MÉTRICAS DIARIAS (Rollup de reportes)
+        # ==============================================================================
+        print("Construyendo métricas diarias...")
+        RollupService.backfill()
         
         print("\n=== BD POBLADA CON ÉXITO ===")
         print("\nCREDENCIALES DE USUARIOS GENERADOS:")
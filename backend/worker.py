@@ -0,0 +1,101 @@
+from app import create_app, db
+from app.services.job_service import JobService
+import argparse
+import os
+import signal
+import socket
+import threading
+import time
+
+# ==============================================================================
+# ENCABEZADO DEL ARCHIVO (Proceso Worker)
+# ==============================================================================
+# Propósito:
+#   Ejecuta los trabajos encolados en la tabla `jobs` (facturas, exportaciones,
+#   recálculos) fuera de los workers web. No requiere broker: sondea la BD.
+#
+# Flujo Lógico Central:
+#   1. Reclama el trabajo pendiente más antiguo (UPDATE condicional atómico).
+#   2. Lo ejecuta y guarda el resultado; si la cola está vacía espera `JOB_POLL_INTERVAL`.
+#      Durante la ejecución un hilo renueva el heartbeat cada `JOB_HEARTBEAT_INTERVAL`.
+#   3. Periódicamente reencola trabajos sin heartbeat en `JOB_TIMEOUT` (workers caídos)
+#      y purga resultados más antiguos que `JOB_RESULT_TTL`.
+#   4. SIGTERM/SIGINT: termina el trabajo en curso y sale.
+#
+# Uso:
+#   python worker.py            # Bucle continuo (se pueden lanzar varios en paralelo)
+#   python worker.py --once     # Procesa lo pendiente y sale (cron / pruebas)
+# ==============================================================================
+
+app = create_app()
+
+# Cada cuánto (segundos) correr el mantenimiento de la cola
+MAINTENANCE_INTERVAL = 60
+
+_stop = False
+
+def _request_stop(signum, frame):
+    global _stop
+    _stop = True
+    print("Señal recibida: terminando tras el trabajo en curso...")
+
+def _heartbeat(job_id, worker_id, done, interval):
+    """Hilo de heartbeat del trabajo en curso (sesión propia: su propio app context)."""
+    while not done.wait(interval):
+        with app.app_context():
+            try:
+                if not JobService.heartbeat(job_id, worker_id):
+                    print(f"  Trabajo #{job_id} reencolado por otro worker: se detiene el heartbeat")
+                    return
+            except Exception as e:
+                print(f"  Heartbeat del trabajo #{job_id} falló: {str(e)}")
+            finally:
+                db.session.remove()
+
+def run_worker(once=False):
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    with app.app_context():
+        # Crea `jobs` si aún no existe (no toca las demás tablas)
+        db.create_all()
+        poll_interval = app.config['JOB_POLL_INTERVAL']
+        print(f"Worker {worker_id} iniciado")
+
+        last_maintenance = 0
+        while not _stop:
+            if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL:
+                JobService.requeue_stale(app.config['JOB_TIMEOUT'], app.config['JOB_MAX_ATTEMPTS'])
+                JobService.purge_finished(app.config['JOB_RESULT_TTL'])
+                last_maintenance = time.monotonic()
+
+            job = JobService.claim_next(worker_id)
+            if job is None:
+                if once:
+                    break
+                db.session.remove()
+                time.sleep(poll_interval)
+                continue
+
+            started = time.perf_counter()
+            done = threading.Event()
+            heartbeat = threading.Thread(
+                target=_heartbeat, args=(job.id, worker_id, done, app.config['JOB_HEARTBEAT_INTERVAL']), daemon=True
+            )
+            heartbeat.start()
+            try:
+                job = JobService.run(job)
+            finally:
+                done.set()
+                heartbeat.join()
+            print(f"  Trabajo #{job.id} ({job.tipo}) -> {job.estado} en {time.perf_counter() - started:.2f}s")
+            db.session.remove()
+
+        print(f"Worker {worker_id} detenido")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Worker de la cola de trabajos")
+    parser.add_argument('--once', action='store_true', help="Procesar lo pendiente y salir")
+    args = parser.parse_args()
+    run_worker(args.once)
@@ -52,6 +52,9 @@ export default class AuthController {
                 
                 // 1. Persistencia de Sesión
                 localStorage.setItem('token', response.access_token);
+                if (response.refresh_token) {
+                    localStorage.setItem('refresh_token', response.refresh_token);
+                }
                 
                 // Verificación de escritura (Critical Path)
                 if (!localStorage.getItem('token')) {
@@ -106,8 +109,14 @@ export default class AuthController {
      * Destruye credenciales locales y reinicia la interfaz.
      */
     logout() {
+        // Revocación en el servidor (best effort: la sesión local se cierra igual)
+        if (localStorage.getItem('token')) {
+            this.model.logout(localStorage.getItem('refresh_token')).catch(() => {});
+        }
+
         // Limpieza segura
         localStorage.removeItem('token');
+        localStorage.removeItem('refresh_token');
         localStorage.removeItem('user');
         
         // Redirección forzada
@@ -20,4 +20,13 @@ export default class AuthModel {
         // Body esperado: { email, password }
         return this.api.post('/auth/login', { email, password });
     }
+
+    /**
+     * Revoca en el servidor el access token y el refresh token de la sesión.
+     * @param {string|null} refreshToken - Refresh token guardado en el login.
+     * @returns {Promise<Object>} Confirmación del servidor.
+     */
+    async logout(refreshToken) {
+        return this.api.post('/auth/logout', refreshToken ? { refresh_token: refreshToken } : {});
+    }
 }
@@ -11,7 +11,7 @@ export default class ClientModel {
 
     async getAll() {
         try {
-            const response = await this.api.get(`${this.endpoint}?per_page=1000`);
+            const response = await this.api.get(`${this.endpoint}?per_page=1000&include=autos`);
             // Backend devuelve { items: [...], ... }
             if (response && response.items) return response.items;
             return [];
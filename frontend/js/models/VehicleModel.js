@@ -17,7 +17,7 @@ export default class VehicleModel {
     async getAll() {
         try {
             // 1. Fetch Clients (to get vehicles and owners)
-            const clientsResponse = await this.api.get('/clients?per_page=1000');
+            const clientsResponse = await this.api.get('/clients?per_page=1000&include=autos');
             let clients = [];
             if (clientsResponse && clientsResponse.items) {
                 clients = clientsResponse.items;
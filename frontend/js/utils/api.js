@@ -1,3 +1,6 @@
+// Renovación en curso, compartida por todas las instancias de API (cada modelo crea la suya)
+let refreshing = null;
+
 /**
  * Clase API
  * Maneja las peticiones HTTP al backend y la gestión del token JWT.
@@ -15,6 +18,46 @@ export default class API {
         return localStorage.getItem('token');
     }
 
+    /**
+     * Renueva el access token con el refresh token guardado (POST /auth/refresh).
+     * Las renovaciones simultáneas comparten la misma petición.
+     * @returns {Promise<boolean>} true si se obtuvo un token nuevo.
+     */
+    async refreshToken() {
+        const refreshToken = localStorage.getItem('refresh_token');
+        if (!refreshToken) return false;
+
+        if (!refreshing) {
+            refreshing = fetch(`${this.baseURL}/auth/refresh`, {
+                method: 'POST',
+                headers: { 'Authorization': `Bearer ${refreshToken}` }
+            })
+                .then(async (response) => {
+                    if (!response.ok) return false;
+                    const data = await response.json();
+                    localStorage.setItem('token', data.access_token);
+                    return true;
+                })
+                .catch(() => false)
+                .finally(() => { refreshing = null; });
+        }
+        return refreshing;
+    }
+
+    /**
+     * Ejecuta el fetch y, si el access token expiró (401), lo renueva una vez y reintenta.
+     * @param {string} endpoint - Endpoint relativo.
+     * @param {Object} options - Opciones de fetch (sin headers).
+     * @returns {Promise<Response>} Respuesta final.
+     */
+    async _fetch(endpoint, options = {}) {
+        const response = await fetch(`${this.baseURL}${endpoint}`, { ...options, headers: this._getHeaders() });
+        if (response.status === 401 && endpoint !== '/auth/login' && await this.refreshToken()) {
+            return fetch(`${this.baseURL}${endpoint}`, { ...options, headers: this._getHeaders() });
+        }
+        return response;
+    }
+
     /**
      * Construye los headers para la petición, incluyendo Content-Type y Authorization.
      * @param {Object} customHeaders - Headers adicionales opcionales.
@@ -53,6 +96,7 @@ export default class API {
             if (response.status === 401) {
                 console.warn('No autorizado o sesión expirada. Cerrando sesión...');
                 localStorage.removeItem('token');
+                localStorage.removeItem('refresh_token');
                 localStorage.removeItem('user');
                 // Si tienes acceso a la instancia de la app o AuthController, úsala.
                 // Como esto es una utilidad, podemos forzar recarga o despacho de evento.
@@ -90,9 +134,8 @@ export default class API {
      */
     async get(endpoint) {
         try {
-            const response = await fetch(`${this.baseURL}${endpoint}`, {
-                method: 'GET',
-                headers: this._getHeaders()
+            const response = await this._fetch(endpoint, {
+                method: 'GET'
             });
             return this._handleResponse(response);
         } catch (error) {
@@ -109,9 +152,8 @@ export default class API {
      */
     async post(endpoint, data) {
         try {
-            const response = await fetch(`${this.baseURL}${endpoint}`, {
+            const response = await this._fetch(endpoint, {
                 method: 'POST',
-                headers: this._getHeaders(),
                 body: JSON.stringify(data)
             });
             return this._handleResponse(response);
@@ -129,9 +171,8 @@ export default class API {
      */
     async put(endpoint, data) {
         try {
-            const response = await fetch(`${this.baseURL}${endpoint}`, {
+            const response = await this._fetch(endpoint, {
                 method: 'PUT',
-                headers: this._getHeaders(),
                 body: JSON.stringify(data)
             });
             return this._handleResponse(response);
@@ -148,9 +189,8 @@ export default class API {
      */
     async delete(endpoint) {
         try {
-            const response = await fetch(`${this.baseURL}${endpoint}`, {
-                method: 'DELETE',
-                headers: this._getHeaders()
+            const response = await this._fetch(endpoint, {
+                method: 'DELETE'
             });
             return this._handleResponse(response);
         } catch (error) {
@@ -166,9 +206,8 @@ export default class API {
      */
     async getBlob(endpoint) {
         try {
-            const response = await fetch(`${this.baseURL}${endpoint}`, {
-                method: 'GET',
-                headers: this._getHeaders()
+            const response = await this._fetch(endpoint, {
+                method: 'GET'
             });
 
             if (!response.ok) {
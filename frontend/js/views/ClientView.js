@@ -173,7 +173,7 @@ export default class ClientView {
         if (!clients || clients.length === 0) return '<tr><td colspan="5" class="text-center p-4 text-secondary">No hay clientes registrados.</td></tr>';
 
         return clients.map(c => {
-            const vehicleCount = (c.autos && Array.isArray(c.autos)) ? c.autos.length : 0;
+            const vehicleCount = (c.autos && Array.isArray(c.autos)) ? c.autos.length : (c.autos_count || 0);
             return `
             <tr>
                 <td class="py-3 px-4 border-bottom">